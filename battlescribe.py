@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Import des rosters BattleScribe (.ros XML, .rosz zippé) vers une ArmyList,
+la même structure que l'export de l'app 40k (export_parser).
+
+    roster name=... > costs > cost name="pts"            <- titre, total
+      forces > force catalogueName="Xenos - Tyranids"     <- faction
+        selections > selection name="Battle Size"         <- format
+                     selection name="Detachment"          <- détachement
+                     selection type="unit|model" number=  <- unité
+                       selections > selection type="model" number=4
+                                      selections > selection type="upgrade"
+                       costs > cost name="pts" value=...
+                       categories > category primary="true"
+
+Le XML est lu en flux (iterparse) : chaque élément est retiré de son parent
+dès sa fin traitée, seuls les noms / nombres / points des sélections en cours
+sont gardés. La mémoire reste constante quelle que soit la taille du roster ;
+un .rosz est lu directement dans l'archive, sans fichier temporaire.
+"""
+
+from contextlib import contextmanager
+import xml.etree.ElementTree as ET
+import zipfile
+
+from export_parser import (
+    FORMATS,
+    ArmyList,
+    ListedUnit,
+    ModelGroup,
+    NameIndex,
+    Wargear,
+)
+
+ROSTER_SUFFIXES = (".ros", ".rosz")
+
+# catégorie principale d'une unité -> section de l'export 40k
+SECTIONS = {
+    "character": "CHARACTERS",
+    "epic hero": "CHARACTERS",
+    "battleline": "BATTLELINE",
+    "dedicated transport": "DEDICATED TRANSPORTS",
+}
+DETACHMENT_SELECTIONS = ("detachment", "detachment choice", "detachments")
+
+
+def is_roster(path) -> bool:
+    return str(path).lower().endswith(ROSTER_SUFFIXES)
+
+
+class _Selection:
+    """Ce qu'on garde d'une <selection> en cours de lecture."""
+
+    __slots__ = ("name", "type", "number", "points", "category", "children")
+
+    def __init__(self, attrib: dict):
+        self.name = (attrib.get("name") or "").strip()
+        self.type = attrib.get("type") or "upgrade"
+        self.number = int(attrib.get("number") or 1)
+        self.points = 0.0  # sous-arbre compris
+        self.category: str | None = None
+        self.children: list["_Selection"] = []
+
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+@contextmanager
+def _open_roster(source):
+    """
+    Flux XML d'un .ros, ou du .ros contenu dans un .rosz (chemin ou fichier) :
+    l'archive reste ouverte jusqu'à la fin de la lecture. Le fichier binaire
+    de l'appelant n'est pas fermé.
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            member = next(
+                (n for n in zf.namelist() if n.lower().endswith(".ros")), None
+            )
+            if member is None:
+                raise ValueError(f"Aucun roster .ros dans l'archive {source!r}")
+            with zf.open(member) as stream:
+                yield stream
+        return
+    if hasattr(source, "seek"):
+        source.seek(0)
+        yield source
+        return
+    with open(source, "rb") as stream:
+        yield stream
+
+
+def read_roster(source, names: NameIndex | None = None) -> ArmyList:
+    """Roster BattleScribe (chemin ou fichier binaire .ros / .rosz) -> ArmyList."""
+    army = ArmyList()
+    stack: list[_Selection] = []
+    elems: list[ET.Element] = []
+    with _open_roster(source) as stream:
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            tag = _local(elem.tag)
+            if event == "start":
+                elems.append(elem)
+                if tag == "selection":
+                    stack.append(_Selection(elem.attrib))
+                elif tag == "roster":
+                    army.title = elem.get("name") or None
+                elif tag == "force" and army.faction is None:
+                    _force_meta(army, elem.get("catalogueName") or "")
+                continue
+            elems.pop()
+            if tag == "cost" and (elem.get("name") or "").strip() == "pts":
+                # elems[-1] : <costs>, elems[-2] : son propriétaire
+                owner = _local(elems[-2].tag) if len(elems) > 1 else ""
+                value = float(elem.get("value") or 0)
+                if owner == "selection":
+                    stack[-1].points += value
+                elif owner == "roster":
+                    army.points_total = round(value)
+            elif tag == "costLimit" and (elem.get("name") or "").strip() == "pts":
+                army.format_points = (
+                    army.format_points or round(float(elem.get("value") or 0)) or None
+                )
+            elif tag == "category" and elem.get("primary") == "true" and stack:
+                stack[-1].category = stack[-1].category or elem.get("name")
+            elif tag == "selection":
+                sel = stack.pop()
+                if stack:
+                    stack[-1].points += sel.points
+                    stack[-1].children.append(sel)
+                else:
+                    _top_selection(army, sel)
+            if elems:
+                elems[-1].remove(elem)  # mémoire constante
+    if names:
+        _canonical_names(army, names)
+    return army
+
+
+def _canonical_names(army: ArmyList, names: NameIndex):
+    """Orthographe du corpus pour le détachement et la faction, si connus."""
+    for attr, kind in (("detachment", "detachment"), ("faction", "faction")):
+        value = getattr(army, attr)
+        hit = names.lookup(value) if value else None
+        if hit is not None and hit[0] == kind:
+            setattr(army, attr, hit[1])
+
+
+def _force_meta(army: ArmyList, catalogue: str):
+    """'Imperium - Adeptus Astartes - Ultramarines' -> faction, sous-faction."""
+    parts = [p.strip() for p in catalogue.split(" - ") if p.strip()]
+    if len(parts) > 1:
+        parts = parts[1:]  # grande alliance
+    if parts:
+        army.faction = parts[0]
+    if len(parts) > 1:
+        army.chapter = parts[1]
+
+
+def _top_selection(army: ArmyList, sel: _Selection):
+    key = sel.name.lower()
+    if key == "battle size":
+        for child in sel.children:
+            _battle_size(army, child.name)
+    elif key in DETACHMENT_SELECTIONS:
+        if sel.children and army.detachment is None:
+            army.detachment = sel.children[0].name
+    elif sel.type in ("unit", "model"):
+        army.units.append(_unit(sel))
+
+
+def _battle_size(army: ArmyList, label: str):
+    """'2. Strike Force (2000 Point limit)' -> Strike Force, 2000."""
+    name, _sep, rest = label.partition("(")
+    name = name.split(". ", 1)[-1].strip()
+    if name.lower() in FORMATS:
+        army.format = name.title()
+    digits = "".join(c for c in rest.split(" ", 1)[0] if c.isdigit())
+    if digits:
+        army.format_points = int(digits)
+
+
+def _unit(sel: _Selection) -> ListedUnit:
+    unit = ListedUnit(
+        sel.name,
+        round(sel.points),
+        SECTIONS.get((sel.category or "").lower(), "OTHER DATASHEETS"),
+    )
+    for child in sel.children:
+        if child.type == "model":
+            unit.models.append(
+                ModelGroup(child.name, child.number, _wargear(child.children))
+            )
+        elif child.name.lower().startswith("enhancement"):
+            unit.tags.extend(f"Enhancement: {c.name}" for c in child.children)
+        elif not child.children and child.name.lower() == "warlord":
+            unit.tags.append(child.name)
+        elif child.children:
+            unit.wargear.extend(_wargear(child.children))
+        else:
+            unit.wargear.append(Wargear(child.name, child.number))
+    return unit
+
+
+def _wargear(selections) -> list[Wargear]:
+    out = []
+    for s in selections:
+        if s.children:
+            out.extend(_wargear(s.children))
+        else:
+            out.append(Wargear(s.name, s.number))
+    return out
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Le Corpus partagé par la CLI et Streamlit : enregistrements models.* d'un
+dossier data_* (ou d'un upload), fichier par fichier, rafraîchissable quand
+les YAML changent ; fichiers identiques entre dossiers partagés en mémoire.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from difflib import get_close_matches
+import hashlib
+import os
+from pathlib import Path
+import weakref
+
+from corpus_docs import file_fingerprint, load_yaml_file, sha256_file, yaml_paths
+from corpus_snapshot import load_yaml_docs, parse_yaml_docs, read_snapshot
+from corpus_validation import cached_validation, validate_corpus_dir
+from export_parser import normalize_name
+from models import Stratagem, StringPool, Unit, string_scope
+from stratagem_store import (
+    SHARDS_DIR,
+    STRATAGEMS_FILE,
+    load_dir_stratagems,
+    tracked_corpus_files,
+)
+
+
+# -----------------------------
+# Chargement YAML
+# -----------------------------
+
+
+def merge_unit_docs(docs):
+    """
+    Fusionne des documents YAML déjà parsés (ordre = priorité croissante)
+    en (units_by_key, faction_helpers). Même règles que le chargement disque.
+    """
+    units_by_key = {}
+    faction_helpers = None
+
+    for data in docs:
+        if (
+            faction_helpers is None
+            and isinstance(data, dict)
+            and "faction_helpers" in data
+        ):
+            faction_helpers = data["faction_helpers"]
+
+        if (
+            isinstance(data, dict)
+            and "units" in data
+            and isinstance(data["units"], list)
+        ):
+            for u in data["units"]:
+                if isinstance(u, dict) and u.get("name"):
+                    units_by_key[normalize_name(u["name"])] = u
+
+    if faction_helpers is None:
+        faction_helpers = default_faction_helpers()
+    return units_by_key, faction_helpers
+
+
+def default_faction_helpers() -> dict:
+    return {
+        "turn_start": ["Déclarer/mettre à jour les effets de détachement/faction."],
+        "generic_reminders": {
+            "command": ["Gagner CP ; tests d’ébranlement ; poser auras/buffs."],
+            "movement": ["Mesurer menaces ; garder couvert/lignes de vue."],
+            "shooting": ["Choisir cibles intelligemment."],
+            "charge": ["Penser multi-charge ; garder 1 CP pour relance critique."],
+            "fight": [
+                "Activer dans le bon ordre ; pile-in/consolidation pour voler OC."
+            ],
+            "end": ["Compter OC ; scorer primaires/secondaires ; valider actions."],
+        },
+    }
+
+
+def fuzzy_find(key: str, units_by_key: dict, cutoff: float = 0.72):
+    if key in units_by_key:
+        return key, 1.0
+    choices = list(units_by_key.keys())
+    match = get_close_matches(key, choices, n=1, cutoff=cutoff)
+    if match:
+        return match[0], 0.9
+    return None, 0.0
+
+
+# -----------------------------
+# Corpus partagé (CLI + Streamlit)
+# -----------------------------
+
+
+@dataclass(slots=True, weakref_slot=True)
+class CorpusFile:
+    """
+    Ce qu'un fichier apporte au corpus, déjà converti en enregistrements.
+    `origin` : le CorpusFile (même contenu, parsé une fois) dont les
+    enregistrements sont repris ; le garder vivant garde le partage possible.
+    """
+
+    fingerprint: dict | None = None
+    units: list[Unit] = field(default_factory=list)
+    stratagems: list[Stratagem] = field(default_factory=list)
+    extras: dict = field(default_factory=dict)  # phases / faction_helpers
+    sha256: str | None = None
+    path: str | None = None
+    origin: "CorpusFile | None" = field(default=None, repr=False, compare=False)
+
+    def shared_across_dirs(self) -> bool:
+        """Vrai si les enregistrements viennent d'un fichier d'un autre dossier."""
+        return (
+            self.origin is not None
+            and Path(self.origin.path).parent != Path(self.path).parent
+        )
+
+    @classmethod
+    def from_doc(
+        cls, doc, fingerprint: dict | None = None, sha256: str | None = None
+    ) -> "CorpusFile":
+        if not isinstance(doc, dict):
+            return cls(fingerprint, sha256=sha256)
+        units = doc.get("units") if isinstance(doc.get("units"), list) else []
+        return cls(
+            fingerprint,
+            [Unit.from_dict(u) for u in units if isinstance(u, dict) and u.get("name")],
+            [Stratagem.from_dict(st) for st in doc.get("stratagems") or []],
+            {k: doc[k] for k in ("phases", "faction_helpers") if k in doc},
+            sha256,
+        )
+
+
+@dataclass
+class CorpusChanges:
+    """Rapport d'un Corpus.refresh() : fichiers relus et unités touchées."""
+
+    files_added: list[str] = field(default_factory=list)
+    files_removed: list[str] = field(default_factory=list)
+    files_changed: list[str] = field(default_factory=list)
+    units_added: list[str] = field(default_factory=list)
+    units_removed: list[str] = field(default_factory=list)
+    units_modified: list[str] = field(default_factory=list)
+    stratagems_changed: bool = False
+
+    def __bool__(self):
+        return bool(self.files_added or self.files_removed or self.files_changed)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.files_changed) + len(self.files_added) + len(self.files_removed)}"
+            f" fichier(s) relu(s) : +{len(self.units_added)} / -{len(self.units_removed)}"
+            f" / ~{len(self.units_modified)} unité(s)"
+            + (", stratagèmes modifiés" if self.stratagems_changed else "")
+        )
+
+
+@dataclass
+class Corpus:
+    """
+    Données d'un dossier data_* (ou d'un upload) chargées une seule fois :
+    la même instance sert à l'aperçu Streamlit et à la génération de la fiche.
+    `detachments` est renseigné si seuls les stratagèmes de ces détachements
+    (+ "All") ont été chargés. `files` (fichier -> CorpusFile) n'est renseigné
+    que pour un dossier chargé par load_dir_corpus, qui peut alors être rafraîchi ;
+    `dedup` compte alors ce que ce chargement a repris d'un autre dossier.
+    `strings` est le pool de vocabulaire des enregistrements construits pour
+    ce corpus (réutilisé par refresh), libéré avec lui.
+    """
+
+    units: list[Unit]
+    units_by_key: dict[str, Unit]
+    faction_helpers: dict
+    phases: dict
+    stratagems: list[Stratagem]
+    source: str | None = None
+    detachments: frozenset[str] | None = field(default=None)
+    files: dict[str, CorpusFile] | None = field(default=None, repr=False)
+    validation: dict | None = field(default=None, repr=False)  # validate_docs()
+    dedup: dict | None = field(default=None, repr=False)  # files / bytes / objects
+    strings: StringPool | None = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_docs(cls, docs, source=None, stratagems=None, detachments=None):
+        """
+        Assemble un corpus à partir de documents YAML déjà parsés (mêmes règles
+        de priorité que merge_unit_docs) et les convertit en enregistrements.
+        """
+        with string_scope() as pool:
+            parts = [CorpusFile.from_doc(d) for d in docs]
+            if stratagems is not None:
+                for p in parts:
+                    p.stratagems = []
+                parts.append(
+                    CorpusFile(
+                        stratagems=[
+                            st if isinstance(st, Stratagem) else Stratagem.from_dict(st)
+                            for st in stratagems
+                        ]
+                    )
+                )
+        corpus = cls([], {}, {}, {}, [], source=None if source is None else str(source))
+        corpus.strings = pool
+        corpus.detachments = None if detachments is None else frozenset(detachments)
+        corpus._merge(parts)
+        return corpus
+
+    def _merge(self, parts):
+        """
+        (Re)calcule les vues du corpus à partir de ses fichiers, dans l'ordre :
+        phases / faction_helpers du premier fichier qui les définit, et pour
+        une même unité (clé normalisée) la dernière définition gagne.
+        """
+        parts = list(parts)
+        phases = next((p.extras["phases"] for p in parts if "phases" in p.extras), None)
+        helpers = next(
+            (
+                p.extras["faction_helpers"]
+                for p in parts
+                if "faction_helpers" in p.extras
+            ),
+            None,
+        )
+        self.units = [u for p in parts for u in p.units]
+        self.units_by_key = {normalize_name(u.name): u for u in self.units}
+        self.faction_helpers = default_faction_helpers() if helpers is None else helpers
+        self.phases = phases or {"order": [], "steps": {}}
+        self.stratagems = [st for p in parts for st in p.stratagems]
+
+    def refresh(self) -> CorpusChanges:
+        """
+        Relit uniquement les fichiers du dossier source ajoutés, supprimés ou
+        modifiés (taille / mtime) et met le corpus à jour en place.
+        """
+        changes = CorpusChanges()
+        if self.files is None:
+            raise ValueError(
+                "Corpus non rafraîchissable (pas chargé depuis un dossier)"
+            )
+        tracked = tracked_corpus_files(self.source)
+        before_units = self.units_by_key
+        before_strats = self.stratagems
+        files = {}
+        with string_scope(self.strings) as pool:
+            for name, path in tracked.items():
+                old = self.files.get(name)
+                fp = file_fingerprint(path, with_hash=False)
+                if old is not None and old.fingerprint == fp:
+                    files[name] = old
+                    continue
+                (changes.files_changed if old else changes.files_added).append(name)
+                files[name] = _load_corpus_file(path, name, self.detachments)
+        self.strings = pool
+        changes.files_removed = sorted(set(self.files) - set(tracked))
+        if not changes:
+            return changes
+        self.files = files
+        self._merge(files[n] for n in sorted(files))
+        self.validation = cached_validation(self.source)
+        after = self.units_by_key
+        changes.units_added = sorted(after[k].name for k in after.keys() - before_units)
+        changes.units_removed = sorted(
+            before_units[k].name for k in before_units.keys() - after
+        )
+        changes.units_modified = sorted(
+            after[k].name
+            for k in after.keys() & before_units
+            if after[k] is not before_units[k] and after[k] != before_units[k]
+        )
+        changes.stratagems_changed = self.stratagems != before_strats
+        return changes
+
+
+# Fichiers identiques (même sha256) : un seul jeu d'enregistrements, partagé tant
+# qu'au moins un corpus le référence (chaque copie garde son `origin` vivant).
+_SHARED_FILES: "weakref.WeakValueDictionary[str, CorpusFile]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _load_corpus_file(path: Path, name: str, detachments=None, doc=None) -> CorpusFile:
+    """
+    Charge une entrée suivie. Les stratagèmes d'un corpus restreint (ou d'un
+    dossier en shards) passent par load_dir_stratagems, comme au chargement ;
+    les autres fichiers sont partagés par contenu entre dossiers.
+    """
+    fp = file_fingerprint(path, with_hash=False)
+    if name == SHARDS_DIR or (name == STRATAGEMS_FILE and detachments):
+        yaml_dir = path.parent.parent if name == SHARDS_DIR else path.parent
+        strats = load_dir_stratagems(yaml_dir, detachments)
+        return CorpusFile(fp, stratagems=[Stratagem.from_dict(st) for st in strats])
+    raw = path.read_bytes()
+    sha = hashlib.sha256(raw).hexdigest()
+    shared = _SHARED_FILES.get(sha)
+    if shared is not None:
+        return CorpusFile(
+            fp, shared.units, shared.stratagems, shared.extras, sha, str(path), shared
+        )
+    if doc is None:
+        doc = load_yaml_file(path, raw=raw)
+    part = CorpusFile.from_doc(doc, fp, sha)
+    part.path = str(path)
+    _SHARED_FILES[sha] = part
+    return part
+
+
+def _dedup_stats(files) -> dict:
+    """Fichiers d'un chargement dont les enregistrements viennent d'un autre dossier."""
+    shared = [f for f in files if f.shared_across_dirs()]
+    return {
+        "files": len(shared),
+        "bytes": sum(f.fingerprint["size"] for f in shared),
+        "objects": sum(len(f.units) + len(f.stratagems) for f in shared),
+    }
+
+
+def content_dedup_report(yaml_dirs, corpora=()) -> dict:
+    """
+    Fichiers YAML identiques entre dossiers (par sha256), octets qu'ils
+    représentent en double, et ce que les chargements `corpora` ont
+    effectivement repris d'un autre dossier.
+    """
+    groups: dict[str, list[Path]] = defaultdict(list)
+    for d in yaml_dirs:
+        for p in yaml_paths(d):
+            groups[sha256_file(p)].append(p)
+    dups = [ps for ps in groups.values() if len(ps) > 1]
+    return {
+        "files": sum(len(ps) for ps in groups.values()),
+        "unique": len(groups),
+        "duplicates": [[str(p) for p in ps] for ps in dups],
+        "duplicate_bytes": sum(ps[0].stat().st_size * (len(ps) - 1) for ps in dups),
+        "shared": {
+            k: sum((c.dedup or {}).get(k, 0) for c in corpora)
+            for k in ("files", "bytes", "objects")
+        },
+    }
+
+
+def load_dir_corpus(
+    yaml_dir, detachments: set[str] | None = None, use_snapshot: bool = True
+) -> Corpus:
+    """
+    Les fichiers d'un seul dossier (sans ses couches parentes). Le corpus
+    obtenu peut ensuite être rafraîchi avec Corpus.refresh().
+    """
+    with string_scope() as pool:
+        docs = read_snapshot(yaml_dir) if use_snapshot else None
+        if docs is None and use_snapshot and os.access(yaml_dir, os.W_OK):
+            docs = load_yaml_docs(yaml_dir)  # re-parse + régénère le snapshot
+        if docs is None:
+            # Pas de snapshot : on ne construit que les stratagèmes du détachement.
+            docs = parse_yaml_docs(yaml_dir, exclude={STRATAGEMS_FILE})
+        by_name = dict(docs)
+        restrict = (
+            frozenset(detachments)
+            if detachments and STRATAGEMS_FILE not in by_name
+            else None
+        )
+        files = {}
+        for name, path in tracked_corpus_files(yaml_dir).items():
+            if name in by_name:
+                files[name] = _load_corpus_file(path, name, doc=by_name[name])
+            else:
+                files[name] = _load_corpus_file(path, name, restrict)
+    corpus = Corpus(
+        [], {}, {}, {}, [], source=str(yaml_dir), detachments=restrict, files=files
+    )
+    corpus.strings = pool
+    corpus._merge(files[n] for n in sorted(files))
+    corpus.dedup = _dedup_stats(files.values())
+    if sorted(by_name) == sorted(files):  # tout est parsé : validation gratuite
+        corpus.validation = validate_corpus_dir(yaml_dir, docs)
+    else:
+        corpus.validation = cached_validation(yaml_dir)
+    return corpus
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archive compressée d'un dossier data_* (pack -> .c40k.zip) : les YAML, les
+stratagèmes découpés par détachement et un index, lus membre par membre.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import zipfile
+
+from corpus import Corpus, fuzzy_find
+from corpus_docs import TWIN_SUFFIX, doc_names, twin_decode, twin_encode, yaml_load
+from corpus_snapshot import parse_yaml_docs
+from corpus_validation import validate_docs
+from export_parser import NameIndex, normalize_name
+from layers import is_layered
+from stratagem_store import (
+    SHARDS_DIR,
+    STRATAGEMS_FILE,
+    load_dir_stratagems,
+    shard_groups,
+)
+
+
+# -----------------------------
+# Archive compressée d'un dossier data_*
+# -----------------------------
+# `pack data_SM` -> data_SM.c40k.zip (ZIP_LZMA) : les YAML du dossier, les
+# stratagèmes découpés par détachement (shards JSON) et un index (index.json) :
+# clé d'unité -> membres, membres définissant phases / faction_helpers,
+# détachement -> shard. Les loaders lisent les membres utiles directement dans
+# l'archive, sans rien extraire ; une nouvelle archive remplace l'ancienne d'un
+# seul os.replace.
+ARCHIVE_SUFFIX = ".c40k.zip"
+ARCHIVE_INDEX = "index.json"
+ARCHIVE_SHARDS = "shards/"
+ARCHIVE_VERSION = 1
+
+
+def is_archive(path) -> bool:
+    return str(path).endswith(ARCHIVE_SUFFIX) and Path(path).is_file()
+
+
+def pack_data_dir(yaml_dir, out=None) -> Path:
+    """Empaquette un dossier data_* (sans couches) dans une archive unique."""
+    if is_layered(yaml_dir):
+        raise ValueError(f"{yaml_dir} : dossier en couches, non empaquetable")
+    src = Path(yaml_dir).resolve()
+    out = Path(out) if out else src.with_name(src.name + ARCHIVE_SUFFIX)
+    docs = parse_yaml_docs(src)
+    index = {
+        "version": ARCHIVE_VERSION,
+        "source": src.name,
+        "files": {},
+        "units": {},
+        "extras": {},
+        "shards": {},
+    }
+    strats = [
+        st for _n, d in docs if isinstance(d, dict) for st in d.get("stratagems") or []
+    ]
+    checked = docs
+    if not any(n == STRATAGEMS_FILE for n, _d in docs):
+        strats += load_dir_stratagems(src)  # dossier ne contenant que des shards
+        checked = docs + [(SHARDS_DIR, {"stratagems": strats})]
+    tmp = out.with_name(out.name + ".tmp")
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_LZMA) as zf:
+        for name, doc in docs:
+            raw = (src / name).read_bytes()
+            zf.writestr(name, raw)
+            index["files"][name] = {
+                "size": len(raw),
+                "sha256": hashlib.sha256(raw).hexdigest(),
+            }
+            if not isinstance(doc, dict):
+                continue
+            extras = [k for k in ("phases", "faction_helpers") if k in doc]
+            if extras:
+                index["extras"][name] = extras
+            for kind, values in doc_names(doc).items():
+                names = index.setdefault("names", {}).setdefault(kind, [])
+                names += [v for v in values if v not in names]
+            for u in doc.get("units") if isinstance(doc.get("units"), list) else []:
+                if isinstance(u, dict) and u.get("name"):
+                    members = index["units"].setdefault(normalize_name(u["name"]), [])
+                    if name not in members:
+                        members.append(name)
+        for det, (fname, idx) in shard_groups(strats).items():
+            member = ARCHIVE_SHARDS + Path(fname).stem + TWIN_SUFFIX
+            shard = {"source_index": idx, "stratagems": [strats[i] for i in idx]}
+            zf.writestr(member, json.dumps(twin_encode(shard), ensure_ascii=False))
+            index["shards"][det] = member
+        version = json.dumps(index["files"], sort_keys=True).encode("utf-8")
+        index["validation"] = {
+            "version": hashlib.sha256(version).hexdigest(),
+            "source": src.name,
+        } | validate_docs(checked)
+        zf.writestr(ARCHIVE_INDEX, json.dumps(index, ensure_ascii=False, indent=1))
+    os.replace(tmp, out)
+    return out
+
+
+class CorpusArchive:
+    """Lecture d'une archive de pack_data_dir, membre par membre."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.zf = zipfile.ZipFile(self.path)
+        try:
+            self.index = json.loads(self.zf.read(ARCHIVE_INDEX).decode("utf-8"))
+        except KeyError:
+            self.index = {}
+        if self.index.get("version") != ARCHIVE_VERSION:
+            self.zf.close()
+            raise ValueError(f"Archive non supportée : {self.path}")
+
+    def close(self):
+        self.zf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read_doc(self, member: str):
+        return yaml_load(self.zf.read(member).decode("utf-8")) or {}
+
+    def unit_keys(self) -> list[str]:
+        return list(self.index["units"])
+
+    def names(self) -> NameIndex:
+        """Noms relevés au pack (archives antérieures : détachements des shards)."""
+        names = self.index.get("names") or {}
+        return NameIndex(
+            [d for d in self.index["shards"] if d != "All"]
+            + list(names.get("detachments", ())),
+            names.get("factions", ()),
+        )
+
+    def stratagems(self, detachments: set[str] | None = None) -> list[dict]:
+        """Stratagèmes des shards utiles (tous si `detachments` vaut None)."""
+        shards = self.index["shards"]
+        names = (
+            list(shards)
+            if not detachments
+            else ["All"] + [d for d in sorted(detachments) if d != "All"]
+        )
+        picked: dict[int, dict] = {}
+        for det in names:
+            if det not in shards:
+                continue
+            data = json.loads(self.zf.read(shards[det]), object_hook=twin_decode)
+            for i, st in zip(data["source_index"], data["stratagems"]):
+                picked.setdefault(i, st)
+        return [picked[i] for i in sorted(picked)]
+
+    def docs(self, keys=None) -> list[dict]:
+        """
+        Documents sans leurs stratagèmes : les membres qui définissent une unité
+        de `keys` (toutes si None) et le premier membre définissant phases /
+        faction_helpers, dans l'ordre des noms et restreints aux unités voulues.
+        """
+        members = set()
+        for extra in ("phases", "faction_helpers"):
+            first = next(
+                (
+                    m
+                    for m in sorted(self.index["extras"])
+                    if extra in self.index["extras"][m]
+                ),
+                None,
+            )
+            if first:
+                members.add(first)
+        if keys is None:
+            members.update(self.index["files"])
+        else:
+            for k in keys:
+                members.update(self.index["units"].get(k, ()))
+        docs = []
+        for member in sorted(members):
+            doc = self.read_doc(member)
+            if not isinstance(doc, dict):
+                continue
+            doc = {k: v for k, v in doc.items() if k != "stratagems"}
+            if keys is not None and isinstance(doc.get("units"), list):
+                doc["units"] = [
+                    u
+                    for u in doc["units"]
+                    if isinstance(u, dict)
+                    and u.get("name")
+                    and normalize_name(u["name"]) in keys
+                ]
+            docs.append(doc)
+        return docs
+
+    def corpus(self, keys=None, detachments: set[str] | None = None) -> Corpus:
+        corpus = Corpus.from_docs(
+            self.docs(keys),
+            self.path,
+            self.stratagems(detachments),
+            detachments or None,
+        )
+        corpus.validation = self.index.get("validation")  # calculée au pack
+        return corpus
+
+    def corpus_for_export(self, listed: dict, detachments=None) -> Corpus:
+        """Corpus limité aux unités de l'export (fuzzy compris) et au détachement."""
+        all_keys = dict.fromkeys(self.unit_keys())
+        keys = {fuzzy_find(k, all_keys, cutoff=0.72)[0] for k in listed}
+        keys.discard(None)
+        return self.corpus(keys, detachments)
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backend SQLite optionnel (build-db) : plusieurs dossiers data_* dans une base
+indexée, d'où une fiche ne relit que les unités et stratagèmes utiles.
+"""
+
+import json
+from pathlib import Path
+import sqlite3
+import sys
+
+from corpus import Corpus, fuzzy_find
+from corpus_docs import file_fingerprint, fingerprints_fresh
+from corpus_snapshot import parse_yaml_docs
+from export_parser import NameIndex, normalize_name
+from layers import is_layered
+from models import Stratagem, Unit, dumps_data, loads_data
+from stratagem_store import STRATAGEMS_FILE, load_dir_stratagems, tracked_corpus_files
+
+
+# -----------------------------
+# Backend SQLite (optionnel)
+# -----------------------------
+
+# Une base peut contenir plusieurs dossiers data_* ("sources", identifiées par
+# le nom du dossier, l'en-tête gardant son chemin d'import : deux dossiers
+# homonymes ne se remplacent pas). Les enregistrements sont stockés en JSON
+# (models.dumps_data), les colonnes indexées ne servent qu'à sélectionner les
+# lignes utiles à une fiche.
+DB_VERSION = 2
+DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    header TEXT NOT NULL,
+    phases BLOB,
+    faction_helpers BLOB
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    role TEXT,
+    faction TEXT,
+    detachment TEXT,
+    doc BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS units_key ON units(source_id, key);
+CREATE TABLE IF NOT EXISTS unit_keywords (
+    unit_id INTEGER NOT NULL REFERENCES units(id) ON DELETE CASCADE,
+    keyword TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS unit_keywords_keyword ON unit_keywords(keyword, unit_id);
+CREATE TABLE IF NOT EXISTS stratagems (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
+    source_index INTEGER NOT NULL,
+    name TEXT,
+    doc BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stratagems_source ON stratagems(source_id, source_index);
+CREATE TABLE IF NOT EXISTS stratagem_detachments (
+    stratagem_id INTEGER NOT NULL REFERENCES stratagems(id) ON DELETE CASCADE,
+    detachment TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stratagem_detachments_detachment
+    ON stratagem_detachments(detachment, stratagem_id);
+CREATE TABLE IF NOT EXISTS stratagem_windows (
+    stratagem_id INTEGER NOT NULL REFERENCES stratagems(id) ON DELETE CASCADE,
+    phase TEXT,
+    step TEXT,
+    player TEXT
+);
+CREATE INDEX IF NOT EXISTS stratagem_windows_timing
+    ON stratagem_windows(phase, step, player, stratagem_id);
+"""
+
+
+def _db_blob(obj) -> bytes:
+    return dumps_data(obj).encode("utf-8")
+
+
+def _db_source_name(yaml_dir) -> str:
+    return Path(yaml_dir).resolve().name
+
+
+def _db_homonym(header: dict, yaml_dir) -> str | None:
+    """
+    Chemin d'un autre dossier de même nom d'où vient la source, s'il existe
+    toujours ; None si c'est ce dossier (ou s'il a été déplacé / non déployé).
+    """
+    here = Path(yaml_dir).resolve()
+    stored = header.get("path")
+    if stored and stored != str(here) and Path(stored).is_dir() and here.is_dir():
+        return stored
+    return None
+
+
+def open_corpus_db(db_path) -> "CorpusDB | None":
+    """
+    Base en lecture seule, ou None (avec un avertissement) si elle est absente,
+    d'une autre version ou illisible : l'appelant relit alors les YAML.
+    """
+    try:
+        return CorpusDB(db_path)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(
+            f"⚠️ Base {db_path} inutilisable ({e}) : lecture des YAML.", file=sys.stderr
+        )
+        return None
+
+
+class CorpusDB:
+    """
+    Couche de requêtes sur la base SQLite. `corpus()` reconstruit un Corpus
+    (complet, ou restreint à quelques unités / détachements) sans relire de YAML.
+    """
+
+    def __init__(self, db_path, readonly: bool = True):
+        self.path = Path(db_path)
+        if readonly:
+            if not self.path.is_file():
+                raise FileNotFoundError(f"Base introuvable : {self.path}")
+            self.conn = sqlite3.connect(
+                f"{self.path.resolve().as_uri()}?mode=ro", uri=True
+            )
+        else:
+            self.conn = sqlite3.connect(self.path)
+            self.conn.execute("PRAGMA foreign_keys = ON")
+            self.conn.executescript(DB_SCHEMA)
+            row = self.conn.execute(
+                "SELECT value FROM meta WHERE key='version'"
+            ).fetchone()
+            if row is not None and int(row[0]) != DB_VERSION:
+                # ancien encodage des documents : tout est réimporté
+                with self.conn:
+                    self.conn.execute("DELETE FROM sources")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(DB_VERSION),)
+            )
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        row = self.conn.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+        if row is None or int(row[0]) != DB_VERSION:
+            self.conn.close()
+            raise ValueError(f"Version de base non supportée : {self.path}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- écriture ---
+
+    def add_source(self, yaml_dir) -> int:
+        """
+        (Ré)importe un dossier data_* ; remplace la source de même nom, sauf si
+        elle vient d'un autre dossier homonyme toujours présent (ValueError).
+        """
+        existing = self._header(yaml_dir)
+        other = _db_homonym(existing, yaml_dir) if existing else None
+        if other:
+            raise ValueError(
+                f"{_db_source_name(yaml_dir)} déjà importé depuis {other} dans {self.path}"
+            )
+        docs = parse_yaml_docs(yaml_dir)
+        header = {
+            "path": str(Path(yaml_dir).resolve()),
+            "files": {
+                name: file_fingerprint(p)
+                for name, p in tracked_corpus_files(yaml_dir).items()
+            },
+        }
+        dicts = [d for _n, d in docs if isinstance(d, dict)]
+        phases = next((d["phases"] for d in dicts if "phases" in d), None)
+        helpers = next(
+            (d["faction_helpers"] for d in dicts if "faction_helpers" in d), None
+        )
+        if any(n == STRATAGEMS_FILE for n, _d in docs):
+            strats = [st for d in dicts for st in d.get("stratagems") or []]
+        else:
+            strats = load_dir_stratagems(yaml_dir)
+        name = _db_source_name(yaml_dir)
+        with self.conn:
+            self.conn.execute("DELETE FROM sources WHERE name = ?", (name,))
+            sid = self.conn.execute(
+                "INSERT INTO sources (name, header, phases, faction_helpers) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    name,
+                    json.dumps(header, sort_keys=True),
+                    _db_blob(phases),
+                    _db_blob(helpers),
+                ),
+            ).lastrowid
+            for d in dicts:
+                if not isinstance(d.get("units"), list):
+                    continue
+                for u in d["units"]:
+                    if not (isinstance(u, dict) and u.get("name")):
+                        continue
+                    rec = Unit.from_dict(u)
+                    uid = self.conn.execute(
+                        "INSERT INTO units (source_id, key, name, role, faction, "
+                        "detachment, doc) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            sid,
+                            normalize_name(rec.name),
+                            rec.name,
+                            rec.role,
+                            rec.faction,
+                            rec.detachment,
+                            _db_blob(u),
+                        ),
+                    ).lastrowid
+                    self.conn.executemany(
+                        "INSERT INTO unit_keywords VALUES (?, ?)",
+                        [(uid, str(k)) for k in rec.keywords],
+                    )
+            for i, st in enumerate(strats):
+                rec = Stratagem.from_dict(st)
+                stid = self.conn.execute(
+                    "INSERT INTO stratagems (source_id, source_index, name, doc) "
+                    "VALUES (?, ?, ?, ?)",
+                    (sid, i, rec.name, _db_blob(st)),
+                ).lastrowid
+                self.conn.executemany(
+                    "INSERT INTO stratagem_detachments VALUES (?, ?)",
+                    [(stid, str(d)) for d in rec.detachment],
+                )
+                self.conn.executemany(
+                    "INSERT INTO stratagem_windows VALUES (?, ?, ?, ?)",
+                    [(stid, w.phase, w.step, w.player) for w in rec.when],
+                )
+        return sid
+
+    # --- lecture ---
+
+    def _header(self, yaml_dir) -> dict | None:
+        row = self.conn.execute(
+            "SELECT header FROM sources WHERE name = ?", (_db_source_name(yaml_dir),)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def source_id(self, yaml_dir) -> int:
+        row = self.conn.execute(
+            "SELECT id, header FROM sources WHERE name = ?",
+            (_db_source_name(yaml_dir),),
+        ).fetchone()
+        if row is None or _db_homonym(json.loads(row[1]), yaml_dir):
+            raise KeyError(f"{_db_source_name(yaml_dir)} absent de {self.path}")
+        return row[0]
+
+    def is_fresh(self, yaml_dir) -> bool:
+        """
+        Vrai si la source vient de ce dossier et correspond à ses fichiers suivis
+        (*.yaml, ou manifest des shards). Un dossier absent (déploiement qui
+        n'embarque que la base) est considéré à jour ; un dossier vidé, non.
+        """
+        header = self._header(yaml_dir)
+        if header is None or _db_homonym(header, yaml_dir):
+            return False
+        if not Path(yaml_dir).is_dir():
+            return True
+        tracked = tracked_corpus_files(yaml_dir)
+        names = {p: name for name, p in tracked.items()}
+        return fingerprints_fresh(header, list(tracked.values()), key=names.get)
+
+    def names(self, yaml_dir) -> NameIndex:
+        """Détachements et factions d'une source, par les tables indexées."""
+        sid = self.source_id(yaml_dir)
+        dets = self.conn.execute(
+            "SELECT DISTINCT d.detachment FROM stratagem_detachments d"
+            " JOIN stratagems s ON s.id = d.stratagem_id"
+            " WHERE s.source_id = ? AND d.detachment != 'All'"
+            " UNION SELECT DISTINCT detachment FROM units"
+            " WHERE source_id = ? AND detachment IS NOT NULL",
+            (sid, sid),
+        ).fetchall()
+        factions = self.conn.execute(
+            "SELECT DISTINCT faction FROM units"
+            " WHERE source_id = ? AND faction IS NOT NULL",
+            (sid,),
+        ).fetchall()
+        return NameIndex([d for (d,) in dets], [f for (f,) in factions])
+
+    def unit_keys(self, sid: int) -> list[str]:
+        return [
+            k
+            for (k,) in self.conn.execute(
+                "SELECT DISTINCT key FROM units WHERE source_id = ?", (sid,)
+            )
+        ]
+
+    def unit_docs(self, sid: int, keys=None) -> list[dict]:
+        """Documents d'unités, dans l'ordre d'import (toutes si `keys` vaut None)."""
+        sql = "SELECT doc FROM units WHERE source_id = ?"
+        params: list = [sid]
+        if keys is not None:
+            keys = list(keys)
+            sql += f" AND key IN ({','.join('?' * len(keys))})"
+            params += keys
+        return [
+            loads_data(b) for (b,) in self.conn.execute(sql + " ORDER BY id", params)
+        ]
+
+    def units_with_keyword(self, sid: int, keyword: str) -> list[str]:
+        return [
+            n
+            for (n,) in self.conn.execute(
+                "SELECT u.name FROM units u JOIN unit_keywords k ON k.unit_id = u.id "
+                "WHERE u.source_id = ? AND k.keyword = ? ORDER BY u.id",
+                (sid, keyword),
+            )
+        ]
+
+    def stratagem_docs(
+        self, sid: int, detachments=None, phase=None, step=None, player=None
+    ) -> list[dict]:
+        """
+        Stratagèmes d'une source dans l'ordre du YAML, restreints aux
+        `detachments` (+ "All") et/ou à une fenêtre de timing.
+        """
+        sql = "SELECT s.doc FROM stratagems s WHERE s.source_id = ?"
+        params: list = [sid]
+        if detachments is not None:
+            wanted = sorted(set(detachments) | {"All"})
+            sql += (
+                " AND s.id IN (SELECT stratagem_id FROM stratagem_detachments "
+                f"WHERE detachment IN ({','.join('?' * len(wanted))}))"
+            )
+            params += wanted
+        timing = [
+            (c, v)
+            for c, v in (("phase", phase), ("step", step), ("player", player))
+            if v
+        ]
+        if timing:
+            sql += " AND s.id IN (SELECT stratagem_id FROM stratagem_windows WHERE "
+            sql += " AND ".join(f"{c} = ?" for c, _v in timing) + ")"
+            params += [v for _c, v in timing]
+        rows = self.conn.execute(sql + " ORDER BY s.source_index", params)
+        return [loads_data(b) for (b,) in rows]
+
+    def corpus(self, yaml_dir, keys=None, detachments=None) -> Corpus:
+        sid = self.source_id(yaml_dir)
+        row = self.conn.execute(
+            "SELECT phases, faction_helpers FROM sources WHERE id = ?", (sid,)
+        ).fetchone()
+        phases, helpers = (loads_data(b) for b in row)
+        docs = [{"units": self.unit_docs(sid, keys)}]
+        if phases is not None:
+            docs.append({"phases": phases})
+        if helpers is not None:
+            docs.append({"faction_helpers": helpers})
+        return Corpus.from_docs(
+            docs,
+            yaml_dir,
+            self.stratagem_docs(sid, detachments),
+            detachments or None,
+        )
+
+    def corpus_for_export(self, yaml_dir, listed: dict, detachments=None) -> Corpus:
+        """
+        Corpus restreint à ce qu'une fiche utilise : les unités listées
+        (résolues comme build_sheet, fuzzy compris) et le détachement détecté.
+        """
+        sid = self.source_id(yaml_dir)
+        all_keys = dict.fromkeys(self.unit_keys(sid))
+        keys = {fuzzy_find(k, all_keys, cutoff=0.72)[0] for k in listed}
+        keys.discard(None)
+        return self.corpus(yaml_dir, keys, detachments)
+
+
+def build_corpus_db(db_path, yaml_dirs) -> Path:
+    with CorpusDB(db_path, readonly=False) as db:
+        for d in yaml_dirs:
+            if is_layered(d):
+                print(
+                    f"⚠️ {d} : dossier en couches, ignoré par build-db.", file=sys.stderr
+                )
+                continue
+            db.add_source(d)
+        db.conn.execute("VACUUM")
+    return Path(db_path)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Documents YAML d'un dossier data_* : chargement (fast_yaml, repli libyaml ou
+PyYAML), jumeaux JSON régénérés à la volée, liste et empreintes des fichiers
+d'un dossier, noms (détachements, factions) qu'un document apporte.
+
+Base commune des autres modules du corpus, qui n'importe aucun d'eux.
+"""
+
+import glob
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import yaml
+
+# libyaml (C) si PyYAML a été compilé avec, sinon le loader pur Python.
+try:
+    from yaml import CSafeLoader as YamlLoader  # type: ignore
+except ImportError:
+    from yaml import SafeLoader as YamlLoader  # type: ignore
+
+import fast_yaml  # noqa: E402
+
+YAML_C_LOADER = YamlLoader is not yaml.SafeLoader
+LAYERS_FILE = "layers.yaml"  # manifeste d'un dossier en couches (voir layers.py)
+
+
+def yaml_load(stream, loader=None):
+    """
+    Equivalent de yaml.safe_load. Par défaut : parseur spécialisé fast_yaml,
+    puis libyaml (ou PyYAML pur) pour tout ce qui sort de son sous-ensemble.
+    """
+    if loader is not None:
+        return yaml.load(stream, Loader=loader)
+    return fast_yaml.load(stream, fallback_loader=YamlLoader)
+
+
+# -----------------------------
+# Jumeaux JSON des fichiers YAML
+# -----------------------------
+# On continue d'éditer le YAML ; à côté de chaque fichier, un jumeau .json
+# (généré) garde le sha256 de sa source sur la 1re ligne et les données sur la
+# 2e. json.loads étant bien plus rapide que PyYAML, on lit le jumeau tant que le
+# hash correspond, sinon on re-parse le YAML et on régénère le jumeau.
+# Les mappings à clés non-str (ex: play_tips.per_turn {1: [...]}) sont encodés
+# en {"__items__": [[clé, valeur], ...]} pour survivre à l'aller-retour.
+
+TWIN_SUFFIX = ".json"
+TWIN_VERSION = 1
+_TWIN_ITEMS = "__items__"
+
+
+def twin_path(yaml_path) -> Path:
+    return Path(yaml_path).with_suffix(TWIN_SUFFIX)
+
+
+def twin_encode(obj):
+    if isinstance(obj, dict):
+        if _TWIN_ITEMS not in obj and all(isinstance(k, str) for k in obj):
+            return {k: twin_encode(v) for k, v in obj.items()}
+        return {_TWIN_ITEMS: [[k, twin_encode(v)] for k, v in obj.items()]}
+    if isinstance(obj, list):
+        return [twin_encode(v) for v in obj]
+    return obj
+
+
+def twin_decode(d: dict):
+    if len(d) == 1 and _TWIN_ITEMS in d:
+        return {k: v for k, v in d[_TWIN_ITEMS]}
+    return d
+
+
+def read_twin(yaml_path, source_sha256: str | None = None):
+    """Données du jumeau JSON s'il correspond au YAML actuel, sinon None."""
+    path = twin_path(yaml_path)
+    if not path.is_file():
+        return None
+    if source_sha256 is None:
+        source_sha256 = hashlib.sha256(Path(yaml_path).read_bytes()).hexdigest()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if (
+                header.get("version") != TWIN_VERSION
+                or header.get("source_sha256") != source_sha256
+            ):
+                return None
+            hook = twin_decode if header.get("tagged") else None
+            return json.loads(f.read(), object_hook=hook)
+    except (OSError, ValueError):
+        return None
+
+
+def write_twin(yaml_path, data, source_sha256: str) -> Path | None:
+    """
+    Écrit le jumeau JSON. Retourne None (et supprime un éventuel jumeau périmé)
+    si les données ne survivent pas à l'aller-retour JSON (dates, etc.).
+    """
+    path = twin_path(yaml_path)
+    encoded = twin_encode(data)
+    tagged = encoded != data
+    try:
+        raw = json.dumps(encoded, ensure_ascii=False, separators=(",", ":"))
+        hook = twin_decode if tagged else None
+        if json.loads(raw, object_hook=hook) != data:
+            raise ValueError("aller-retour JSON non fidèle")
+    except (TypeError, ValueError):
+        path.unlink(missing_ok=True)
+        return None
+    header = {"version": TWIN_VERSION, "source_sha256": source_sha256}
+    if tagged:
+        header["tagged"] = True
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n" + raw)
+    os.replace(tmp, path)
+    return path
+
+
+def load_yaml_file(yaml_path, use_twin: bool = True, raw: bytes | None = None):
+    """Un document YAML, via son jumeau JSON s'il est à jour (régénéré sinon)."""
+    if raw is None:
+        raw = Path(yaml_path).read_bytes()
+    sha = hashlib.sha256(raw).hexdigest() if use_twin else None
+    if use_twin:
+        data = read_twin(yaml_path, sha)
+        if data is not None:
+            return data
+    data = yaml_load(raw.decode("utf-8")) or {}
+    if use_twin:
+        try:
+            write_twin(yaml_path, data, sha)
+        except OSError:
+            pass
+    return data
+
+
+# -----------------------------
+# Fichiers d'un dossier et empreintes
+# -----------------------------
+def yaml_paths(yaml_dir) -> list[Path]:
+    return [
+        Path(p)
+        for p in sorted(glob.glob(os.path.join(yaml_dir, "*.yaml")))
+        if os.path.basename(p) != LAYERS_FILE
+    ]
+
+
+def sha256_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def file_fingerprint(path: Path, with_hash: bool = True) -> dict:
+    st = path.stat()
+    fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_hash:
+        fp["sha256"] = sha256_file(path)
+    return fp
+
+
+def fingerprints_fresh(header: dict, paths: list[Path], key=None) -> bool:
+    """
+    Vrai si les empreintes `files` d'un en-tête (snapshot, index, base...)
+    correspondent toujours à `paths`. `key` : nom d'un fichier dans l'en-tête
+    (défaut : son nom de base).
+    """
+    key = key or (lambda p: p.name)
+    recorded = header.get("files") or {}
+    if sorted(recorded) != sorted(key(p) for p in paths):
+        return False
+    for p in paths:
+        rec = recorded[key(p)]
+        cur = file_fingerprint(p, with_hash=False)
+        if cur["size"] != rec["size"]:
+            return False
+        # mtime identique -> on fait confiance ; sinon on tranche par le contenu
+        if cur["mtime_ns"] != rec["mtime_ns"] and sha256_file(p) != rec["sha256"]:
+            return False
+    return True
+
+
+def doc_names(doc) -> dict[str, list[str]]:
+    """Noms cités par un document YAML brut (mêmes champs que corpus_names)."""
+    dets: dict[str, None] = {}
+    factions: dict[str, None] = {}
+    if isinstance(doc, dict):
+        for st in doc.get("stratagems") or []:
+            if isinstance(st, dict):
+                dets.update((d, None) for d in st.get("detachment") or () if d != "All")
+        units = doc.get("units") if isinstance(doc.get("units"), list) else []
+        for u in units:
+            ab = (u.get("abilities") if isinstance(u, dict) else None) or {}
+            if isinstance(ab, dict):
+                if ab.get("detachment"):
+                    dets[ab["detachment"]] = None
+                if ab.get("faction"):
+                    factions[ab["faction"]] = None
+    return {"detachments": list(dets), "factions": list(factions)}
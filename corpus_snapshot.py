@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot compilé d'un dossier data_* (.corpus.snapshot) : tous les documents
+déjà parsés dans un seul fichier, relu tant que les empreintes des YAML
+correspondent ; sinon parse des YAML (en parallèle au-delà d'une taille).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+from pathlib import Path
+
+from corpus_docs import file_fingerprint, fingerprints_fresh, load_yaml_file, yaml_paths
+from models import decode_hook, encode_data
+
+
+# -----------------------------
+# Snapshot compilé du corpus
+# -----------------------------
+# Un dossier data_* est "compilé" en un fichier binaire unique (.corpus.snapshot)
+# contenant tous les documents YAML déjà parsés. L'en-tête (JSON) garde
+# l'empreinte de chaque source (taille, mtime, sha256) : tant qu'elle correspond,
+# on relit les documents (JSON, encodés par models.encode_data : jamais de
+# pickle, le dossier peut être inscriptible par d'autres) au lieu du YAML.
+
+SNAPSHOT_NAME = ".corpus.snapshot"
+SNAPSHOT_MAGIC = b"C40KSNAP"
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_path(yaml_dir) -> Path:
+    return Path(yaml_dir, SNAPSHOT_NAME)
+
+
+def _read_snapshot_header(f) -> dict | None:
+    if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+        return None
+    version = int.from_bytes(f.read(2), "big")
+    if version != SNAPSHOT_VERSION:
+        return None
+    size = int.from_bytes(f.read(4), "big")
+    return json.loads(f.read(size).decode("utf-8"))
+
+
+def snapshot_is_fresh(yaml_dir) -> bool:
+    """Vrai si le snapshot existe et correspond aux YAML (seul l'en-tête est lu)."""
+    try:
+        with open(snapshot_path(yaml_dir), "rb") as f:
+            header = _read_snapshot_header(f)
+    except (OSError, ValueError):
+        return False
+    return header is not None and fingerprints_fresh(header, yaml_paths(yaml_dir))
+
+
+def read_snapshot(yaml_dir) -> list[tuple[str, object]] | None:
+    """Retourne [(nom_fichier, doc)] depuis le snapshot s'il est à jour, sinon None."""
+    path = snapshot_path(yaml_dir)
+    if not path.is_file():
+        return None
+    try:
+        with open(path, "rb") as f:
+            header = _read_snapshot_header(f)
+            if header is None or not fingerprints_fresh(header, yaml_paths(yaml_dir)):
+                return None
+            hook = decode_hook if header.get("tagged") else None
+            docs = json.loads(f.read(), object_hook=hook)
+    except (OSError, ValueError):
+        return None
+    return [(name, doc) for name, doc in docs]
+
+
+def write_snapshot(yaml_dir, docs: list[tuple[str, object]]) -> Path:
+    """TypeError si un document contient une valeur non encodable (!!binary...)."""
+    encoded = [[name, encode_data(doc)] for name, doc in docs]
+    paths = yaml_paths(yaml_dir)
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "files": {p.name: file_fingerprint(p) for p in paths},
+    }
+    if any(enc != doc for (_name, enc), (_n, doc) in zip(encoded, docs)):
+        header["tagged"] = True
+    raw_header = json.dumps(header, sort_keys=True).encode("utf-8")
+    out = snapshot_path(yaml_dir)
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(SNAPSHOT_VERSION.to_bytes(2, "big"))
+        f.write(len(raw_header).to_bytes(4, "big"))
+        f.write(raw_header)
+        f.write(
+            json.dumps(encoded, ensure_ascii=False, separators=(",", ":")).encode(
+                "utf-8"
+            )
+        )
+    os.replace(tmp, out)
+    return out
+
+
+# Au-delà de cette taille cumulée (octets), les fichiers d'un dossier sont parsés
+# en parallèle dans un pool de processus. Surchargeable via l'environnement.
+PARALLEL_MIN_BYTES = int(os.environ.get("CHEAT_SHEET_PARALLEL_MIN_BYTES", 512 * 1024))
+
+
+def parse_yaml_docs(
+    yaml_dir, exclude=(), parallel_min_bytes: int | None = None
+) -> list[tuple[str, object]]:
+    """
+    Parse tous les *.yaml du dossier (triés par nom). Si leur taille totale
+    dépasse `parallel_min_bytes` et que plusieurs CPU sont disponibles, chaque
+    fichier est parsé dans un worker ; le résultat garde l'ordre des noms, donc
+    la même priorité qu'en série.
+    """
+    paths = [p for p in yaml_paths(yaml_dir) if p.name not in exclude]
+    if parallel_min_bytes is None:
+        parallel_min_bytes = PARALLEL_MIN_BYTES
+    workers = min(len(paths), os.cpu_count() or 1)
+    if workers < 2 or sum(p.stat().st_size for p in paths) < parallel_min_bytes:
+        return [(p.name, load_yaml_file(p)) for p in paths]
+    return parse_yaml_docs_parallel(paths, workers)
+
+
+def parse_yaml_docs_parallel(
+    paths: list[Path], workers: int | None = None, use_twin: bool = True
+):
+    # les gros fichiers partent en premier pour équilibrer les workers
+    by_size = sorted(paths, key=lambda p: p.stat().st_size, reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {p.name: ex.submit(load_yaml_file, p, use_twin) for p in by_size}
+        return [(p.name, futures[p.name].result()) for p in paths]
+
+
+def load_yaml_docs(yaml_dir, use_snapshot: bool = True) -> list[tuple[str, object]]:
+    """
+    Tous les documents YAML d'un dossier, triés par nom de fichier.
+    Préfère le snapshot compilé s'il est à jour ; sinon re-parse et le régénère
+    (silencieusement ignoré si le dossier n'est pas inscriptible).
+    """
+    if use_snapshot:
+        docs = read_snapshot(yaml_dir)
+        if docs is not None:
+            return docs
+    docs = parse_yaml_docs(yaml_dir)
+    if use_snapshot:
+        try:
+            write_snapshot(yaml_dir, docs)
+        except (OSError, TypeError):
+            pass
+    return docs
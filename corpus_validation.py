@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validation des documents d'un dossier contre les descripteurs
+file_descriptor_*.yaml, et rapport mis en cache (.validation.json) tant que
+les fichiers et les règles n'ont pas changé.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+
+from corpus_docs import file_fingerprint, fingerprints_fresh, yaml_load
+from corpus_snapshot import load_yaml_docs
+from models import (
+    PHASES,
+    PHASE_STEPS,
+    PLAYERS,
+    STRATAGEM_TYPES,
+    canonical_phase,
+    canonical_player,
+    canonical_step,
+    canonical_type,
+)
+from stratagem_store import (
+    SHARDS_DIR,
+    STRATAGEMS_FILE,
+    load_dir_stratagems,
+    tracked_corpus_files,
+)
+
+
+# -----------------------------
+# Validation du schéma
+# -----------------------------
+# Les documents d'un dossier sont vérifiés contre file_descriptor_*.yaml quand
+# ils sont tous en main (compilation du snapshot, commande validate, pack) ; le
+# verdict est mis en cache à côté du snapshot (.validation.json, invalidé comme
+# lui) et dans le processus. Les autres chargements (stratagèmes en flux, index
+# des unités, refresh) ne reprennent que ce verdict : ils ne reparsent rien
+# pour valider. Les normalisations
+# (types trimés/canoniques, joueur par défaut, phase en minuscules) sont faites
+# par les enregistrements eux-mêmes (models.py) : le rendu ne revérifie rien.
+VALIDATION_NAME = ".validation.json"
+VALIDATION_VERSION = 3
+SCHEMA_FILES = ("file_descriptor_main+unit.yaml", "file_descriptor_stratagem.yaml")
+
+# Repli si les descripteurs ne sont pas déployés à côté du script.
+_DEFAULT_SCHEMA = {
+    "steps": {phase: list(steps) for phase, steps in PHASE_STEPS.items()},
+    "unit_base": ["M", "T", "Sv", "W", "Ld", "OC"],
+    "stratagem_required": ["name", "cp", "detachment", "type", "when", "effect"],
+}
+_SCHEMA: dict | None = None
+_VALIDATIONS: dict[str, dict] = {}  # dossier -> rapport
+
+
+def load_schema(base_dir=None) -> dict:
+    """
+    Règles tirées des descripteurs : grille phases/steps et stats de base
+    obligatoires (exemple d'unité, champs non nuls) de file_descriptor_main+unit,
+    champs requis du commentaire « Champs REQUIS » de file_descriptor_stratagem.
+    """
+    global _SCHEMA
+    if base_dir is None and _SCHEMA is not None:
+        return _SCHEMA
+    base = Path(base_dir) if base_dir else Path(__file__).resolve().parent
+    schema = {k: v.copy() for k, v in _DEFAULT_SCHEMA.items()}
+    main_path, strat_path = (base / n for n in SCHEMA_FILES)
+    if main_path.is_file():
+        doc = yaml_load(main_path.read_text(encoding="utf-8")) or {}
+        steps = (doc.get("phases") or {}).get("steps")
+        if steps:
+            schema["steps"] = steps
+        example = ((doc.get("units") or [{}])[0] or {}).get("base") or {}
+        if example:
+            schema["unit_base"] = [k for k, v in example.items() if v is not None]
+    if strat_path.is_file():
+        m = re.search(r"Champs REQUIS:\s*(.+)", strat_path.read_text(encoding="utf-8"))
+        if m:
+            schema["stratagem_required"] = [
+                f.strip().removesuffix("[]") for f in m.group(1).split(",")
+            ]
+    if base_dir is None:
+        _SCHEMA = schema
+    return schema
+
+
+def validate_docs(named_docs, schema: dict | None = None) -> dict:
+    """
+    Vérifie [(nom_fichier, doc)] et renvoie un rapport sérialisable en JSON :
+    chaque problème a un niveau (error / warning / fixed), le fichier, un chemin
+    dans le document, un code, l'unité / le stratagème concerné, et la valeur
+    d'origine / corrigée le cas échéant.
+    """
+    schema = schema or load_schema()
+    grid = schema["steps"]
+    issues: list[dict] = []
+    name = item = None
+
+    def add(level, path, code, **values):
+        issues.append(
+            {"level": level, "file": name, "path": path, "code": code, "item": item}
+            | values
+        )
+
+    for name, doc in named_docs:
+        item = None
+        if not isinstance(doc, dict):
+            add("error", "", "not_a_mapping")
+            continue
+        for i, u in enumerate(doc.get("units") or []):
+            path = f"units[{i}]"
+            item = u.get("name") if isinstance(u, dict) else None
+            if not item:
+                add("error", path, "missing_name")
+                continue
+            base = u.get("base")
+            if not isinstance(base, dict):
+                add("warning", f"{path}.base", "missing_base")
+                continue
+            for k in schema["unit_base"]:
+                if base.get(k) is None:
+                    add("warning", f"{path}.base.{k}", "missing_stat")
+        for i, st in enumerate(doc.get("stratagems") or []):
+            path = f"stratagems[{i}]"
+            item = st.get("name") if isinstance(st, dict) else None
+            if not isinstance(st, dict):
+                add("error", path, "not_a_mapping")
+                continue
+            for f in schema["stratagem_required"]:
+                if st.get(f) in (None, "", []):
+                    add("error", f"{path}.{f}", "missing_field")
+            cp = st.get("cp", 0)
+            if isinstance(cp, bool) or not isinstance(cp, int):
+                add("warning", f"{path}.cp", "cp_not_int", value=cp)
+            t = st.get("type")
+            if isinstance(t, str):
+                fixed = canonical_type(t)
+                if fixed not in STRATAGEM_TYPES:
+                    add("error", f"{path}.type", "unknown_type", value=t)
+                elif fixed != t:
+                    add(
+                        "fixed", f"{path}.type", "normalized_type", value=t, fixed=fixed
+                    )
+            for j, w in enumerate(st.get("when") or []):
+                wpath = f"{path}.when[{j}]"
+                if not isinstance(w, dict):
+                    add("error", wpath, "not_a_mapping")
+                    continue
+                who = w.get("player")
+                fixed = canonical_player(who)
+                if who is None:
+                    add("fixed", f"{wpath}.player", "missing_player", fixed=fixed)
+                elif fixed != who:
+                    known = str(who).strip().lower() in PLAYERS
+                    code = "normalized_player" if known else "unknown_player"
+                    level = "fixed" if known else "error"
+                    add(level, f"{wpath}.player", code, value=who, fixed=fixed)
+                phase = w.get("phase", "command")
+                fixed = canonical_phase(phase)
+                if fixed not in PHASES:
+                    add("error", f"{wpath}.phase", "unknown_phase", value=phase)
+                    continue
+                if fixed != phase:
+                    add(
+                        "fixed",
+                        f"{wpath}.phase",
+                        "normalized_phase",
+                        value=phase,
+                        fixed=fixed,
+                    )
+                step = w.get("step", "start")
+                steps = grid.get(fixed)
+                if steps and canonical_step(step) not in steps:
+                    add("warning", f"{wpath}.step", "unknown_step", value=step)
+    counts = {lvl: 0 for lvl in ("error", "warning", "fixed")}
+    for issue in issues:
+        counts[issue["level"]] += 1
+    return {"ok": not counts["error"], "counts": counts, "issues": issues}
+
+
+def _validation_key(schema: dict | None = None) -> str:
+    """Empreinte des règles de validation (version du code + schéma)."""
+    h = hashlib.sha256(f"{VALIDATION_VERSION}".encode())
+    h.update(json.dumps(schema or load_schema(), sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _validation_is_fresh(report, tracked: dict[str, Path]) -> bool:
+    names = {p: n for n, p in tracked.items()}
+    return (
+        isinstance(report, dict)
+        and report.get("schema") == _validation_key()
+        and fingerprints_fresh(report, list(tracked.values()), key=names.__getitem__)
+    )
+
+
+def cached_validation(yaml_dir) -> dict | None:
+    """
+    Verdict déjà calculé pour les fichiers actuels du dossier (processus, puis
+    .validation.json), None sinon : rien n'est parsé ni validé ici.
+    """
+    tracked = tracked_corpus_files(yaml_dir)
+    report = _VALIDATIONS.get(str(Path(yaml_dir).resolve()))
+    if report is None:
+        try:
+            path = Path(yaml_dir) / VALIDATION_NAME
+            report = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+    if not _validation_is_fresh(report, tracked):
+        return None
+    _VALIDATIONS[str(Path(yaml_dir).resolve())] = report
+    return report
+
+
+def _validation_docs(yaml_dir) -> list[tuple[str, object]]:
+    docs = load_yaml_docs(yaml_dir)
+    if not any(name == STRATAGEMS_FILE for name, _ in docs):
+        strats = load_dir_stratagems(yaml_dir)
+        if strats:
+            docs = docs + [(SHARDS_DIR, {"stratagems": strats})]
+    return docs
+
+
+def validate_corpus_dir(yaml_dir, docs=None) -> dict:
+    """
+    Rapport de validation d'un dossier : le verdict en cache s'il est à jour,
+    sinon validation de `docs` (tous les documents du dossier) ou, à défaut,
+    des documents relus. Réservé aux chemins où tout est déjà parsé (snapshot,
+    commande validate) : les chargements partiels passent par cached_validation.
+    """
+    report = cached_validation(yaml_dir)
+    if report is not None:
+        return report
+    tracked = tracked_corpus_files(yaml_dir)
+    files = {name: file_fingerprint(p) for name, p in tracked.items()}
+    if docs is None or sorted(n for n, _ in docs) != sorted(tracked):
+        docs = _validation_docs(yaml_dir)
+    key = _validation_key()
+    version = hashlib.sha256(
+        "".join([key] + [f"\0{n}\0{files[n]['sha256']}" for n in sorted(files)]).encode(
+            "utf-8"
+        )
+    ).hexdigest()
+    report = {
+        "version": version,
+        "schema": key,
+        "files": files,
+        "source": str(yaml_dir),
+    } | validate_docs(docs)
+    path = Path(yaml_dir) / VALIDATION_NAME
+    try:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(report, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    _VALIDATIONS[str(Path(yaml_dir).resolve())] = report
+    return report
+
+
+def combine_validation(reports: list[dict | None], source=None) -> dict | None:
+    """
+    Un seul rapport pour plusieurs dossiers (couches) ; `source` par problème.
+    None si l'une des couches n'a pas encore de verdict.
+    """
+    if any(r is None for r in reports):
+        return None
+    counts = {lvl: 0 for lvl in ("error", "warning", "fixed")}
+    for r in reports:
+        for lvl, n in r["counts"].items():
+            counts[lvl] += n
+    return {
+        "version": hashlib.sha256(
+            "".join(r["version"] for r in reports).encode("utf-8")
+        ).hexdigest(),
+        "source": None if source is None else str(source),
+        "ok": all(r["ok"] for r in reports),
+        "counts": counts,
+        "issues": [i | {"source": r["source"]} for r in reports for i in r["issues"]],
+    }
+
+
+def format_validation(report: dict) -> str:
+    c = report["counts"]
+    return (
+        f"{'✅' if report['ok'] else '❌'} {report['source']} : "
+        f"{c['error']} erreur(s), {c['warning']} avertissement(s), "
+        f"{c['fixed']} valeur(s) normalisée(s)"
+    )
@@ -14,264 +14,433 @@
 import argparse
 from collections import defaultdict
 from pathlib import Path
-import re
 import os
-import glob
+import sys
 import html
-from difflib import get_close_matches
+import io
+import json
+import hashlib
+import gc
+import tracemalloc
+import time
 
 try:
     import yaml  # type: ignore
 except ImportError:
     raise SystemExit("PyYAML requis. Installe: pip install pyyaml")
 
-
-# -----------------------------
-# Stratagems
-# -----------------------------
-def load_stratagems(yaml_path: str | Path) -> list[dict]:
-    data = yaml.safe_load(Path(yaml_path).read_text(encoding="utf-8"))
-    return data.get("stratagems", [])
+import fast_yaml  # noqa: E402  (dépend de PyYAML, importé ci-dessus)
+from models import (  # noqa: E402
+    Stats,
+    Stratagem,
+    Unit,
+    WeaponProfile,
+    canonical_phase,
+    canonical_player,
+    canonical_step,
+    string_scope,
+    unknown_values,
+)
+from corpus_docs import (  # noqa: E402
+    LAYERS_FILE,
+    YAML_C_LOADER,
+    YamlLoader,
+    file_fingerprint,
+    fingerprints_fresh,
+    load_yaml_file,
+    write_twin,
+    yaml_load,
+    yaml_paths,
+)
+from stratagem_store import (  # noqa: E402
+    SHARDS_DIR,
+    STRATAGEMS_FILE,
+    load_dir_stratagems,
+    read_shard_manifest,
+    scan_stratagem_detachments,
+    shard_stratagems,
+    tracked_corpus_files,
+)
+from corpus_snapshot import (  # noqa: E402
+    PARALLEL_MIN_BYTES,
+    load_yaml_docs,
+    parse_yaml_docs,
+    parse_yaml_docs_parallel,
+    snapshot_is_fresh,
+    write_snapshot,
+)
+from corpus_validation import (  # noqa: E402
+    cached_validation,
+    combine_validation,
+    format_validation,
+    validate_corpus_dir,
+)
+from corpus import (  # noqa: E402
+    Corpus,
+    CorpusFile,
+    content_dedup_report,
+    fuzzy_find,
+    load_dir_corpus,
+    merge_unit_docs,
+)
+from layers import corpus_layers, is_layered, load_layered_corpus  # noqa: E402
+from unit_index import load_unit_docs_lazy, load_unit_index  # noqa: E402
+from corpus_archive import (  # noqa: E402
+    ARCHIVE_SUFFIX,
+    CorpusArchive,
+    is_archive,
+    pack_data_dir,
+)
+from corpus_db import build_corpus_db, open_corpus_db  # noqa: E402
+import mmap_corpus  # noqa: E402
+from battlescribe import is_roster, read_roster  # noqa: E402
+from export_parser import (  # noqa: E402
+    ArmyList,
+    NameIndex,
+    iter_export_file,
+    iter_export_lists,
+    format_export,
+    normalize_name,
+    parse_export_file,
+    parse_export_text,
+)
 
 
 def normalize_timing(s: dict) -> tuple[str, str, str]:
-    phase = s.get("phase", "command")
-    step = s.get("step", "start")
-    who = s.get("player", "you")  # you|opponent|any
-    # Optionnel: harmoniser quelques steps vers ceux de ta grille
-    alias = {
-        "after_enemy_selects_targets": "start",
-        "after_enemy_resolves_attacks": "end",
-        "after_enemy_ends_move": "start",
-        "after_enemy_declares_charge": "declare",
-        "after_enemy_ends_charge_move": "move",
-        "reinforcements": "start",
-        "any": "start",
-    }
-    step = alias.get(step, step)
-    # préfix utile pour visuel
-    prefix = {"you": "🟦", "opponent": "🟥", "any": "🟨"}[who]
-    label = f"{prefix} Strat · "
-    return phase, step, label
+    return timing_label(
+        s.get("phase", "command"),
+        s.get("step", "start"),
+        s.get("player", "you"),  # you|opponent|any
+    )
+
+
+# préfix utile pour visuel
+STRAT_LABELS = {"you": "🟦 Strat · ", "opponent": "🟥 Strat · ", "any": "🟨 Strat · "}
+
+
+def timing_label(phase: str, step: str, who: str) -> tuple[str, str, str]:
+    """Pour un dict brut ; les Window du corpus sont déjà résolues au chargement."""
+    return (
+        canonical_phase(phase),
+        canonical_step(step),
+        STRAT_LABELS[canonical_player(who)],
+    )
 
 
 def add_stratagems_to_timeline(
-    timeline: dict, strats: list[dict], detachment_name: str
+    timeline: dict, strats: list[Stratagem], detachment_name: str
 ):
+    select = getattr(strats, "select_detachment", None)
+    if select is not None:
+        strats = select(detachment_name)  # index du snapshot mmap
     for st in strats:
-        if detachment_name not in st.get("detachment", []):
+        if detachment_name not in st.detachment:
             continue
-        for w in st.get("when", []):
-            phase, step, label = normalize_timing(w)
-            box = f"{label}{st['name']} ({st['cp']}CP) — {st.get('effect','')}"
-            timeline.setdefault(phase, {}).setdefault(step, []).append(box)
+        for w in st.when:
+            box = f"{STRAT_LABELS[w.player]}{st.name} ({st.cp}CP) — {st.effect}"
+            timeline.setdefault(w.phase, {}).setdefault(w.step, []).append(box)
     return timeline
 
 
 def strat_items_by_phase(
-    strats: list[dict], detachment_name: str | None = None
+    strats: list[Stratagem], detachment_name: str | None = None
 ) -> dict[str, list[str]]:
     """
-    Regroupe les stratagèmes par phase en <li> prêts à insérer.
-    Utilise normalize_timing(w) que tu as déjà.
+    Regroupe les stratagèmes par phase en <li> prêts à insérer, d'après les
+    fenêtres déjà résolues au chargement (Window.phase / step / player).
     """
     bucket: dict[str, list[str]] = defaultdict(list)
+    select = getattr(strats, "select_detachment", None)
+    if detachment_name and select is not None:
+        strats = select(detachment_name)  # index du snapshot mmap
     for st in strats or []:
         # filtre détachement si fourni (accepte "All" si tu l'utilises)
         if detachment_name and (
-            detachment_name not in st.get("detachment", [])
-            and "All" not in st.get("detachment", [])
+            detachment_name not in st.detachment and "All" not in st.detachment
         ):
             continue
 
-        name = st.get("name", "—")
-        cp = st.get("cp", "?")
-        effect = st.get("effect", "")
+        name = st.name
+        cp = st.cp
+        effect = st.effect
 
-        for w in st.get("when", []):
-            phase, step, label = normalize_timing(w)  # <- ton helper existant
+        for w in st.when:
             line = (
                 "<li>"
-                + label
+                + STRAT_LABELS[w.player]
                 + "<b>"
                 + html.escape(name)
                 + "</b> ("
                 + str(cp)
                 + "CP) — ["
-                + html.escape(step)
+                + html.escape(w.step)
                 + "] "
                 + html.escape(effect)
                 + "</li>"
             )
-            bucket[phase].append(line)
+            bucket[w.phase].append(line)
     return bucket
 
 
 # -----------------------------
-# Parsing de l'export 40k App
+# Parsing de l'export 40k App (ou d'un roster BattleScribe)
 # -----------------------------
 
-UNIT_LINE_RE = re.compile(r"^([^\n(]+?)\s*\((\d+)\s*points?\)\s*$", re.IGNORECASE)
-SECTION_RE = re.compile(r"^[A-Z][A-Z\s/’'–-]+$")
-
-FORMAT_RE = re.compile(
-    r"^(Combat Patrol|Incursion|Strike Force|Onslaught)\s*\((\d+)\s*points?\)\s*$",
-    re.IGNORECASE,
-)
-
 
-def normalize_name(s: str) -> str:
-    s = s.lower()
-    s = re.sub(r"[\u2019’']", "", s)
-    s = re.sub(r"[^a-z0-9+&/ -]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+def read_army_list(path, names: NameIndex | None = None) -> ArmyList:
+    """Export texte de l'app 40k, ou roster BattleScribe (.ros / .rosz)."""
+    if is_roster(path):
+        return read_roster(path, names)
+    return parse_export_file(path, names)
 
 
-def parse_export_txt(path: str):
+def parse_export_txt(path: str, names: NameIndex | None = None):
     """
     Retourne:
       - army: dict meta (title, points_total, faction, chapter, detachment, format, format_points)
       - units: dict key -> {display, count, points_each, section}
+    Forme historique ; read_army_list() donne le résultat complet (ArmyList,
+    avec figurines et équipement). `names` (load_name_index) : détachements et
+    factions reconnus d'après le corpus.
     """
-    with open(path, "r", encoding="utf-8") as f:
-        text = f.read()
-
-    lines = [l.rstrip() for l in text.splitlines() if l is not None]
-
-    army = {
-        "title": None,
-        "points_total": None,
-        "faction": None,
-        "chapter": None,
-        "detachment": None,
-        "format": None,
-        "format_points": None,
-    }
-    units = {}
-    current_section = None
-
-    # Titre (ex: "test (995 points)")
-    if lines:
-        first = lines[0].strip()
-        if first:
-            army["title"] = re.sub(r"\s*\(.*$", "", first).strip() or first
-            mpts = re.search(r"\((\d+)\s*points?\)", first, re.I)
-            if mpts:
-                army["points_total"] = int(mpts.group(1))
-
-    # Méta
-    for l in lines[:30]:
-        if "Space Marines" in l:
-            army["faction"] = "Space Marines"
-        if "Ultramarines" in l:
-            army["chapter"] = "Ultramarines"
-        if "Gladius Task Force" in l:
-            army["detachment"] = "Gladius Task Force"
-        fm = FORMAT_RE.match(l.strip())
-        if fm:
-            army["format"] = fm.group(1).title()
-            army["format_points"] = int(fm.group(2))
-
-    # Unités
-    for i, l in enumerate(lines):
-        s = l.strip()
-        if not s:
-            continue
-        if SECTION_RE.match(s):
-            current_section = s.strip().upper()
-            continue
+    army = read_army_list(path, names)
+    return army.meta(), army.listed()
 
-        # ignorer explicitement quelques lignes d'en-tête
-        if i == 0:  # première ligne = titre "test (995 points)" -> pas une unité
-            continue
-        if FORMAT_RE.match(s):  # "Incursion (1000 points)" -> format, pas une unité
-            continue
-        if s in {
-            "Space Marines",
-            "Ultramarines",
-            "Gladius Task Force",
-            "Anvil Siege Force",
-            "Ironstorm Spearhead",
-            "Firestorm Assault Force",
-            "Stormlance Task Force",
-            "Vanguard Spearhead",
-            "1st Company Task Force",
-            "Librarius Conclave",
-        }:
-            continue
 
-        m = UNIT_LINE_RE.match(s)
-        if m:
-            name = m.group(1).strip()
-            pts = int(m.group(2))
-            key = normalize_name(name)
-            if key not in units:
-                units[key] = {
-                    "display": name,
-                    "count": 0,
-                    "points_each": pts,
-                    "section": current_section,
-                }
-            units[key]["count"] += 1
+def load_units_from_yaml_dir(yaml_dir: str):
+    docs = [data for _name, data in load_yaml_docs(yaml_dir)]
+    return merge_unit_docs(docs)
+
+
+def compile_snapshot(yaml_dir) -> Path:
+    docs = parse_yaml_docs(yaml_dir)
+    out = write_snapshot(yaml_dir, docs)
+    validate_corpus_dir(yaml_dir, docs)
+    return out
+
+
+def load_corpus(
+    yaml_dir, detachments: set[str] | None = None, use_snapshot: bool = True
+) -> Corpus:
+    """
+    Charge un dossier data_* : snapshot compilé s'il est à jour (régénéré si le
+    dossier est inscriptible), sinon YAML + stratagèmes limités à `detachments`.
+    Un dossier en couches (layers.yaml) est fusionné avec ses parents ; une
+    archive (pack) est lue sans extraction.
+    """
+    if is_archive(yaml_dir):
+        with CorpusArchive(yaml_dir) as archive:
+            return archive.corpus(detachments=detachments)
+    if is_layered(yaml_dir):
+        return load_layered_corpus(yaml_dir, detachments, use_snapshot)
+    return load_dir_corpus(yaml_dir, detachments, use_snapshot)
 
-    return army, units
+
+def validate_dir(yaml_dir) -> dict:
+    """Rapport complet d'un dossier (couches comprises) ou d'une archive."""
+    if is_archive(yaml_dir):
+        with CorpusArchive(yaml_dir) as archive:
+            return archive.index.get("validation") or {}
+    layers = corpus_layers(yaml_dir)
+    if len(layers) == 1:
+        return validate_corpus_dir(layers[0])
+    return combine_validation([validate_corpus_dir(d) for d in layers], yaml_dir)
 
 
 # -----------------------------
-# Chargement YAML
+# Noms connus du corpus
 # -----------------------------
+# Détachements (stratagèmes + capacités d'unités) et factions d'un dossier,
+# pour reconnaître les lignes d'en-tête d'un export avant de charger le corpus
+# (le détachement détecté limite ensuite les stratagèmes chargés). Relevés sans
+# charger le corpus (index des unités, détachements des stratagèmes) et mis en
+# cache dans .names.json, invalidé comme le snapshot.
+NAMES_NAME = ".names.json"
+
+
+def corpus_names(corpus: Corpus) -> NameIndex:
+    return NameIndex(
+        [d for st in corpus.stratagems for d in st.detachment if d != "All"]
+        + [u.detachment for u in corpus.units],
+        [u.faction for u in corpus.units],
+    )
 
 
-def load_units_from_yaml_dir(yaml_dir: str):
-    units_by_key = {}
-    faction_helpers = None
+def _dir_name_index(yaml_dir) -> NameIndex:
+    paths = list(tracked_corpus_files(yaml_dir).values())
+    path = Path(yaml_dir) / NAMES_NAME
+    try:
+        cached = json.loads(path.read_text(encoding="utf-8"))
+        if fingerprints_fresh(cached, paths):
+            return NameIndex.from_dict(cached["names"])
+    except (OSError, ValueError, KeyError):
+        pass
+    names = _scan_dir_names(yaml_dir)
+    data = {"files": {p.name: file_fingerprint(p) for p in paths}}
+    try:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data | {"names": names.to_dict()}), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return names
+
+
+def _scan_dir_names(yaml_dir) -> NameIndex:
+    """
+    Noms d'un dossier sans en charger le corpus : détachements du manifest des
+    shards (ou des seuls événements YAML de stratagems.yaml) et noms relevés
+    par l'index des unités, que le chargement paresseux réutilise ensuite.
+    """
+    manifest = read_shard_manifest(yaml_dir)
+    strat_path = Path(yaml_dir, STRATAGEMS_FILE)
+    if manifest is not None:
+        dets = list(manifest.get("shards") or ())
+    elif strat_path.is_file():
+        dets = scan_stratagem_detachments(strat_path)
+    else:
+        dets = []
+    dets = [d for d in dets if d != "All"]
+    factions = []
+    index = load_unit_index(yaml_dir)  # None : dossier en lecture seule, périmé
+    for entry in (index or {}).get("entries", {}).values():
+        names = entry.get("names") or {}
+        dets += names.get("detachments", ())
+        factions += names.get("factions", ())
+    return NameIndex(dets, factions)
+
+
+def load_name_index(yaml_dir) -> NameIndex:
+    """Noms connus d'un dossier data_*, d'une archive ou de toutes ses couches."""
+    if is_archive(yaml_dir):
+        with CorpusArchive(yaml_dir) as archive:
+            return archive.names()
+    return NameIndex.merge(_dir_name_index(d) for d in corpus_layers(yaml_dir))
+
+
+def load_corpus_for_export(
+    yaml_dir,
+    listed: dict,
+    detachments: set[str] | None = None,
+    use_snapshot: bool = True,
+) -> Corpus:
+    """
+    Corpus restreint aux unités d'un export (résolues comme build_sheet, fuzzy
+    compris) via l'index des unités, quand le snapshot compilé n'est pas à jour
+    (ou avec use_snapshot=False) : un snapshot à jour se relit plus vite que
+    l'index et les blocs d'unités. load_corpus aussi si l'index n'est pas
+    utilisable ou pour un dossier en couches.
+    """
+    if is_archive(yaml_dir):
+        with CorpusArchive(yaml_dir) as archive:
+            return archive.corpus_for_export(listed, detachments)
+    if is_layered(yaml_dir) or (use_snapshot and snapshot_is_fresh(yaml_dir)):
+        return load_corpus(yaml_dir, detachments, use_snapshot=use_snapshot)
+    index = load_unit_index(yaml_dir)
+    if index is None:
+        return load_corpus(yaml_dir, detachments, use_snapshot=use_snapshot)
+    all_keys: dict[str, None] = {}
+    for entry in index["entries"].values():
+        all_keys.update((k, None) for k in entry.get("keys", ()))
+        all_keys.update((k, None) for k, _s, _e in entry.get("units", ()))
+    keys = {fuzzy_find(k, all_keys, cutoff=0.72)[0] for k in listed}
+    keys.discard(None)
+    corpus = Corpus.from_docs(
+        load_unit_docs_lazy(yaml_dir, index, keys),
+        yaml_dir,
+        load_dir_stratagems(yaml_dir, detachments),
+        detachments or None,
+    )
+    corpus.validation = cached_validation(yaml_dir)
+    return corpus
 
-    for path in sorted(glob.glob(os.path.join(yaml_dir, "*.yaml"))):
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
 
-        if (
-            faction_helpers is None
-            and isinstance(data, dict)
-            and "faction_helpers" in data
-        ):
-            faction_helpers = data["faction_helpers"]
+# -----------------------------
+# Snapshot mmap (plusieurs workers)
+# -----------------------------
+# .corpus.mmap : unités et stratagèmes en enregistrements de taille fixe (voir
+# mmap_corpus.py). Chaque worker l'ouvre en mmap lecture seule : le cache de
+# pages de l'OS n'en garde qu'une copie, et seuls les enregistrements consultés
+# sont décodés.
+MMAP_NAME = ".corpus.mmap"
+
+# chemin -> ((inode, mtime), données ouvertes) : un mmap par fichier et par processus.
+# L'ancien mmap est fermé dès que le fichier est remplacé ou supprimé : un Corpus
+# obtenu avant ne doit pas survivre à la recompilation du snapshot.
+_MMAP_OPEN: dict[str, tuple[tuple, mmap_corpus.MmapCorpusData]] = {}
+
+
+def _mmap_forget(key: str):
+    old = _MMAP_OPEN.pop(key, None)
+    if old is not None:
+        old[1].close()
+
+
+def _mmap_sources(yaml_dir) -> dict[str, Path]:
+    """Fichiers dont dépend le corpus, couches parentes comprises, par chemin."""
+    files = {}
+    for d in corpus_layers(yaml_dir):
+        for p in tracked_corpus_files(d).values():
+            files[str(p)] = p
+        if is_layered(d):
+            files[str(d / LAYERS_FILE)] = d / LAYERS_FILE
+    return files
+
+
+def compile_mmap(yaml_dir) -> Path:
+    corpus = load_corpus(yaml_dir)
+    out = Path(yaml_dir) / MMAP_NAME
+    tmp = out.with_name(out.name + ".tmp")
+    mmap_corpus.write(
+        tmp,
+        corpus.units,
+        [normalize_name(u.name) for u in corpus.units],
+        corpus.stratagems,
+        {"phases": corpus.phases, "faction_helpers": corpus.faction_helpers},
+        {"files": {k: file_fingerprint(p) for k, p in _mmap_sources(yaml_dir).items()}},
+    )
+    os.replace(tmp, out)  # les workers gardent l'ancien inode tant qu'ils l'ont ouvert
+    return out
 
-        if (
-            isinstance(data, dict)
-            and "units" in data
-            and isinstance(data["units"], list)
-        ):
-            for u in data["units"]:
-                if isinstance(u, dict) and u.get("name"):
-                    units_by_key[normalize_name(u["name"])] = u
-
-    if faction_helpers is None:
-        faction_helpers = {
-            "turn_start": ["Déclarer/mettre à jour les effets de détachement/faction."],
-            "generic_reminders": {
-                "command": ["Gagner CP ; tests d’ébranlement ; poser auras/buffs."],
-                "movement": ["Mesurer menaces ; garder couvert/lignes de vue."],
-                "shooting": ["Choisir cibles intelligemment."],
-                "charge": ["Penser multi-charge ; garder 1 CP pour relance critique."],
-                "fight": [
-                    "Activer dans le bon ordre ; pile-in/consolidation pour voler OC."
-                ],
-                "end": ["Compter OC ; scorer primaires/secondaires ; valider actions."],
-            },
-        }
-    return units_by_key, faction_helpers
 
+def open_mmap_corpus(yaml_dir) -> Corpus | None:
+    """Corpus adossé au snapshot mmap s'il est à jour, sinon None."""
+    path = Path(yaml_dir) / MMAP_NAME
+    try:
+        st = path.stat()
+    except OSError:
+        _mmap_forget(str(path))
+        return None
+    stamp = (st.st_ino, st.st_mtime_ns)
+    cached = _MMAP_OPEN.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        data = cached[1]
+    else:
+        _mmap_forget(str(path))
+        header = mmap_corpus.read_header(path)
+        if header is None:
+            return None
+        data = mmap_corpus.MmapCorpusData(path)
+        _MMAP_OPEN[str(path)] = (stamp, data)
+    if not fingerprints_fresh(data.meta, list(_mmap_sources(yaml_dir).values()), str):
+        return None
+    return Corpus(
+        units=data.units,
+        units_by_key=data.units_by_key,
+        faction_helpers=data.extra("faction_helpers"),
+        phases=data.extra("phases"),
+        stratagems=data.stratagems,
+        source=str(yaml_dir),
+    )
 
-def fuzzy_find(key: str, units_by_key: dict, cutoff: float = 0.72):
-    if key in units_by_key:
-        return key, 1.0
-    choices = list(units_by_key.keys())
-    match = get_close_matches(key, choices, n=1, cutoff=cutoff)
-    if match:
-        return match[0], 0.9
-    return None, 0.0
+
+def load_mmap_corpus(yaml_dir) -> Corpus | None:
+    """open_mmap_corpus, après recompilation du snapshot s'il est périmé."""
+    corpus = open_mmap_corpus(yaml_dir)
+    if corpus is None and Path(yaml_dir).is_dir() and os.access(yaml_dir, os.W_OK):
+        compile_mmap(yaml_dir)
+        corpus = open_mmap_corpus(yaml_dir)
+    return corpus
 
 
 # -----------------------------
@@ -318,109 +487,60 @@ PHASE_ORDER = [
 ]
 
 
-def render_stats(u):
-    base = u.get("base") or {}
-
-    def g(k, default="–"):
-        return base.get(k, default)
+def render_stats(u: Unit):
+    base = u.base or Stats()
 
     parts = [
-        f"M {g('M')}",
-        f"T {g('T')}",
-        f"Sv {g('Sv')}",
-        f"W {g('W')}",
-        f"Ld {g('Ld')}",
-        f"OC {g('OC')}",
+        f"M {base.M}",
+        f"T {base.T}",
+        f"Sv {base.Sv}",
+        f"W {base.W}",
+        f"Ld {base.Ld}",
+        f"OC {base.OC}",
     ]
-    if base.get("Inv"):
-        parts.append(f"Inv {base['Inv']}")
-    if base.get("FnP"):
-        parts.append(f"FnP {base['FnP']}")
+    if base.Inv:
+        parts.append(f"Inv {base.Inv}")
+    if base.FnP:
+        parts.append(f"FnP {base.FnP}")
     return "  |  ".join(parts)
 
 
-def _fmt_weapon_keywords(d: dict) -> str:
+def _fmt_weapon_keywords(p: WeaponProfile) -> str:
     """Return keywords/abilities in a compact '(…)' form if present."""
-    kws = d.get("keywords") or d.get("abilities") or d.get("ability")
-    if not kws:
-        return ""
-    if isinstance(kws, str):
-        txt = kws
-    elif isinstance(kws, (list, tuple)):
-        txt = ", ".join(str(x) for x in kws if x)
-    elif isinstance(kws, dict):
-        # Rare: dict of keywords -> True
-        txt = ", ".join(k for k, v in kws.items() if v)
-    else:
-        txt = str(kws)
-    txt = txt.strip()
+    txt = ", ".join(p.keywords).strip()
     return f" ({html.escape(txt)})" if txt else ""
 
 
-def _fmt_weapon_profile_row(d: dict, is_melee: bool) -> str:
-    """Build 'Range | A | BS/WS | S | AP | D (keywords)' from whatever keys exist."""
-    # Normalize fields
-    rng = d.get("Range") or d.get("range") or d.get("R") or d.get("rng")
-    A = d.get("A") or d.get("Attacks") or d.get("attacks")
-    BS = d.get("BS") or d.get("bs") or d.get("Skill") or d.get("skill")
-    WS = d.get("WS") or d.get("ws")
-    S = d.get("S") or d.get("Str") or d.get("strength")
-    AP = d.get("AP") or d.get("ap")
-    Dmg = d.get("D") or d.get("Damage") or d.get("damage")
-    # Some data encode separate 'to_hit' instead of BS/WS
-    to_hit = d.get("to_hit") or d.get("hit") or d.get("TH") or d.get("th")
-
+def _fmt_weapon_profile_row(p: WeaponProfile, is_melee: bool) -> str:
+    """Build 'Range | A | BS/WS | S | AP | D (keywords)' from the resolved profile."""
     parts = []
-    if not is_melee and rng:
-        parts.append(str(rng))
-    if A is not None:
-        parts.append(f"A {A}")
+    if not is_melee and p.range:
+        parts.append(str(p.range))
+    if p.A is not None:
+        parts.append(f"A {p.A}")
     # Choose the most relevant "skill" field
-    if BS and not is_melee:
-        parts.append(f"BS {BS}")
-    elif WS and is_melee:
-        parts.append(f"WS {WS}")
-    elif to_hit:
-        parts.append(f"Hit {to_hit}")
-    if S is not None:
-        parts.append(f"S {S}")
-    if AP is not None:
-        parts.append(f"AP {AP}")
-    if Dmg is not None:
-        parts.append(f"D {Dmg}")
-
-    return " | ".join(parts) + _fmt_weapon_keywords(d)
-
-
-def _iter_weapon_profiles(w: dict) -> list[tuple[str, dict]]:
-    """
-    Yield (profile_name, profile_dict) pairs from either:
-      - flat weapon with stats on the weapon itself
-      - weapon with 'profiles': [{name, ...}, ...]
-    """
-    name = w.get("name", "—")
-    profs = w.get("profiles")
-    if isinstance(profs, list) and profs:
-        out = []
-        for p in profs:
-            if not isinstance(p, dict):
-                continue
-            pname = p.get("name") or p.get("mode") or name
-            out.append((str(pname), p))
-        return out
-    # flat profile case
-    return [(name, w)]
-
-
-def render_weapons(u, limit_each: int | None = None):
+    if p.BS and not is_melee:
+        parts.append(f"BS {p.BS}")
+    elif p.WS and is_melee:
+        parts.append(f"WS {p.WS}")
+    elif p.to_hit:
+        parts.append(f"Hit {p.to_hit}")
+    if p.S is not None:
+        parts.append(f"S {p.S}")
+    if p.AP is not None:
+        parts.append(f"AP {p.AP}")
+    if p.D is not None:
+        parts.append(f"D {p.D}")
+
+    return " | ".join(parts) + _fmt_weapon_keywords(p)
+
+
+def render_weapons(u: Unit, limit_each: int | None = None):
     """
     Show weapon names + statlines.
-    - Supports both flat and nested 'profiles'.
+    - Weapons with several profiles are listed profile by profile.
     - If limit_each is None, show ALL weapons in each category.
     """
-    w = u.get("weapons") or {}
-    ranged = w.get("ranged") or []
-    melee = w.get("melee") or []
 
     def fmt_group(arr, is_melee: bool, label: str) -> str:
         if not arr:
@@ -430,22 +550,22 @@ def render_weapons(u, limit_each: int | None = None):
         for wpn in arr:
             if limit_each is not None and shown >= limit_each:
                 break
-            profiles = _iter_weapon_profiles(wpn)
+            profiles = wpn.profiles
             if len(profiles) == 1:
-                pname, pd = profiles[0]
+                pd = profiles[0]
                 row = _fmt_weapon_profile_row(pd, is_melee=is_melee)
                 lines.append(
-                    f"<li><b>{html.escape(str(pname))}</b> — {html.escape(row)}</li>"
+                    f"<li><b>{html.escape(str(pd.name))}</b> — {html.escape(row)}</li>"
                 )
             else:
                 sub = []
-                for pname, pd in profiles:
+                for pd in profiles:
                     row = _fmt_weapon_profile_row(pd, is_melee=is_melee)
                     sub.append(
-                        f"<div class='small'>&bull; <b>{html.escape(str(pname))}</b> — {html.escape(row)}</div>"
+                        f"<div class='small'>&bull; <b>{html.escape(str(pd.name))}</b> — {html.escape(row)}</div>"
                     )
                 lines.append(
-                    f"<li><b>{html.escape(wpn.get('name','—'))}</b><br>{''.join(sub)}</li>"
+                    f"<li><b>{html.escape(wpn.name)}</b><br>{''.join(sub)}</li>"
                 )
             shown += 1
         if not lines:
@@ -453,23 +573,21 @@ def render_weapons(u, limit_each: int | None = None):
         return f"<b>{label}</b><ul>" + "".join(lines) + "</ul>"
 
     blocks = []
-    rg = fmt_group(ranged, is_melee=False, label="Tir")
+    rg = fmt_group(u.ranged, is_melee=False, label="Tir")
     if rg:
         blocks.append(rg)
-    mg = fmt_group(melee, is_melee=True, label="CaC")
+    mg = fmt_group(u.melee, is_melee=True, label="CaC")
     if mg:
         blocks.append(mg)
 
     return "<br>".join(blocks) if blocks else "<span class='small'>—</span>"
 
 
-def render_abilities(u, limit=3):
-    ab = u.get("abilities") or {}
-    unit_ab = ab.get("unit") or []
+def render_abilities(u: Unit, limit=3):
     items = []
-    for x in unit_ab[:limit]:
-        nm = x.get("name", "—")
-        tx = x.get("text", "")
+    for x in u.abilities[:limit]:
+        nm = x.name
+        tx = x.text
         items.append(
             f"<li><b>{html.escape(nm)}.</b> {html.escape(tx)}</li>"
             if tx
@@ -480,9 +598,9 @@ def render_abilities(u, limit=3):
     )
 
 
-def collect_phase_tips_for_unit(faction_helpers, u):
+def collect_phase_tips_for_unit(faction_helpers, u: Unit):
     """Retourne dict phase -> [bullets] pour une unité."""
-    tips = ((u.get("play_tips") or {}).get("phases")) or {}
+    tips = u.phase_tips or {}
     out = {}
     for key, _label in PHASE_ORDER:
         bullets = []
@@ -525,7 +643,7 @@ def build_phase_board(faction_helpers, matched_units, strats):
             bullets = unit_tips.get(key)
             if not bullets:
                 continue
-            uname = u.get("name", mu["display"])
+            uname = u.name or mu["display"]
             for b in bullets:
                 items.append(f"<li><b>{html.escape(uname)}</b> — {html.escape(b)}</li>")
 
@@ -600,13 +718,12 @@ def generate_html(army, matched_units, faction_helpers, outfile, strats):
             )
             continue
 
-        name = u.get("name", mu["display"])
-        role = u.get("role", "")
+        name = u.name or mu["display"]
+        role = u.role
         badges = []
         if role:
             badges.append(role)
-        kws = u.get("keywords") or []
-        if "Ultramarines" in kws:
+        if "Ultramarines" in u.keywords:
             badges.append("Ultramarines")
         if count > 1:
             badges.append(f"x{count}")
@@ -657,10 +774,7 @@ def generate_html(army, matched_units, faction_helpers, outfile, strats):
 # -----------------------------
 
 
-def run(export_path: str, yaml_dir: str, out_file: str) -> str:
-    army, listed = parse_export_txt(export_path)
-    units_by_key, faction_helpers = load_units_from_yaml_dir(yaml_dir)
-
+def build_sheet(army: dict, listed: dict, corpus: Corpus, out_file: str) -> str:
     matched = []
     section_order = {
         "CHARACTERS": 0,
@@ -668,6 +782,7 @@ def run(export_path: str, yaml_dir: str, out_file: str) -> str:
         "DEDICATED TRANSPORTS": 2,
         "OTHER DATASHEETS": 3,
     }
+    units_by_key = corpus.units_by_key
     for key, info in listed.items():
         mkey, score = fuzzy_find(key, units_by_key, cutoff=0.72)
         unit = units_by_key.get(mkey) if mkey else None
@@ -690,25 +805,852 @@ def run(export_path: str, yaml_dir: str, out_file: str) -> str:
     )
 
     # Stratagems
-    strats = []
-    strat_yaml_path = Path(yaml_dir, "stratagems.yaml")
-    strats = load_stratagems(strat_yaml_path)
-
-    strats = strat_items_by_phase(strats, army["detachment"])
+    strats = strat_items_by_phase(corpus.stratagems, army["detachment"])
 
-    outfile = generate_html(army, matched, faction_helpers, out_file, strats)
+    outfile = generate_html(army, matched, corpus.faction_helpers, out_file, strats)
     return outfile
 
 
+def run_with_corpus(
+    export_path: str, corpus: Corpus, out_file: str, army: ArmyList | None = None
+) -> str:
+    """
+    Génère la fiche avec un corpus déjà chargé (aucune relecture YAML). `army`
+    : export déjà analysé (p. ex. par l'aperçu Streamlit), sinon lu depuis
+    `export_path`.
+    """
+    if army is None:
+        army = read_army_list(export_path, corpus_names(corpus))
+    return build_sheet(army.meta(), army.listed(), corpus, out_file)
+
+
+def run(
+    export_path: str,
+    yaml_dir: str,
+    out_file: str,
+    use_snapshot: bool = True,
+    db_path: str | None = None,
+    lazy_units: bool = True,
+    use_mmap: bool = False,
+) -> str:
+    """
+    Avec `db_path`, seules les unités listées et les stratagèmes du détachement
+    sont lus dans la base SQLite (repli sur les YAML si la source y est périmée).
+    Sinon le snapshot compilé s'il est à jour ; à défaut, avec `lazy_units`,
+    l'index des unités évite de parser les unités non listées.
+    `use_mmap` lit le snapshot mmap partagé entre workers (prioritaire).
+    """
+    # les noms servant à la détection viennent de la source qui sera lue
+    corpus = load_mmap_corpus(yaml_dir) if use_mmap else None
+    if corpus is not None:
+        return run_with_corpus(export_path, corpus, out_file)
+    db = open_corpus_db(db_path) if db_path and not is_layered(yaml_dir) else None
+    if db is not None:
+        with db:
+            if db.is_fresh(yaml_dir):
+                army, listed = parse_export_txt(export_path, db.names(yaml_dir))
+                detachments = {army["detachment"]} if army["detachment"] else None
+                corpus = db.corpus_for_export(yaml_dir, listed, detachments)
+                return build_sheet(army, listed, corpus, out_file)
+            print(
+                f"⚠️ {yaml_dir} absent ou périmé dans {db_path} : lecture des YAML.",
+                file=sys.stderr,
+            )
+    army, listed = parse_export_txt(export_path, load_name_index(yaml_dir))
+    detachments = {army["detachment"]} if army["detachment"] else None
+    if lazy_units:
+        corpus = load_corpus_for_export(yaml_dir, listed, detachments, use_snapshot)
+    else:
+        corpus = load_corpus(yaml_dir, detachments, use_snapshot=use_snapshot)
+    return build_sheet(army, listed, corpus, out_file)
+
+
+def cmd_compile(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py compile",
+        description="Compile un ou plusieurs dossiers YAML en snapshot binaire",
+    )
+    ap.add_argument("yaml_dirs", nargs="+", help="Dossiers data_* à compiler")
+    args = ap.parse_args(argv)
+    for d in args.yaml_dirs:
+        out = compile_snapshot(d)
+        print(f"✅ Snapshot: {out} ({out.stat().st_size} octets)")
+
+
+def default_data_dirs() -> list[str]:
+    """Les dossiers data_* livrés à côté du script."""
+    return sorted(
+        str(p) for p in Path(__file__).resolve().parent.glob("data_*") if p.is_dir()
+    )
+
+
+def verify_loaders(yaml_dirs) -> bool:
+    """
+    Charge chaque fichier avec le loader pur Python puis avec libyaml,
+    vérifie que les structures sont identiques et affiche le gain par fichier.
+    """
+    if not YAML_C_LOADER:
+        print("⚠️  libyaml indisponible : seul le loader pur Python est utilisé.")
+        return True
+
+    ok = True
+    print(f"{'fichier':<42} {'pur (ms)':>9} {'C (ms)':>8} {'gain':>6}  égal")
+    for d in yaml_dirs:
+        for path in yaml_paths(d):
+            text = path.read_text(encoding="utf-8")
+            t0 = time.perf_counter()
+            pure = yaml.load(text, Loader=yaml.SafeLoader)
+            t1 = time.perf_counter()
+            fast = yaml.load(text, Loader=YamlLoader)
+            t2 = time.perf_counter()
+            same = pure == fast
+            ok = ok and same
+            name = f"{Path(d).name}/{path.name}"
+            print(
+                f"{name:<42} {(t1 - t0) * 1000:>9.1f} {(t2 - t1) * 1000:>8.1f} "
+                f"{(t1 - t0) / max(t2 - t1, 1e-9):>5.1f}x  {'oui' if same else 'NON'}"
+            )
+    return ok
+
+
+def bench_yaml(yaml_dirs, repeat: int = 3) -> bool:
+    """
+    Compare fast_yaml, libyaml (CSafeLoader) et PyYAML pur fichier par fichier
+    (meilleur temps sur `repeat`), et vérifie que fast_yaml donne les mêmes dicts.
+    """
+    loaders = [("fast_yaml", fast_yaml.parse)]
+    if YAML_C_LOADER:
+        loaders.append(("libyaml", lambda t: yaml.load(t, Loader=YamlLoader)))
+    loaders.append(("pur", lambda t: yaml.load(t, Loader=yaml.SafeLoader)))
+
+    ok = True
+    totals = [0.0] * len(loaders)
+    print(f"{'fichier':<42}" + "".join(f"{n + ' (ms)':>15}" for n, _ in loaders))
+    for d in yaml_dirs:
+        for path in yaml_paths(d):
+            text = path.read_text(encoding="utf-8")
+            row, results = [], []
+            for k, (_name, load) in enumerate(loaders):
+                best = None
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    try:
+                        res = load(text)
+                    except fast_yaml.UnsupportedYAML:
+                        res = fast_yaml.UnsupportedYAML
+                    dt = time.perf_counter() - t0
+                    best = dt if best is None else min(best, dt)
+                totals[k] += best
+                row.append(best)
+                results.append(res)
+            if results[0] is fast_yaml.UnsupportedYAML:
+                verdict = "repli PyYAML"
+            elif results[0] == results[-1]:
+                verdict = "égal"
+            else:
+                verdict, ok = "DIFFÉRENT", False
+            name = f"{Path(d).name}/{path.name}"
+            print(f"{name:<42}" + "".join(f"{t * 1000:>15.1f}" for t in row), verdict)
+    print(f"{'total':<42}" + "".join(f"{t * 1000:>15.1f}" for t in totals))
+    return ok
+
+
+def cmd_bench_yaml(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py bench-yaml",
+        description="Benchmark fast_yaml vs PyYAML (libyaml et pur Python)",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à mesurer (défaut: data_SM à côté du script)",
+    )
+    ap.add_argument("--repeat", type=int, default=3, help="Meilleur temps sur N")
+    args = ap.parse_args(argv)
+    dirs = args.yaml_dirs or [str(Path(__file__).resolve().parent / "data_SM")]
+    if not bench_yaml(dirs, args.repeat):
+        raise SystemExit("❌ fast_yaml ne reproduit pas yaml.safe_load.")
+
+
+def measure_corpus_memory(yaml_dir) -> tuple[int, int]:
+    """
+    Mémoire retenue (octets, tracemalloc) par les dicts PyYAML d'un dossier,
+    puis par le Corpus d'enregistrements construit à partir d'eux.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        docs = [load_yaml_file(p, use_twin=False) for p in yaml_paths(yaml_dir)]
+        gc.collect()
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        corpus = Corpus.from_docs(docs, yaml_dir)
+        del docs
+        gc.collect()
+        record_bytes = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del corpus
+    return dict_bytes, record_bytes
+
+
+def cmd_bench_memory(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py bench-memory",
+        description="Mémoire du corpus : dicts PyYAML vs enregistrements compacts",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à mesurer (défaut: data_SM à côté du script)",
+    )
+    args = ap.parse_args(argv)
+    dirs = args.yaml_dirs or [str(Path(__file__).resolve().parent / "data_SM")]
+    print(f"{'dossier':<24} {'dicts (Ko)':>11} {'records (Ko)':>13} {'gain':>7}")
+    for d in dirs:
+        before, after = measure_corpus_memory(d)
+        print(
+            f"{Path(d).name:<24} {before / 1024:>11.0f} {after / 1024:>13.0f} "
+            f"{(1 - after / before) * 100:>6.0f}%"
+        )
+
+
+def _footprint(*roots) -> tuple[int, int]:
+    """(objets, octets) atteignables depuis `roots`, chaque objet compté une fois."""
+    seen: set[int] = set()
+    stack = list(roots)
+    count = size = 0
+    while stack:
+        obj = stack.pop()
+        if obj is None or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        count += 1
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            for slot in getattr(type(obj), "__slots__", ()):
+                if not slot.startswith("__"):
+                    stack.append(getattr(obj, slot, None))
+    return count, size
+
+
+def _profile_parse(path: Path) -> tuple[object, str]:
+    """Comme yaml_load, mais dit quel parseur a produit le document."""
+    text = path.read_bytes().decode("utf-8")
+    try:
+        return fast_yaml.parse(text) or {}, "fast_yaml"
+    except fast_yaml.UnsupportedYAML:
+        return yaml.load(text, Loader=YamlLoader) or {}, YamlLoader.__name__
+
+
+def profile_corpus(yaml_dir) -> dict:
+    """
+    Coût de chaque fichier d'un dossier : taille, parseur effectivement utilisé
+    (fast_yaml ou repli PyYAML) et temps de parse (YAML, sans jumeau ni
+    snapshot), temps de conversion en enregistrements, nombre d'unités /
+    stratagèmes, objets et mémoire approximative (sys.getsizeof) des
+    enregistrements obtenus ; plus les totaux.
+    """
+    files, parts = [], []
+    loaders: dict[str, int] = {}
+    with string_scope():  # vocabulaire partagé entre les fichiers du dossier
+        for p in yaml_paths(yaml_dir):
+            t0 = time.perf_counter()
+            doc, loader = _profile_parse(p)
+            t1 = time.perf_counter()
+            loaders[loader] = loaders.get(loader, 0) + 1
+            part = CorpusFile.from_doc(doc)
+            t2 = time.perf_counter()
+            objects, size = _footprint(part)
+            parts.append(part)
+            files.append(
+                {
+                    "file": p.name,
+                    "loader": loader,
+                    "bytes": p.stat().st_size,
+                    "parse_ms": round((t1 - t0) * 1000, 2),
+                    "build_ms": round((t2 - t1) * 1000, 2),
+                    "units": len(part.units),
+                    "stratagems": len(part.stratagems),
+                    "objects": objects,
+                    "memory_bytes": size,
+                }
+            )
+    totals = {
+        k: round(sum(f[k] for f in files), 2)
+        for k in ("bytes", "parse_ms", "build_ms", "units", "stratagems")
+    }
+    # vocabulaire partagé entre fichiers compté une seule fois
+    totals["objects"], totals["memory_bytes"] = _footprint(*parts)
+    return {
+        "source": str(yaml_dir),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "loaders": loaders,  # parseur -> nombre de fichiers
+        "files": files,
+        "totals": totals,
+    }
+
+
+def cmd_profile(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py profile",
+        description="Coût par fichier d'un dossier data_* : parse, objets, mémoire",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à profiler (défaut: tous les data_* à côté du script)",
+    )
+    ap.add_argument("--json", action="store_true", help="Sortie JSON seule")
+    ap.add_argument("--out", help="Écrit aussi le rapport JSON dans ce fichier")
+    args = ap.parse_args(argv)
+    reports = [profile_corpus(d) for d in args.yaml_dirs or default_data_dirs()]
+    if args.out:
+        Path(args.out).write_text(
+            json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return
+    cols = ("bytes", "parse_ms", "build_ms", "units", "stratagems", "objects")
+    for r in reports:
+        loaders = ", ".join(f"{k} ×{n}" for k, n in r["loaders"].items())
+        print(f"{r['source']} ({loaders or 'aucun fichier'})")
+        print(
+            f"  {'fichier':<28} {'octets':>9} {'parse ms':>9} {'build ms':>9}"
+            f" {'unités':>7} {'strats':>7} {'objets':>8} {'mém. Ko':>8}  parseur"
+        )
+        for f in r["files"] + [dict(r["totals"], file="TOTAL", loader="")]:
+            b, parse, build, units, strats, objects = (f[c] for c in cols)
+            line = (
+                f"  {f['file']:<28} {b:>9} {parse:>9.1f} {build:>9.1f}"
+                f" {units:>7} {strats:>7} {objects:>8}"
+                f" {f['memory_bytes'] / 1024:>8.0f}  {f['loader']}"
+            )
+            print(line.rstrip())
+
+
+def cmd_lists(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py lists",
+        description="Résumé des listes d'un pack d'exports 40k concaténés (tournoi)",
+    )
+    ap.add_argument(
+        "export",
+        help="Fichier texte contenant un ou plusieurs exports, ou roster .ros/.rosz",
+    )
+    ap.add_argument(
+        "--yaml-dir", help="Dossier data_* dont les noms servent à la détection"
+    )
+    ap.add_argument(
+        "--json", action="store_true", help="Une ligne JSON par liste (JSON Lines)"
+    )
+    args = ap.parse_args(argv)
+    n = 0
+    names = load_name_index(args.yaml_dir) if args.yaml_dir else None
+    armies = (
+        [read_roster(args.export, names)]
+        if is_roster(args.export)
+        else iter_export_file(args.export, names)
+    )
+    for n, army in enumerate(armies, 1):
+        if args.json:
+            print(json.dumps(army.to_dict(), ensure_ascii=False))
+            continue
+        models = sum(u.model_count for u in army.units)
+        print(
+            f"{army.line:>7}  {army.title or '—'} ({army.points_total or '?'} pts)"
+            f" · {army.faction or '?'} · {army.detachment or '?'}"
+            f" · {len(army.units)} unités / {models} figurines"
+        )
+    if not args.json:
+        print(f"{n} liste(s)")
+
+
+# Exports de référence : chaque golden_exports/<nom>.txt (un ou plusieurs
+# exports concaténés) a son résultat attendu dans <nom>.json, la liste des
+# ArmyList.to_dict() produites par iter_export_lists avec l'index de noms des
+# dossiers data_* livrés (comme à la génération : un détachement connu est
+# reconnu même avant la faction). Les rosters BattleScribe (<nom>.ros / .rosz)
+# y sont vérifiés de la même façon.
+GOLDEN_EXPORTS_DIR = Path(__file__).resolve().parent / "golden_exports"
+
+
+def _golden_exports(golden_dir) -> list[Path]:
+    return sorted(Path(golden_dir).glob("*.txt"))
+
+
+def _golden_rosters(golden_dir) -> list[Path]:
+    return sorted(p for p in Path(golden_dir).glob("*.ros*") if is_roster(p))
+
+
+def golden_names(yaml_dirs=None) -> NameIndex:
+    """Index de noms de référence : celui de tous les dossiers data_* livrés."""
+    return NameIndex.merge(
+        load_name_index(d) for d in (yaml_dirs or default_data_dirs())
+    )
+
+
+def _parse_golden(path: Path, names: NameIndex | None = None) -> list[dict]:
+    if is_roster(path):
+        return [read_roster(path, names).to_dict()]
+    return [army.to_dict() for army in iter_export_file(path, names)]
+
+
+def _comparable(army: ArmyList) -> dict:
+    """to_dict() sans ce qui dépend de la mise en page (n° de ligne, en-tête)."""
+    d = army.to_dict()
+    d.pop("header")
+    d.pop("line")
+    for u in d["units"]:
+        u.pop("line")
+    return d
+
+
+def check_exports(
+    golden_dir=GOLDEN_EXPORTS_DIR, update: bool = False, names: NameIndex | None = None
+) -> bool:
+    ok = True
+    names = golden_names() if names is None else names
+    for txt in _golden_exports(golden_dir) + _golden_rosters(golden_dir):
+        got = _parse_golden(txt, names)
+        expected_path = txt.with_suffix(".json")
+        if update:
+            expected_path.write_text(
+                json.dumps(got, ensure_ascii=False, indent=1) + "\n", encoding="utf-8"
+            )
+            print(f"📝 {txt.name} : {len(got)} liste(s)")
+            continue
+        try:
+            expected = json.loads(expected_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"❌ {txt.name} : résultat attendu illisible ({e})")
+            ok = False
+            continue
+        # même résultat pour un texte collé (Streamlit) que pour le fichier (CLI)
+        # (roster : converti en texte de l'app comme dans Streamlit, puis relu)
+        if is_roster(txt):
+            roster = read_roster(txt, names)
+            pasted = [_comparable(parse_export_text(format_export(roster), names))]
+            same = pasted == [_comparable(roster)]
+        else:
+            pasted = iter_export_lists(
+                txt.read_text(encoding="utf-8").splitlines(), names
+            )
+            same = [a.to_dict() for a in pasted] == got
+        if not same:
+            print(f"❌ {txt.name} : texte collé et fichier analysés différemment")
+            ok = False
+            continue
+        if got == expected:
+            print(f"✅ {txt.name} : {len(got)} liste(s)")
+            continue
+        ok = False
+        print(f"❌ {txt.name} : {len(got)} liste(s), {len(expected)} attendue(s)")
+        for i, (g, e) in enumerate(zip(got, expected)):
+            for k in e:
+                if g.get(k) != e[k]:
+                    print(f"   liste {i + 1}, {k} : {g.get(k)!r} != {e[k]!r}")
+    return ok
+
+
+def cmd_check_exports(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py check-exports",
+        description="Compare le parseur d'export aux résultats de référence",
+    )
+    ap.add_argument(
+        "--dir", default=str(GOLDEN_EXPORTS_DIR), help="Exports de référence"
+    )
+    ap.add_argument(
+        "--update",
+        action="store_true",
+        help="Réécrire les résultats attendus (après relecture du diff !)",
+    )
+    ap.add_argument(
+        "--data",
+        nargs="*",
+        help="Dossiers de l'index de noms (défaut: tous les data_* à côté du script)",
+    )
+    args = ap.parse_args(argv)
+    if not check_exports(args.dir, args.update, golden_names(args.data)):
+        raise SystemExit(1)
+
+
+def bench_exports(golden_dir=GOLDEN_EXPORTS_DIR, repeat: int = 5, copies: int = 200):
+    """
+    Débit du parseur (listes/s, Mo/s) sur les exports de référence : chacun
+    analysé seul, puis tous concaténés `copies` fois en un pack lu en flux.
+    """
+    texts = [p.read_text(encoding="utf-8") for p in _golden_exports(golden_dir)]
+    pack = ("\n\n".join(texts) + "\n\n") * copies
+    results = {}
+    for label, source, run_once in (
+        (
+            "exports",
+            texts,
+            lambda: [a for t in texts for a in iter_export_lists(t.splitlines())],
+        ),
+        ("pack", [pack], lambda: list(iter_export_lists(io.StringIO(pack)))),
+    ):
+        best, lists = None, 0
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            lists = len(run_once())
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        size = sum(len(t.encode("utf-8")) for t in source)
+        results[label] = {
+            "lists": lists,
+            "bytes": size,
+            "seconds": round(best, 6),
+            "lists_per_s": round(lists / best),
+            "mb_per_s": round(size / best / 1e6, 2),
+        }
+    return results
+
+
+def cmd_bench_exports(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py bench-exports",
+        description="Débit du parseur d'export (listes/seconde) sur les exports de référence",
+    )
+    ap.add_argument(
+        "--dir", default=str(GOLDEN_EXPORTS_DIR), help="Exports de référence"
+    )
+    ap.add_argument("--repeat", type=int, default=5, help="Meilleur temps sur N")
+    ap.add_argument("--copies", type=int, default=200, help="Répétitions dans le pack")
+    ap.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = ap.parse_args(argv)
+    results = bench_exports(args.dir, args.repeat, args.copies)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{'entrée':<10} {'listes':>7} {'octets':>10} {'ms':>9} {'listes/s':>10} {'Mo/s':>7}"
+    )
+    for label, r in results.items():
+        print(
+            f"{label:<10} {r['lists']:>7} {r['bytes']:>10} {r['seconds'] * 1000:>9.1f}"
+            f" {r['lists_per_s']:>10} {r['mb_per_s']:>7.2f}"
+        )
+
+
+def cmd_vocab_stats(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py vocab-stats",
+        description="Pool de vocabulaire interné : valeurs uniques vs références",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à charger (défaut: tous les data_* à côté du script)",
+    )
+    ap.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = ap.parse_args(argv)
+    with string_scope() as pool:  # un pool commun à tous les dossiers chargés
+        for d in args.yaml_dirs or default_data_dirs():
+            load_corpus(d)
+    stats = pool.stats()
+    stats["unknown"] = unknown_values()
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return
+    print(f"{'catégorie':<20} {'total':>8} {'uniques':>8}")
+    for kind, c in stats["by_kind"].items():
+        print(f"{kind:<20} {c['total']:>8} {c['unique']:>8}")
+    print(f"{'TOTAL':<20} {stats['total']:>8} {stats['unique']:>8}")
+    for kind, values in stats["unknown"].items():
+        listed = ", ".join(f"{v} ×{n}" for v, n in values.items())
+        print(f"⚠️ {kind} inconnu(s) : {listed}")
+
+
+def cmd_validate(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py validate",
+        description="Valide des dossiers data_* contre les schémas file_descriptor_*",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à valider (défaut: tous les data_* à côté du script)",
+    )
+    ap.add_argument("--json", action="store_true", help="Rapports JSON")
+    ap.add_argument(
+        "--all", action="store_true", help="Lister aussi les valeurs normalisées"
+    )
+    args = ap.parse_args(argv)
+    reports = [validate_dir(d) for d in args.yaml_dirs or default_data_dirs()]
+    reports = [r for r in reports if r]
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+    else:
+        for r in reports:
+            print(format_validation(r))
+            for i in r["issues"]:
+                if i["level"] == "fixed" and not args.all:
+                    continue
+                value = f" {i['value']!r}" if "value" in i else ""
+                fixed = f" -> {i['fixed']!r}" if "fixed" in i else ""
+                where = f"{i['source']}/{i['file']}" if "source" in i else i["file"]
+                print(
+                    f"  [{i['level']}] {where}:{i['path']} ({i['item'] or '—'})"
+                    f" {i['code']}{value}{fixed}"
+                )
+    if not all(r["ok"] for r in reports):
+        raise SystemExit(1)
+
+
+def cmd_verify_loaders(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py verify-loaders",
+        description="Compare le loader YAML pur Python et libyaml (CSafeLoader)",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à vérifier (défaut: tous les data_* à côté du script)",
+    )
+    args = ap.parse_args(argv)
+    dirs = args.yaml_dirs or default_data_dirs()
+    if not verify_loaders(dirs):
+        raise SystemExit("❌ Les deux loaders ne produisent pas les mêmes données.")
+    print("✅ Loaders équivalents.")
+
+
+def cmd_dedup_report(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py dedup-report",
+        description="Fichiers identiques entre dossiers data_* et partage au chargement",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à charger (défaut: tous les data_* à côté du script)",
+    )
+    ap.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = ap.parse_args(argv)
+    dirs = args.yaml_dirs or default_data_dirs()
+    corpora = [load_corpus(d) for d in dirs]
+    report = content_dedup_report(dirs, corpora)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    for group in report["duplicates"]:
+        print(" = ".join(group))
+    shared = report["shared"]
+    print(
+        f"{len(corpora)} dossiers, {report['files']} fichiers, "
+        f"{report['unique']} contenus distincts ; "
+        f"partagés au chargement : {shared['files']} fichier(s), "
+        f"{shared['bytes'] / 1024:.0f} Ko, {shared['objects']} enregistrements"
+    )
+
+
+def cmd_compile_mmap(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py compile-mmap",
+        description="Compile le snapshot mmap (.corpus.mmap) de dossiers data_*",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à compiler (défaut: tous les data_* à côté du script)",
+    )
+    args = ap.parse_args(argv)
+    for d in args.yaml_dirs or default_data_dirs():
+        out = compile_mmap(d)
+        print(f"✅ Snapshot mmap: {out} ({out.stat().st_size // 1024} Ko)")
+
+
+def cmd_pack(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py pack",
+        description="Empaquette des dossiers data_* en archives compressées",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à empaqueter (défaut: tous les data_* à côté du script)",
+    )
+    ap.add_argument(
+        "--out-dir", help="Dossier des archives (défaut: à côté des sources)"
+    )
+    args = ap.parse_args(argv)
+    for d in args.yaml_dirs or default_data_dirs():
+        out = None
+        if args.out_dir:
+            out = Path(args.out_dir) / (Path(d).resolve().name + ARCHIVE_SUFFIX)
+        out = pack_data_dir(d, out)
+        print(f"✅ Archive: {out} ({out.stat().st_size // 1024} Ko)")
+
+
+def cmd_build_db(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py build-db",
+        description="Importe des dossiers data_* dans une base SQLite indexée",
+    )
+    ap.add_argument("db", help="Fichier SQLite à créer / mettre à jour")
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à importer (défaut: tous les data_* à côté du script)",
+    )
+    args = ap.parse_args(argv)
+    dirs = args.yaml_dirs or default_data_dirs()
+    try:
+        out = build_corpus_db(args.db, dirs)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    print(f"✅ Base SQLite: {out} ({len(dirs)} dossier(s))")
+
+
+def cmd_shard(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py shard",
+        description="Découpe stratagems.yaml en un fichier par détachement",
+    )
+    ap.add_argument("yaml_dirs", nargs="+", help="Dossiers data_* à découper")
+    args = ap.parse_args(argv)
+    for d in args.yaml_dirs:
+        out = shard_stratagems(d)
+        n = len(read_shard_manifest(d)["shards"])
+        print(f"✅ {n} shards écrits dans {out}/")
+
+
+def cmd_bench_load(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py bench-load",
+        description="Compare le chargement YAML en série et en parallèle",
+    )
+    ap.add_argument("yaml_dirs", nargs="+", help="Dossiers data_* à mesurer")
+    ap.add_argument("--repeat", type=int, default=3, help="Meilleur temps sur N")
+    args = ap.parse_args(argv)
+    print(f"CPU: {os.cpu_count()} · seuil parallèle: {PARALLEL_MIN_BYTES} octets")
+    print(f"{'dossier':<24} {'octets':>9} {'série (ms)':>11} {'parallèle (ms)':>15}")
+    for d in args.yaml_dirs:
+        paths = yaml_paths(d)
+        timings = []
+        for parse in (
+            lambda: [(p.name, load_yaml_file(p, use_twin=False)) for p in paths],
+            lambda: parse_yaml_docs_parallel(paths, use_twin=False),
+        ):
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                docs = parse()
+                dt = time.perf_counter() - t0
+                best = dt if best is None else min(best, dt)
+            timings.append((best, docs))
+        (t_ser, d_ser), (t_par, d_par) = timings
+        assert d_ser == d_par, f"{d}: résultats série/parallèle différents"
+        size = sum(p.stat().st_size for p in paths)
+        print(
+            f"{Path(d).name:<24} {size:>9} {t_ser * 1000:>11.1f} {t_par * 1000:>15.1f}"
+        )
+
+
+def build_twins(yaml_dir) -> tuple[int, list[Path]]:
+    """(Re)génère les jumeaux JSON d'un dossier et de ses shards."""
+    built, skipped = 0, []
+    paths = yaml_paths(yaml_dir) + yaml_paths(Path(yaml_dir, SHARDS_DIR))
+    for path in paths:
+        raw = path.read_bytes()
+        data = yaml_load(raw.decode("utf-8")) or {}
+        if write_twin(path, data, hashlib.sha256(raw).hexdigest()):
+            built += 1
+        else:
+            skipped.append(path)
+    return built, skipped
+
+
+def cmd_twins(argv):
+    ap = argparse.ArgumentParser(
+        prog="create_cheat_sheet.py twins",
+        description="Génère les jumeaux JSON de tous les YAML des dossiers data_*",
+    )
+    ap.add_argument(
+        "yaml_dirs",
+        nargs="*",
+        help="Dossiers à traiter (défaut: tous les data_* à côté du script)",
+    )
+    args = ap.parse_args(argv)
+    dirs = args.yaml_dirs or default_data_dirs()
+    for d in dirs:
+        built, skipped = build_twins(d)
+        print(f"✅ {d}: {built} jumeaux JSON")
+        for p in skipped:
+            print(f"   ⚠️  {p.name}: non convertible en JSON, reste en YAML")
+
+
+COMMANDS = {
+    "validate": cmd_validate,
+    "compile": cmd_compile,
+    "shard": cmd_shard,
+    "bench-load": cmd_bench_load,
+    "twins": cmd_twins,
+    "bench-yaml": cmd_bench_yaml,
+    "bench-memory": cmd_bench_memory,
+    "verify-loaders": cmd_verify_loaders,
+    "vocab-stats": cmd_vocab_stats,
+    "lists": cmd_lists,
+    "check-exports": cmd_check_exports,
+    "bench-exports": cmd_bench_exports,
+    "profile": cmd_profile,
+    "build-db": cmd_build_db,
+    "dedup-report": cmd_dedup_report,
+    "compile-mmap": cmd_compile_mmap,
+    "pack": cmd_pack,
+}
+
+
 def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
     ap = argparse.ArgumentParser(description="Fiche mémo A4 (HTML) depuis export 40k")
-    ap.add_argument("--export", required=True, help="export_from_40k_app.txt")
+    ap.add_argument(
+        "--export",
+        required=True,
+        help="export_from_40k_app.txt, ou roster BattleScribe .ros/.rosz",
+    )
     ap.add_argument("--yaml-dir", required=True, help="Dossier des ultramarines_*.yaml")
     ap.add_argument(
         "--out", default="cheat_sheet_ultramarines.html", help="HTML de sortie"
     )
+    ap.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        help="Ignorer le snapshot compilé (lecture YAML en flux des stratagèmes)",
+    )
+    ap.add_argument(
+        "--db", help="Base SQLite (build-db) à interroger au lieu de relire les YAML"
+    )
+    ap.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Lire le snapshot mmap (.corpus.mmap), partagé entre processus",
+    )
+    ap.add_argument(
+        "--no-unit-index",
+        action="store_true",
+        help="Parser toutes les unités au lieu d'utiliser l'index des unités",
+    )
     args = ap.parse_args(argv)
-    out = run(args.export, args.yaml_dir, args.out)
+    out = run(
+        args.export,
+        args.yaml_dir,
+        args.out,
+        use_snapshot=not args.no_snapshot,
+        db_path=args.db,
+        lazy_units=not args.no_unit_index,
+        use_mmap=args.mmap,
+    )
     print(f"✅ Fiche générée: {out}")
 
 
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parseur de l'export texte de l'app 40k, en une seule passe ligne à ligne.
+
+    test (995 points)                 <- titre (+ total)
+    Space Marines                     <- en-tête : faction, sous-faction,
+    Ultramarines                         format, détachement
+    Incursion (1000 points)
+    Gladius Task Force
+
+    CHARACTERS                        <- section
+    Chaplain (60 points)              <- unité
+      • Warlord                       <- mention (pas de "Nx")
+      • 1x Absolvor bolt pistol       <- équipement de l'unité
+        1x Crozius arcanum
+    BATTLELINE
+    Intercessor Squad (80 points)
+      • 4x Intercessor                <- groupe de figurines (il a des enfants)
+        • 4x Bolt rifle               <- équipement du groupe
+
+Une machine à états (titre -> en-tête -> corps) consomme chaque ligne une
+seule fois, sans regex : le coût est linéaire en la taille de l'export. La
+profondeur d'une sous-ligne est la colonne de son texte (après la puce).
+"""
+
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass, field
+import re
+
+FORMATS = ("combat patrol", "incursion", "strike force", "onslaught")
+_SECTION_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZ /’'–-")
+_BULLETS = "•·-*"
+
+
+def normalize_name(s: str) -> str:
+    s = s.lower()
+    s = re.sub(r"[\u2019’']", "", s)
+    s = re.sub(r"[^a-z0-9+&/ -]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def split_points(s: str) -> tuple[str, int] | None:
+    """'Chaplain (60 points)' -> ('Chaplain', 60) ; None si pas de suffixe."""
+    if not s.endswith(")"):
+        return None
+    i = s.rfind("(")
+    if i <= 0:
+        return None
+    inner = s[i + 1 : -1].split()
+    if (
+        len(inner) != 2
+        or not inner[0].isdigit()
+        or inner[1].lower() not in ("point", "points")
+    ):
+        return None
+    name = s[:i].strip()
+    return (name, int(inner[0])) if name else None
+
+
+def is_section(s: str) -> bool:
+    """Titre de section en capitales (CHARACTERS, OTHER DATASHEETS, ...)."""
+    return "A" <= s[0] <= "Z" and len(s) > 1 and all(c in _SECTION_CHARS for c in s)
+
+
+def _split_count(text: str) -> tuple[int | None, str]:
+    """'4x Bolt rifle' -> (4, 'Bolt rifle') ; 'Warlord' -> (None, 'Warlord')."""
+    head, _sep, rest = text.partition(" ")
+    if len(head) > 1 and head[-1] in "xX" and head[:-1].isdigit() and rest:
+        return int(head[:-1]), rest.strip()
+    return None, text
+
+
+class NameIndex:
+    """
+    Noms connus d'un corpus (détachements, factions), indexés par nom
+    normalisé : une ligne d'en-tête se résout en une recherche de dict.
+    """
+
+    __slots__ = ("detachments", "factions")
+
+    def __init__(self, detachments=(), factions=()):
+        self.detachments = {normalize_name(n): n for n in detachments if n}
+        self.factions = {normalize_name(n): n for n in factions if n}
+
+    def __bool__(self):
+        return bool(self.detachments or self.factions)
+
+    def lookup(self, line: str) -> tuple[str, str] | None:
+        """('detachment' | 'faction', nom canonique) ou None."""
+        key = normalize_name(line)
+        if key in self.detachments:
+            return "detachment", self.detachments[key]
+        if key in self.factions:
+            return "faction", self.factions[key]
+        return None
+
+    def to_dict(self) -> dict:
+        return {
+            "detachments": sorted(self.detachments.values()),
+            "factions": sorted(self.factions.values()),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "NameIndex":
+        return cls(d.get("detachments") or (), d.get("factions") or ())
+
+    @classmethod
+    def merge(cls, indexes) -> "NameIndex":
+        merged = cls()
+        for idx in indexes:
+            merged.detachments.update(idx.detachments)
+            merged.factions.update(idx.factions)
+        return merged
+
+
+# -----------------------------
+# Résultat structuré
+# -----------------------------
+
+
+@dataclass(slots=True)
+class Wargear:
+    name: str
+    count: int = 1
+
+
+@dataclass(slots=True)
+class ModelGroup:
+    """Une sous-ligne « Nx Figurine » et l'équipement listé sous elle."""
+
+    name: str
+    count: int = 1
+    wargear: list[Wargear] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ListedUnit:
+    name: str
+    points: int
+    section: str | None = None
+    models: list[ModelGroup] = field(default_factory=list)
+    wargear: list[Wargear] = field(default_factory=list)  # hors groupe
+    tags: list[str] = field(default_factory=list)  # Warlord, Enhancement: ...
+    line: int = 0
+
+    @property
+    def key(self) -> str:
+        return normalize_name(self.name)
+
+    @property
+    def model_count(self) -> int:
+        return sum(g.count for g in self.models) or 1
+
+
+@dataclass(slots=True)
+class ArmyList:
+    title: str | None = None
+    points_total: int | None = None
+    faction: str | None = None
+    chapter: str | None = None
+    detachment: str | None = None
+    format: str | None = None
+    format_points: int | None = None
+    header: list[str] = field(default_factory=list)  # lignes entre titre et corps
+    units: list[ListedUnit] = field(default_factory=list)
+    line: int = 0  # ligne du titre dans le fichier
+
+    def meta(self) -> dict:
+        """Le dict `army` historique de parse_export_txt."""
+        return {
+            "title": self.title,
+            "points_total": self.points_total,
+            "faction": self.faction,
+            "chapter": self.chapter,
+            "detachment": self.detachment,
+            "format": self.format,
+            "format_points": self.format_points,
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def listed(self) -> dict:
+        """Le dict `units` historique : clé -> {display, count, points_each, section}."""
+        units: dict[str, dict] = {}
+        for u in self.units:
+            info = units.setdefault(
+                u.key,
+                {
+                    "display": u.name,
+                    "count": 0,
+                    "points_each": u.points,
+                    "section": u.section,
+                },
+            )
+            info["count"] += 1
+        return units
+
+
+# -----------------------------
+# Machine à états
+# -----------------------------
+
+_TITLE, _HEADER, _BODY = range(3)
+
+
+class ExportParser:
+    """
+    Alimenté ligne par ligne (feed), renvoie l'ArmyList à la fin (close).
+    Les sous-lignes d'une unité sont gardées en arbre [colonne, nombre, nom,
+    enfants] jusqu'à l'unité suivante, puis converties.
+    """
+
+    def __init__(self, first_line: int = 1, names: NameIndex | None = None):
+        self.army = ArmyList()
+        self.names = names
+        self._state = _TITLE
+        self._section: str | None = None
+        self._unit: ListedUnit | None = None
+        self._entries: list = []
+        self._stack: list = []
+        self._lineno = first_line - 1
+
+    @property
+    def in_body(self) -> bool:
+        return self._state == _BODY
+
+    def feed(self, line: str):
+        self._lineno += 1
+        s = line.strip()
+        if not s:
+            return
+        if self._state == _TITLE:
+            self._title(s)
+            return
+        indent = len(line) - len(line.lstrip())
+        if indent:
+            if self._unit is not None:
+                self._sub_line(s, indent)
+            return
+        if is_section(s):
+            self._end_unit()
+            self._state = _BODY
+            self._section = s.upper()
+            return
+        parsed = split_points(s)
+        if self._state == _HEADER:
+            if parsed is None or parsed[0].lower() in FORMATS:
+                self.army.header.append(s)
+                return
+            self._state = _BODY  # unité sans section
+        if parsed is not None:
+            self._end_unit()
+            self._unit = ListedUnit(
+                parsed[0], parsed[1], self._section, line=self._lineno
+            )
+            self.army.units.append(self._unit)
+
+    def close(self) -> ArmyList:
+        self._end_unit()
+        self._header_meta()
+        return self.army
+
+    # --- étapes ---
+
+    def _title(self, s: str):
+        army = self.army
+        army.title = s.split("(", 1)[0].strip() or s
+        army.line = self._lineno
+        parsed = split_points(s)
+        if parsed is not None:
+            army.points_total = parsed[1]
+        self._state = _HEADER
+
+    def _header_meta(self):
+        """Faction, sous-faction, détachement : position autour de la ligne format."""
+        army = self.army
+        fmt = next(
+            (
+                i
+                for i, h in enumerate(army.header)
+                if (p := split_points(h)) and p[0].lower() in FORMATS
+            ),
+            None,
+        )
+        if fmt is not None:
+            name, pts = split_points(army.header[fmt])
+            army.format, army.format_points = name.title(), pts
+            before, after = army.header[:fmt], army.header[fmt + 1 :]
+        elif len(army.header) > 1:
+            before, after = army.header[:-1], army.header[-1:]
+        else:
+            before, after = army.header, []
+        if before:
+            army.faction = before[0]
+        if len(before) > 1:
+            army.chapter = before[1]
+        if after:
+            army.detachment = after[0]
+        if self.names:
+            self._known_names()
+
+    def _known_names(self):
+        """
+        Les lignes d'en-tête qui sont un détachement / une faction connus du
+        corpus l'emportent sur la position (ligne absente, ordre différent).
+        """
+        army = self.army
+        found: dict[str, tuple[str, str]] = {}
+        for h in army.header:
+            hit = self.names.lookup(h)
+            if hit is not None:
+                found.setdefault(hit[0], (h, hit[1]))
+        claimed = {line for line, _name in found.values()}
+        if army.chapter in claimed:
+            army.chapter = None
+        if "detachment" in found:
+            army.detachment = found["detachment"][1]
+        elif army.detachment in claimed:
+            army.detachment = None
+        if "faction" in found:
+            army.faction = found["faction"][1]
+        elif army.faction in claimed:
+            army.faction = None
+
+    def _sub_line(self, s: str, indent: int):
+        text = s.lstrip(_BULLETS).strip()
+        if not text:
+            return
+        col = indent + len(s) - len(text)
+        count, name = _split_count(text)
+        entry = [col, count, name, []]
+        while self._stack and self._stack[-1][0] >= col:
+            self._stack.pop()
+        (self._stack[-1][3] if self._stack else self._entries).append(entry)
+        self._stack.append(entry)
+
+    def _end_unit(self):
+        unit = self._unit
+        if unit is None:
+            return
+        for _col, count, name, children in self._entries:
+            if children:
+                unit.models.append(
+                    ModelGroup(name, count or 1, _flatten_wargear(children))
+                )
+            elif count is None:
+                unit.tags.append(name)
+            else:
+                unit.wargear.append(Wargear(name, count))
+        self._unit = None
+        self._entries = []
+        self._stack = []
+
+
+def _flatten_wargear(entries) -> list[Wargear]:
+    out = []
+    for _col, count, name, children in entries:
+        out.append(Wargear(name, count or 1))
+        out.extend(_flatten_wargear(children))
+    return out
+
+
+def parse_export_lines(lines, names: NameIndex | None = None) -> ArmyList:
+    parser = ExportParser(names=names)
+    for line in lines:
+        parser.feed(line)
+    return parser.close()
+
+
+def parse_export_text(text: str, names: NameIndex | None = None) -> ArmyList:
+    return parse_export_lines(text.splitlines(), names)
+
+
+def parse_export_file(path, names: NameIndex | None = None) -> ArmyList:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_export_lines(f, names)
+
+
+def _bullets(items, indent: int) -> list[str]:
+    """Sous-lignes à la façon de l'app : puce sur la première, texte aligné."""
+    return [
+        " " * indent + ("• " if i == 0 else "  ") + text for i, text in enumerate(items)
+    ]
+
+
+def format_export(army: ArmyList) -> str:
+    """
+    ArmyList -> texte au format de l'app 40k, relu à l'identique par
+    parse_export_text (p. ex. pour une liste importée d'un autre outil).
+    """
+    lines = [f"{army.title or 'Army'} ({army.points_total or 0} points)", ""]
+    lines += [h for h in (army.faction, army.chapter) if h]
+    if army.format:
+        fmt = army.format
+        lines.append(
+            f"{fmt} ({army.format_points} points)" if army.format_points else fmt
+        )
+    if army.detachment:
+        lines.append(army.detachment)
+    by_section: dict[str, list[ListedUnit]] = {}
+    for u in army.units:
+        by_section.setdefault(u.section or "OTHER DATASHEETS", []).append(u)
+    for section, units in by_section.items():
+        lines += ["", "", section]
+        for u in units:
+            lines += ["", f"{u.name} ({u.points} points)"]
+            gear = [f"{w.count}x {w.name}" for w in u.wargear]
+            lines += _bullets(u.tags + gear, 2)
+            for m in u.models:
+                lines += _bullets([f"{m.count}x {m.name}"], 2)
+                lines += _bullets([f"{w.count}x {w.name}" for w in m.wargear], 4)
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# Packs de listes (tournois)
+# -----------------------------
+# Un fichier peut enchaîner plusieurs exports. Une ligne « Titre (N points) »
+# non indentée au milieu du corps d'une liste est soit une unité, soit le titre
+# de la liste suivante : on la met de côté jusqu'à la ligne non vide suivante.
+# Si celle-ci est une ligne d'en-tête (faction, format...), une nouvelle liste
+# commence ; sinon (puces, unité, section) c'était une unité.
+
+
+def _points_line(line: str) -> bool:
+    if line[:1].isspace():
+        return False
+    parsed = split_points(line.strip())
+    return parsed is not None and parsed[0].lower() not in FORMATS
+
+
+def _header_line(line: str) -> bool:
+    if line[:1].isspace():
+        return False
+    s = line.strip()
+    if is_section(s):
+        return False
+    parsed = split_points(s)
+    return parsed is None or parsed[0].lower() in FORMATS
+
+
+def iter_export_lists(lines, names: NameIndex | None = None) -> Iterator[ArmyList]:
+    """
+    Une ArmyList par export contenu dans `lines` (itérable de lignes, p. ex.
+    un fichier ouvert), produite dès que la suivante commence : la mémoire
+    reste bornée à une liste, quelle que soit la taille du pack.
+    """
+    parser = ExportParser(names=names)
+    held: list[str] = []  # titre candidat + lignes vides qui le suivent
+    lineno = 0
+    for line in lines:
+        lineno += 1
+        if held:
+            if not line.strip():
+                held.append(line)
+                continue
+            if _header_line(line):
+                yield parser.close()
+                parser = ExportParser(lineno - len(held), names)
+            for h in held:
+                parser.feed(h)
+            held = []
+        if parser.in_body and _points_line(line):
+            held.append(line)
+            continue
+        parser.feed(line)
+    for h in held:
+        parser.feed(h)
+    if parser.army.title is not None:
+        yield parser.close()
+
+
+def iter_export_file(path, names: NameIndex | None = None) -> Iterator[ArmyList]:
+    with open(path, "r", encoding="utf-8") as f:
+        yield from iter_export_lists(f, names)
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parseur YAML spécialisé pour le sous-ensemble utilisé par les fichiers
+de données (file_descriptor_main+unit.yaml, file_descriptor_stratagem.yaml) :
+
+  - mappings et séquences en bloc (y compris "- clé: valeur" compact),
+  - listes/mappings en flux sur une ligne ([a, "b"], { }, { start: [] }),
+  - scalaires simples, 'simples quotes' et "doubles quotes",
+    éventuellement repliés sur plusieurs lignes,
+  - commentaires.
+
+Le typage des scalaires simples reprend les résolveurs de PyYAML (SafeLoader),
+donc le résultat est identique à yaml.safe_load. Tout ce qui sort de ce
+sous-ensemble (ancres, tags, blocs | et >, documents multiples, entiers octaux,
+dates, ...) lève UnsupportedYAML ; load() retombe alors sur PyYAML.
+"""
+
+import re
+
+import yaml  # type: ignore
+from yaml.constructor import SafeConstructor  # type: ignore
+from yaml.resolver import Resolver  # type: ignore
+
+
+class UnsupportedYAML(ValueError):
+    """Construction YAML hors du sous-ensemble géré par ce parseur."""
+
+
+_NULL = "tag:yaml.org,2002:null"
+_BOOL = "tag:yaml.org,2002:bool"
+_INT = "tag:yaml.org,2002:int"
+_FLOAT = "tag:yaml.org,2002:float"
+_STR = "tag:yaml.org,2002:str"
+
+_SIMPLE_INT = re.compile(r"[-+]?(?:0|[1-9][0-9]*)$")
+_SIMPLE_FLOAT = re.compile(r"[-+]?[0-9]+\.[0-9]*(?:[eE][-+]?[0-9]+)?$")
+
+# indicateurs qui ne peuvent pas commencer un scalaire simple (ou qu'on ne gère pas)
+_BAD_PLAIN_START = set("&*!|>%@`,[]{}#'\"")
+
+
+def _bad_plain_start(text: str) -> bool:
+    c0 = text[:1]
+    if not c0 or c0 in _BAD_PLAIN_START:
+        return True
+    # "-", "?" et ":" ne commencent un scalaire que s'ils sont collés à la suite
+    return c0 in "-?:" and text[1:2] in ("", " ")
+
+
+_ESCAPES = {
+    "0": "\0",
+    "a": "\x07",
+    "b": "\x08",
+    "t": "\t",
+    "\t": "\t",
+    "n": "\n",
+    "v": "\x0b",
+    "f": "\x0c",
+    "r": "\r",
+    "e": "\x1b",
+    " ": " ",
+    '"': '"',
+    "/": "/",
+    "\\": "\\",
+    "N": "\x85",
+    "_": "\xa0",
+    "L": "\u2028",
+    "P": "\u2029",
+}
+_ESCAPE_CODES = {"x": 2, "u": 4, "U": 8}
+
+_resolved: dict[str, object] = {}
+
+
+def _resolve_plain(value: str):
+    """Type d'un scalaire simple, exactement comme le SafeLoader de PyYAML."""
+    try:
+        return _resolved[value]
+    except KeyError:
+        pass
+    tag = _STR
+    for t, regexp in Resolver.yaml_implicit_resolvers.get(value[:1] or "", []):
+        if regexp.match(value):
+            tag = t
+            break
+    if tag == _STR:
+        out = value
+    elif tag == _NULL:
+        out = None
+    elif tag == _BOOL:
+        out = SafeConstructor.bool_values[value.lower()]
+    elif tag == _INT and _SIMPLE_INT.match(value):
+        out = int(value)
+    elif tag == _FLOAT and _SIMPLE_FLOAT.match(value):
+        out = float(value)
+    else:
+        raise UnsupportedYAML(f"scalaire {value!r} ({tag})")
+    if len(_resolved) < 65536:
+        _resolved[value] = out
+    return out
+
+
+def _unescape(s: str) -> str:
+    if "\\" not in s:
+        return s
+    out, i, n = [], 0, len(s)
+    while i < n:
+        c = s[i]
+        if c != "\\":
+            out.append(c)
+            i += 1
+            continue
+        if i + 1 >= n:
+            raise UnsupportedYAML("échappement en fin de ligne")
+        e = s[i + 1]
+        if e in _ESCAPES:
+            out.append(_ESCAPES[e])
+            i += 2
+        elif e in _ESCAPE_CODES:
+            width = _ESCAPE_CODES[e]
+            code = s[i + 2 : i + 2 + width]
+            if len(code) != width:
+                raise UnsupportedYAML("échappement tronqué")
+            out.append(chr(int(code, 16)))
+            i += 2 + width
+        else:
+            raise UnsupportedYAML(f"échappement \\{e}")
+    return "".join(out)
+
+
+def _find_close(s: str, start: int, quote: str) -> int:
+    """Position de la quote fermante dans s à partir de start, ou -1."""
+    i, n = start, len(s)
+    while i < n:
+        c = s[i]
+        if quote == "'":
+            if c == "'":
+                if i + 1 < n and s[i + 1] == "'":
+                    i += 2
+                    continue
+                return i
+        else:
+            if c == "\\":
+                i += 2
+                continue
+            if c == '"':
+                return i
+        i += 1
+    return -1
+
+
+_UNSUPPORTED_CHARS = ("\t", "\x85", "\u2028", "\u2029")
+
+
+def _check_tail(tail: str) -> None:
+    """Après un scalaire quoté ou un flux : seulement des blancs ou un commentaire."""
+    t = tail.lstrip(" ")
+    if t and (not t.startswith("#") or t is tail):
+        raise UnsupportedYAML(f"contenu inattendu {tail!r}")
+
+
+class _Parser:
+    def __init__(self, text: str):
+        if text.startswith("\ufeff"):
+            text = text[1:]
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+            if "\r" in text:
+                raise UnsupportedYAML("fin de ligne \\r")
+        # tabulations (séparateurs ou indentation) et sauts de ligne Unicode
+        # (NEL, U+2028, U+2029) : règles de PyYAML non reproduites ici
+        for c in _UNSUPPORTED_CHARS:
+            if c in text:
+                raise UnsupportedYAML(f"caractère {c!r}")
+        self.raw = text.split("\n")
+        lines = []
+        for line in self.raw:
+            content = line.lstrip(" ")
+            if not content or content.startswith("#"):
+                lines.append(None)
+            else:
+                lines.append([len(line) - len(content), content.rstrip(" ")])
+        self.lines = lines
+        self.i = 0
+
+    # -- navigation --------------------------------------------------------
+    def _cur(self):
+        lines, i, n = self.lines, self.i, len(self.lines)
+        while i < n and lines[i] is None:
+            i += 1
+        self.i = i
+        return lines[i] if i < n else None
+
+    # -- document ----------------------------------------------------------
+    def parse(self):
+        cur = self._cur()
+        if cur is None:
+            return None
+        c = cur[1]
+        if c.startswith("---") or c.startswith("...") or c.startswith("%"):
+            raise UnsupportedYAML("marqueur de document")
+        if cur[0] != 0:
+            raise UnsupportedYAML("document indenté")
+        value = self._block_node(0)
+        if self._cur() is not None:
+            raise UnsupportedYAML(f"ligne {self.i + 1} : indentation inattendue")
+        return value
+
+    # -- blocs -------------------------------------------------------------
+    def _block_node(self, indent: int):
+        content = self.lines[self.i][1]
+        if content == "-" or content.startswith("- "):
+            return self._block_seq(indent)
+        if self._split_key(content) is not None:
+            return self._block_map(indent)
+        return self._inline(content, indent - 1)
+
+    def _block_seq(self, indent: int):
+        items = []
+        while True:
+            cur = self._cur()
+            if cur is None or cur[0] != indent:
+                break
+            content = cur[1]
+            if not (content == "-" or content.startswith("- ")):
+                break
+            rest = content[1:].lstrip(" ")
+            if not rest or rest.startswith("#"):
+                self.i += 1
+                nxt = self._cur()
+                if nxt is not None and nxt[0] > indent:
+                    items.append(self._block_node(nxt[0]))
+                else:
+                    items.append(None)
+                continue
+            if rest == "-" or rest.startswith("- "):
+                raise UnsupportedYAML("séquence compacte imbriquée")
+            col = indent + len(content) - len(rest)
+            self.lines[self.i] = [col, rest]
+            items.append(self._block_node(col))
+        return items
+
+    def _block_map(self, indent: int):
+        d = {}
+        while True:
+            cur = self._cur()
+            if cur is None or cur[0] != indent:
+                break
+            content = cur[1]
+            if content == "-" or content.startswith("- "):
+                break
+            kv = self._split_key(content)
+            if kv is None:
+                raise UnsupportedYAML(f"ligne {self.i + 1} : clé attendue")
+            key, rest = kv
+            if not rest or rest.startswith("#"):
+                self.i += 1
+                nxt = self._cur()
+                if nxt is not None and nxt[0] > indent:
+                    value = self._block_node(nxt[0])
+                elif (
+                    nxt is not None
+                    and nxt[0] == indent
+                    and (nxt[1] == "-" or nxt[1].startswith("- "))
+                ):
+                    value = self._block_seq(indent)
+                else:
+                    value = None
+            else:
+                value = self._inline(rest, indent)
+            d[key] = value
+        return d
+
+    def _split_key(self, content: str):
+        """(clé, reste) si la ligne est une entrée "clé: valeur", sinon None."""
+        c0 = content[0]
+        if c0 == "'" or c0 == '"':
+            end = _find_close(content, 1, c0)
+            if end < 0:
+                return None
+            after = content[end + 1 :]
+            if after != ":" and not after.startswith(": "):
+                return None
+            inner = content[1:end]
+            key = inner.replace("''", "'") if c0 == "'" else _unescape(inner)
+            return key, after[1:].lstrip(" ")
+        if c0 in "[{":
+            if ": " in content and content.index(": ") > content.rfind(c0):
+                raise UnsupportedYAML("clé complexe")
+            return None
+        pos = content.find(": ")
+        if pos < 0:
+            if not content.endswith(":"):
+                return None
+            pos = len(content) - 1
+        key = content[:pos]
+        if " #" in key:
+            return None
+        if _bad_plain_start(key):
+            raise UnsupportedYAML(f"clé {key!r}")
+        return _resolve_plain(key.rstrip(" ")), content[pos + 1 :].lstrip(" ")
+
+    # -- scalaires ---------------------------------------------------------
+    def _inline(self, text: str, parent_indent: int):
+        """Valeur commençant sur la ligne courante (text) ; avance le curseur."""
+        c0 = text[0]
+        if c0 == "[" or c0 == "{":
+            value, pos = _Flow(text).parse()
+            _check_tail(text[pos:])
+            self.i += 1
+            return value
+        if c0 == "'" or c0 == '"':
+            return self._quoted(text, parent_indent)
+        if _bad_plain_start(text):
+            raise UnsupportedYAML(f"ligne {self.i + 1} : {text!r}")
+        return self._plain(text, parent_indent)
+
+    def _plain(self, text: str, parent_indent: int):
+        cut = text.find(" #")
+        first = text if cut < 0 else text[:cut].rstrip(" \t")
+        if ": " in first or first.endswith(":"):
+            raise UnsupportedYAML(f"ligne {self.i + 1} : ':' dans un scalaire")
+        self.i += 1
+        if cut >= 0:
+            return _resolve_plain(first)
+        parts = [first]
+        lines, n = self.lines, len(self.lines)
+        i, blanks = self.i, 0
+        while i < n:
+            ln = lines[i]
+            if ln is None:
+                if self.raw[i].strip(" "):  # commentaire : fin du scalaire
+                    break
+                blanks += 1
+                i += 1
+                continue
+            if ln[0] <= parent_indent:
+                break
+            c = ln[1]
+            if ": " in c or c.endswith(":") or " #" in c or c.startswith("#"):
+                raise UnsupportedYAML(f"ligne {i + 1} : suite de scalaire ambiguë")
+            parts.append("\n" * blanks if blanks else " ")
+            parts.append(c)
+            blanks = 0
+            i += 1
+            self.i = i
+        if len(parts) == 1:
+            return _resolve_plain(first)
+        return "".join(parts)
+
+    def _quoted(self, text: str, parent_indent: int):
+        q = text[0]
+        end = _find_close(text, 1, q)
+        if end >= 0:
+            _check_tail(text[end + 1 :])
+            self.i += 1
+            inner = text[1:end]
+            return inner.replace("''", "'") if q == "'" else _unescape(inner)
+
+        # scalaire quoté sur plusieurs lignes : repli des sauts de ligne
+        segments = [text[1:].rstrip(" \t")]
+        blanks = 0
+        i, n = self.i + 1, len(self.raw)
+        while True:
+            if i >= n:
+                raise UnsupportedYAML("quote non fermée")
+            raw = self.raw[i]
+            body = raw.strip(" \t")
+            if not body:
+                blanks += 1
+                i += 1
+                continue
+            if len(raw) - len(raw.lstrip(" ")) <= parent_indent:
+                raise UnsupportedYAML(f"ligne {i + 1} : quote mal indentée")
+            end = _find_close(body, 0, q)
+            segments.append("\n" * blanks if blanks else " ")
+            blanks = 0
+            if end >= 0:
+                segments.append(body[:end])
+                _check_tail(body[end + 1 :])
+                break
+            segments.append(body)
+            i += 1
+        self.i = i + 1
+        if q == '"':
+            if any(s.endswith("\\") for s in segments[:-1:2]):
+                raise UnsupportedYAML("saut de ligne échappé")
+            return "".join(
+                _unescape(s) if k % 2 == 0 else s for k, s in enumerate(segments)
+            )
+        return "".join(segments).replace("''", "'")
+
+
+class _Flow:
+    """Collections en flux tenant sur une ligne : [a, 'b', [c]] et {k: v}."""
+
+    def __init__(self, s: str):
+        self.s = s
+        self.n = len(s)
+
+    def parse(self):
+        value, pos = self._node(0)
+        return value, pos
+
+    def _ws(self, pos: int) -> int:
+        s, n = self.s, self.n
+        while pos < n and s[pos] == " ":
+            pos += 1
+        return pos
+
+    def _node(self, pos: int):
+        pos = self._ws(pos)
+        if pos >= self.n:
+            raise UnsupportedYAML("flux sur plusieurs lignes")
+        c = self.s[pos]
+        if c == "[":
+            return self._seq(pos + 1)
+        if c == "{":
+            return self._map(pos + 1)
+        if c == "'" or c == '"':
+            end = _find_close(self.s, pos + 1, c)
+            if end < 0:
+                raise UnsupportedYAML("quote non fermée dans un flux")
+            inner = self.s[pos + 1 : end]
+            return (inner.replace("''", "'") if c == "'" else _unescape(inner)), end + 1
+        return self._plain(pos)
+
+    def _plain(self, pos: int):
+        s, n = self.s, self.n
+        start = pos
+        while pos < n and s[pos] not in ",[]{}":
+            c = s[pos]
+            # ':' ne sépare clé et valeur que suivi d'un blanc ou d'un indicateur
+            # de flux ({b:1} a pour clé 'b:1') ; '?' en flux : non géré
+            if c == ":" and (pos + 1 >= n or s[pos + 1] in " ,[]{}"):
+                break
+            if c == "#" and s[pos - 1] == " ":
+                break
+            if c == "?":
+                raise UnsupportedYAML("'?' dans un flux")
+            pos += 1
+        text = s[start:pos].rstrip(" ")
+        if _bad_plain_start(text):
+            raise UnsupportedYAML(f"scalaire de flux {text!r}")
+        return _resolve_plain(text), pos
+
+    def _seq(self, pos: int):
+        items = []
+        pos = self._ws(pos)
+        if pos < self.n and self.s[pos] == "]":
+            return items, pos + 1
+        while True:
+            value, pos = self._node(pos)
+            items.append(value)
+            pos = self._ws(pos)
+            if pos >= self.n:
+                raise UnsupportedYAML("flux sur plusieurs lignes")
+            c = self.s[pos]
+            if c == "]":
+                return items, pos + 1
+            if c != ",":
+                raise UnsupportedYAML(f"flux : {c!r} inattendu")
+            pos = self._ws(pos + 1)
+            if pos < self.n and self.s[pos] == "]":
+                return items, pos + 1
+
+    def _map(self, pos: int):
+        d = {}
+        pos = self._ws(pos)
+        if pos < self.n and self.s[pos] == "}":
+            return d, pos + 1
+        while True:
+            key, pos = self._node(pos)
+            if isinstance(key, (list, dict)):
+                raise UnsupportedYAML("clé complexe dans un flux")
+            pos = self._ws(pos)
+            if pos >= self.n or self.s[pos] != ":":
+                raise UnsupportedYAML("flux : ':' attendu")
+            pos = self._ws(pos + 1)
+            if pos < self.n and self.s[pos] in ",}":
+                value = None
+            else:
+                value, pos = self._node(pos)
+            d[key] = value
+            pos = self._ws(pos)
+            if pos >= self.n:
+                raise UnsupportedYAML("flux sur plusieurs lignes")
+            c = self.s[pos]
+            if c == "}":
+                return d, pos + 1
+            if c != ",":
+                raise UnsupportedYAML(f"flux : {c!r} inattendu")
+            pos = self._ws(pos + 1)
+            if pos < self.n and self.s[pos] == "}":
+                return d, pos + 1
+
+
+def parse(text: str):
+    """Parse strictement le sous-ensemble ; lève UnsupportedYAML sinon."""
+    return _Parser(text).parse()
+
+
+def load(stream, fallback_loader=None):
+    """
+    Comme yaml.safe_load pour le sous-ensemble des fichiers de données ;
+    tout document hors sous-ensemble est confié à PyYAML (fallback_loader,
+    SafeLoader par défaut), qui produit alors le résultat ou l'erreur.
+    """
+    text = stream if isinstance(stream, str) else stream.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    try:
+        return parse(text)
+    except UnsupportedYAML:
+        return yaml.load(text, Loader=fallback_loader or yaml.SafeLoader)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Corpus en couches : un dossier data_* déclare ses dossiers parents dans
+layers.yaml ; les couches sont chargées séparément puis fusionnées.
+"""
+
+from pathlib import Path
+
+from corpus import Corpus, load_dir_corpus
+from corpus_docs import LAYERS_FILE, file_fingerprint, yaml_load
+from corpus_validation import combine_validation
+from export_parser import normalize_name
+from models import Stratagem, Unit, string_scope
+
+
+# -----------------------------
+# Corpus en couches
+# -----------------------------
+# Un dossier peut déclarer ses dossiers parents dans layers.yaml, au lieu de
+# recopier leurs fichiers :
+#
+#   layers:          # du plus bas au plus haut, chemins relatifs au dossier
+#     - ../data_SM
+#
+# Les fichiers du dossier lui-même forment la couche la plus haute. Une unité
+# (nom normalisé) ou un stratagème (nom + détachements) d'une couche haute
+# remplace celui des couches basses ; phases et faction_helpers viennent de la
+# couche la plus haute qui les définit.
+
+
+def is_layered(yaml_dir) -> bool:
+    return (Path(yaml_dir) / LAYERS_FILE).is_file()
+
+
+def corpus_layers(yaml_dir, _seen: tuple = ()) -> list[Path]:
+    """Pile des dossiers, du plus bas au plus haut (le dossier lui-même en dernier)."""
+    d = Path(yaml_dir).resolve()
+    if d in _seen:
+        raise ValueError(f"Cycle dans les couches : {d}")
+    if not is_layered(d):
+        return [d]
+    spec = yaml_load((d / LAYERS_FILE).read_text(encoding="utf-8")) or {}
+    stack: list[Path] = []
+    for parent in spec.get("layers") or []:
+        for p in corpus_layers(d / parent, _seen + (d,)):
+            if p not in stack:
+                stack.append(p)
+    stack.append(d)
+    return stack
+
+
+def _defines(corpus: Corpus, key: str) -> bool:
+    return any(key in f.extras for f in corpus.files.values())
+
+
+def _merge_layers(target: Corpus, layers: list[Corpus]):
+    units: list[Unit] = []
+    units_by_key: dict[str, Unit] = {}
+    strats: list[Stratagem] = []
+    for layer in layers:
+        units = [u for u in units if normalize_name(u.name) not in layer.units_by_key]
+        units += layer.units
+        units_by_key.update(layer.units_by_key)
+        keys = {(st.name, st.detachment) for st in layer.stratagems}
+        strats = [st for st in strats if (st.name, st.detachment) not in keys]
+        strats += layer.stratagems
+    top_phases = next((c for c in reversed(layers) if _defines(c, "phases")), None)
+    top_helpers = next(
+        (c for c in reversed(layers) if _defines(c, "faction_helpers")), None
+    )
+    target.units = units
+    target.units_by_key = units_by_key
+    target.stratagems = strats
+    target.phases = (top_phases or layers[-1]).phases
+    target.faction_helpers = (top_helpers or layers[-1]).faction_helpers
+    target.detachments = next(
+        (c.detachments for c in layers if c.detachments is not None), None
+    )
+    target.validation = combine_validation(
+        [c.validation for c in layers], target.source
+    )
+
+
+# (pile, détachements, snapshot) -> (manifests, corpus des couches, corpus fusionné)
+_LAYERED_CACHE: dict[tuple, tuple[dict, list[Corpus], Corpus]] = {}
+
+
+def load_layered_corpus(
+    yaml_dir, detachments: set[str] | None = None, use_snapshot: bool = True
+) -> Corpus:
+    """
+    Fusion des couches d'un dossier. Le résultat est mis en cache : les appels
+    suivants ne font que rafraîchir les couches (Corpus.refresh) et ne
+    refusionnent que si l'une d'elles a changé.
+    """
+    stack = corpus_layers(yaml_dir)
+    manifests = {
+        str(d): file_fingerprint(d / LAYERS_FILE, with_hash=False)
+        for d in stack
+        if is_layered(d)
+    }
+    key = (
+        tuple(str(d) for d in stack),
+        frozenset(detachments) if detachments else None,
+        use_snapshot,
+    )
+    cached = _LAYERED_CACHE.get(key)
+    if cached is not None and cached[0] == manifests:
+        _manifests, layers, merged = cached
+        if any([layer.refresh() for layer in layers]):
+            _merge_layers(merged, layers)
+        return merged
+    with string_scope() as pool:  # un seul pool pour toutes les couches
+        layers = [load_dir_corpus(d, detachments, use_snapshot) for d in stack]
+    merged = Corpus([], {}, {}, {}, [], source=str(yaml_dir), strings=pool)
+    _merge_layers(merged, layers)
+    _LAYERED_CACHE[key] = (manifests, layers, merged)
+    return merged
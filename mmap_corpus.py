@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot du corpus lisible en mmap, en lecture seule.
+
+Les unités et stratagèmes sont écrits en enregistrements de taille fixe (u32
+petit-boutiste) qui référencent une table de valeurs (chaînes et scalaires
+dédoublonnés). Plusieurs processus qui ouvrent le même fichier partagent ses
+pages via le cache de l'OS ; un enregistrement n'est décodé en objet models.*
+qu'au moment où on y accède.
+
+Disposition :
+    MAGIC | version (u16) | taille de l'en-tête (u32) | en-tête JSON | sections
+
+L'en-tête JSON donne la position (octet, nombre d'éléments) de chaque section
+et les métadonnées libres de l'appelant (empreintes des sources, etc.).
+"""
+
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+import json
+import mmap
+import struct
+
+from models import (
+    Ability,
+    Stats,
+    Stratagem,
+    Unit,
+    Weapon,
+    WeaponProfile,
+    Window,
+    dumps_data,
+    loads_data,
+)
+
+MAGIC = b"C40KMMAP"
+VERSION = 4
+
+# Une valeur : (offset, longueur) dans le blob ; le premier octet est un tag.
+_VALUE = struct.Struct("<II")
+_REF = struct.Struct("<I")
+# name role faction detachment phase_tips | keywords base ranged melee abilities
+_UNIT = struct.Struct("<5I10I")
+_WEAPON = struct.Struct("<3I")  # name | profiles
+_PROFILE = struct.Struct("<9I2I")  # name range A BS WS to_hit S AP D | keywords
+_ABILITY = struct.Struct("<2I")  # name text
+_STRAT = struct.Struct("<5I4I")  # name cp type target effect | detachment when
+_WINDOW = struct.Struct("<5I")  # phase step player timing_note alias
+_KEY = struct.Struct("<2I")  # clé normalisée, index d'unité
+_DETACH = struct.Struct("<3I")  # détachement | indices de stratagèmes
+
+# sections d'enregistrements écrites par le builder
+_RECORDS = {
+    "units": _UNIT,
+    "weapons": _WEAPON,
+    "profiles": _PROFILE,
+    "abilities": _ABILITY,
+    "strats": _STRAT,
+    "windows": _WINDOW,
+}
+
+_STATS = Stats.__slots__
+_PROFILE_FIELDS = ("range", "A", "BS", "WS", "to_hit", "S", "AP", "D")
+
+
+def _encode_value(v) -> bytes:
+    if isinstance(v, str):
+        return b"s" + v.encode("utf-8")
+    if isinstance(v, bool):
+        return b"b" + (b"1" if v else b"0")
+    if isinstance(v, int):
+        return b"i" + str(v).encode("ascii")
+    if isinstance(v, float):
+        return b"f" + repr(v).encode("ascii")
+    return b"j" + dumps_data(v).encode("utf-8")  # listes, dicts... (jamais pickle)
+
+
+def _decode_value(raw: bytes):
+    tag, payload = raw[:1], raw[1:]
+    if tag == b"s":
+        return payload.decode("utf-8")
+    if tag == b"i":
+        return int(payload)
+    if tag == b"b":
+        return payload == b"1"
+    if tag == b"f":
+        return float(payload)
+    if tag == b"j":
+        return loads_data(payload)
+    raise ValueError(f"Valeur de type inconnu dans le snapshot mmap : {tag!r}")
+
+
+class _Builder:
+    def __init__(self):
+        self.blob = bytearray()
+        self.values: list[tuple[int, int]] = []
+        self.ids: dict = {}
+        self.refs: list[int] = []
+        self.sections: dict[str, bytearray] = {k: bytearray() for k in _RECORDS}
+
+    def value(self, v) -> int:
+        """Id de valeur (0 = None), dédoublonné sur (type, valeur)."""
+        if v is None:
+            return 0
+        try:
+            key = (type(v), v)
+            hash(key)
+        except TypeError:
+            key = None
+        if key is not None and key in self.ids:
+            return self.ids[key]
+        raw = _encode_value(v)
+        self.values.append((len(self.blob), len(raw)))
+        self.blob += raw
+        vid = len(self.values)
+        if key is not None:
+            self.ids[key] = vid
+        return vid
+
+    def ref_list(self, items) -> tuple[int, int]:
+        start = len(self.refs)
+        self.refs.extend(items)
+        return start, len(self.refs) - start
+
+    def count(self, section: str) -> int:
+        return len(self.sections[section]) // _RECORDS[section].size
+
+    def add(self, section: str, *fields):
+        self.sections[section] += _RECORDS[section].pack(*fields)
+
+    def weapons(self, weapons) -> tuple[int, int]:
+        start = self.count("weapons")
+        for w in weapons:
+            pstart = self.count("profiles")
+            for p in w.profiles:
+                self.add(
+                    "profiles",
+                    self.value(p.name),
+                    *(self.value(getattr(p, f)) for f in _PROFILE_FIELDS),
+                    *self.ref_list(self.value(k) for k in p.keywords),
+                )
+            self.add("weapons", self.value(w.name), pstart, len(w.profiles))
+        return start, len(weapons)
+
+    def abilities(self, abilities) -> tuple[int, int]:
+        start = self.count("abilities")
+        for a in abilities:
+            self.add("abilities", self.value(a.name), self.value(a.text))
+        return start, len(abilities)
+
+    def windows(self, windows) -> tuple[int, int]:
+        start = self.count("windows")
+        for w in windows:
+            self.add(
+                "windows",
+                self.value(w.phase),
+                self.value(w.step),
+                self.value(w.player),
+                self.value(w.timing_note),
+                self.value(w.alias),
+            )
+        return start, len(windows)
+
+
+def write(path, units, keys, stratagems, extras: dict, meta: dict):
+    """
+    Écrit le snapshot. `keys[i]` est la clé normalisée de `units[i]` ; pour une
+    clé répétée, la dernière unité gagne (comme Corpus.units_by_key). `extras`
+    (phases, faction_helpers...) est stocké en valeurs ; `meta` dans l'en-tête.
+    """
+    b = _Builder()
+    for u in units:
+        base = (
+            b.ref_list(b.value(getattr(u.base, f)) for f in _STATS)
+            if u.base is not None
+            else (0, 0)
+        )
+        b.add(
+            "units",
+            b.value(u.name),
+            b.value(u.role),
+            b.value(u.faction),
+            b.value(u.detachment),
+            b.value(u.phase_tips),
+            *b.ref_list(b.value(k) for k in u.keywords),
+            *base,
+            *b.weapons(u.ranged),
+            *b.weapons(u.melee),
+            *b.abilities(u.abilities),
+        )
+    by_key = {}
+    for i, k in enumerate(keys):
+        by_key[k] = i
+    key_table = bytearray()
+    for k in sorted(by_key):
+        key_table += _KEY.pack(b.value(k), by_key[k])
+
+    by_detachment: dict[str, list[int]] = {}
+    for i, st in enumerate(stratagems):
+        b.add(
+            "strats",
+            b.value(st.name),
+            b.value(st.cp),
+            b.value(st.type),
+            b.value(st.target),
+            b.value(st.effect),
+            *b.ref_list(b.value(d) for d in st.detachment),
+            *b.windows(st.when),
+        )
+        for d in dict.fromkeys(st.detachment):
+            by_detachment.setdefault(str(d), []).append(i)
+    detach_table = bytearray()
+    for d in sorted(by_detachment):
+        detach_table += _DETACH.pack(b.value(d), *b.ref_list(by_detachment[d]))
+
+    extras_ids = {k: b.value(v) for k, v in extras.items()}
+    values = bytearray()
+    for off, n in b.values:
+        values += _VALUE.pack(off, n)
+    refs = struct.pack(f"<{len(b.refs)}I", *b.refs)
+    parts = [
+        ("values", values, _VALUE.size),
+        ("refs", refs, _REF.size),
+        ("keys", key_table, _KEY.size),
+        ("detachments", detach_table, _DETACH.size),
+        *((k, v, _RECORDS[k].size) for k, v in b.sections.items()),
+        ("blob", b.blob, 1),
+    ]
+    layout, offset = {}, 0
+    for name, data, size in parts:
+        layout[name] = [offset, len(data) // size]
+        offset += len(data)
+    header = json.dumps(
+        {"sections": layout, "extras": extras_ids, "meta": meta}, sort_keys=True
+    ).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(VERSION.to_bytes(2, "little"))
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        for _name, data, _size in parts:
+            f.write(data)
+
+
+def read_header(path) -> dict | None:
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            if int.from_bytes(f.read(2), "little") != VERSION:
+                return None
+            size = int.from_bytes(f.read(4), "little")
+            return json.loads(f.read(size).decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class MmapCorpusData:
+    """
+    Vue en lecture seule d'un snapshot mmap. `units`, `units_by_key` et
+    `stratagems` décodent un enregistrement à la demande.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = int.from_bytes(self._mm[len(MAGIC) + 2 : len(MAGIC) + 6], "little")
+        start = len(MAGIC) + 6
+        self.header = json.loads(self._mm[start : start + size].decode("utf-8"))
+        base = start + size
+        self._sec = {
+            k: (base + off, n) for k, (off, n) in self.header["sections"].items()
+        }
+        self._values: dict[int, object] = {}
+        self.meta = self.header["meta"]
+        self.units = _Records(self, "units", self.unit)
+        self.units_by_key = _UnitIndex(self)
+        self.stratagems = _StratSeq(self, "strats", self.stratagem)
+
+    def close(self):
+        self._mm.close()
+
+    def extra(self, name: str):
+        return self.value(self.header["extras"].get(name, 0))
+
+    def value(self, vid: int):
+        if vid == 0:
+            return None
+        try:
+            return self._values[vid]
+        except KeyError:
+            pass
+        off, n = _VALUE.unpack_from(self._mm, self._sec["values"][0] + (vid - 1) * 8)
+        blob = self._sec["blob"][0] + off
+        v = self._values[vid] = _decode_value(self._mm[blob : blob + n])
+        return v
+
+    def _record(self, section: str, st: struct.Struct, i: int) -> tuple:
+        off, n = self._sec[section]
+        if not 0 <= i < n:
+            raise IndexError(i)
+        return st.unpack_from(self._mm, off + i * st.size)
+
+    def _refs(self, start: int, count: int) -> tuple:
+        off = self._sec["refs"][0] + start * 4
+        return struct.unpack_from(f"<{count}I", self._mm, off)
+
+    def _values_of(self, start: int, count: int) -> tuple:
+        return tuple(self.value(v) for v in self._refs(start, count))
+
+    def _weapons(self, start: int, count: int) -> tuple:
+        out = []
+        for i in range(start, start + count):
+            name, pstart, pcount = self._record("weapons", _WEAPON, i)
+            profiles = []
+            for j in range(pstart, pstart + pcount):
+                rec = self._record("profiles", _PROFILE, j)
+                profiles.append(
+                    WeaponProfile(
+                        self.value(rec[0]),
+                        *(self.value(v) for v in rec[1:9]),
+                        keywords=self._values_of(rec[9], rec[10]),
+                    )
+                )
+            out.append(Weapon(self.value(name), tuple(profiles)))
+        return tuple(out)
+
+    def unit(self, i: int) -> Unit:
+        r = self._record("units", _UNIT, i)
+        return Unit(
+            name=self.value(r[0]),
+            role=self.value(r[1]),
+            keywords=self._values_of(r[5], r[6]),
+            base=Stats(*self._values_of(r[7], r[8])) if r[8] else None,
+            ranged=self._weapons(r[9], r[10]),
+            melee=self._weapons(r[11], r[12]),
+            abilities=tuple(
+                Ability(
+                    *(self.value(v) for v in self._record("abilities", _ABILITY, j))
+                )
+                for j in range(r[13], r[13] + r[14])
+            ),
+            faction=self.value(r[2]),
+            detachment=self.value(r[3]),
+            phase_tips=self.value(r[4]),
+        )
+
+    def stratagem(self, i: int) -> Stratagem:
+        r = self._record("strats", _STRAT, i)
+        return Stratagem(
+            name=self.value(r[0]),
+            cp=self.value(r[1]),
+            detachment=self._values_of(r[5], r[6]),
+            type=self.value(r[2]),
+            when=tuple(
+                Window(*(self.value(v) for v in self._record("windows", _WINDOW, j)))
+                for j in range(r[7], r[7] + r[8])
+            ),
+            target=self.value(r[3]),
+            effect=self.value(r[4]),
+        )
+
+    def stratagem_ids(self, detachment: str) -> tuple:
+        """Indices des stratagèmes d'un détachement (recherche dichotomique)."""
+        _off, n = self._sec["detachments"]
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            vid, start, count = self._record("detachments", _DETACH, mid)
+            name = self.value(vid)
+            if name == detachment:
+                return self._refs(start, count)
+            if name < detachment:
+                lo = mid + 1
+            else:
+                hi = mid
+        return ()
+
+
+class _Records(Sequence):
+    """Section d'enregistrements vue comme une séquence décodée à la demande."""
+
+    def __init__(self, data: MmapCorpusData, section: str, decode):
+        self._d = data
+        self._section = section
+        self._decode = decode
+
+    def __len__(self):
+        return self._d._sec[self._section][1]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._decode(i if i >= 0 else len(self) + i)
+
+
+class _StratSeq(_Records):
+    def select_detachment(self, detachment: str) -> list[Stratagem]:
+        """Stratagèmes de `detachment` et "All", dans l'ordre d'origine."""
+        ids = set(self._d.stratagem_ids(detachment)) | set(self._d.stratagem_ids("All"))
+        return [self._d.stratagem(i) for i in sorted(ids)]
+
+
+class _UnitIndex(Mapping):
+    """Clé normalisée -> Unit, triée ; lookup par dichotomie sur les clés."""
+
+    def __init__(self, data: MmapCorpusData):
+        self._d = data
+        self._keys: list[str] | None = None
+
+    def _key_list(self) -> list[str]:
+        if self._keys is None:
+            n = self._d._sec["keys"][1]
+            self._keys = [
+                self._d.value(self._d._record("keys", _KEY, i)[0]) for i in range(n)
+            ]
+        return self._keys
+
+    def __len__(self):
+        return self._d._sec["keys"][1]
+
+    def __iter__(self):
+        return iter(self._key_list())
+
+    def __contains__(self, key):
+        keys = self._key_list()
+        i = bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def __getitem__(self, key):
+        keys = self._key_list()
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            raise KeyError(key)
+        return self._d.unit(self._d._record("keys", _KEY, i)[1])
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modèle de données compact du corpus.
+
+Les dicts renvoyés par PyYAML sont convertis une seule fois, au chargement,
+en enregistrements à __slots__ qui ne gardent que ce que les rendus utilisent.
+Les alias de champs tolérés par les YAML (Range/range/R, A/Attacks, ...) sont
+résolus ici, pas à chaque rendu.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import datetime
+import json
+import re
+import warnings
+
+
+class StringPool:
+    """
+    Pool de vocabulaire d'un chargement (voir string_scope) : mots-clés,
+    détachements, phases, steps, joueurs, types... Chaque valeur (ou tuple de
+    valeurs) n'existe qu'une fois en mémoire, et les comparaisons entre
+    enregistrements se résolvent le plus souvent par identité. Le pool est
+    gardé par le Corpus qu'il a servi à construire (Corpus.strings) et libéré
+    avec lui.
+    """
+
+    __slots__ = ("_pool", "_total", "_kinds")
+
+    def __init__(self):
+        self._pool: dict = {}
+        self._total = 0
+        self._kinds: dict[str, list[int]] = {}  # kind -> [total, nouveaux]
+
+    def intern(self, value, kind: str = "str"):
+        if value is None:
+            return None
+        counts = self._kinds.setdefault(kind, [0, 0])
+        counts[0] += 1
+        self._total += 1
+        try:
+            return self._pool[value]
+        except KeyError:
+            counts[1] += 1
+            self._pool[value] = value
+            return value
+        except TypeError:  # non hashable : laissé tel quel
+            return value
+
+    def intern_tuple(self, values, kind: str = "str") -> tuple:
+        """Tuple de valeurs internées, lui-même partagé s'il se répète."""
+        return self.intern(tuple(self.intern(v, kind) for v in values), kind + "[]")
+
+    def stats(self) -> dict:
+        """Valeurs uniques vs références totales, globalement et par catégorie."""
+        return {
+            "unique": len(self._pool),
+            "total": self._total,
+            "by_kind": {
+                k: {"total": t, "unique": u}
+                for k, (t, u) in sorted(self._kinds.items())
+            },
+        }
+
+
+# Pool actif pendant la construction des enregistrements ; hors d'un
+# string_scope, les valeurs sont gardées telles quelles.
+_ACTIVE_POOL: ContextVar[StringPool | None] = ContextVar("string_pool", default=None)
+
+
+@contextmanager
+def string_scope(pool: StringPool | None = None):
+    """
+    Active un pool pour les enregistrements construits dans le bloc : `pool`,
+    sinon celui déjà actif (chargements imbriqués), sinon un nouveau.
+    """
+    if pool is None:
+        pool = _ACTIVE_POOL.get() or StringPool()
+    token = _ACTIVE_POOL.set(pool)
+    try:
+        yield pool
+    finally:
+        _ACTIVE_POOL.reset(token)
+
+
+def vocab(value, kind: str):
+    pool = _ACTIVE_POOL.get()
+    return value if pool is None else pool.intern(value, kind)
+
+
+def vocab_tuple(values, kind: str) -> tuple:
+    pool = _ACTIVE_POOL.get()
+    return tuple(values) if pool is None else pool.intern_tuple(values, kind)
+
+
+# Valeurs canoniques des énumérations de file_descriptor_stratagem.yaml
+# ("any" est aussi accepté comme phase : fenêtre valable à toute phase).
+STRATAGEM_TYPES = ("Battle Tactic", "Strategic Ploy", "Epic Deed", "Wargear")
+PLAYERS = ("you", "opponent", "any")
+PHASES = ("command", "movement", "shooting", "charge", "fight", "end", "any")
+
+
+def _enum_key(value: str) -> str:
+    return re.sub(r"[\s_-]+", " ", value).strip().lower()
+
+
+_TYPES_BY_KEY = {_enum_key(t): t for t in STRATAGEM_TYPES}
+
+
+def canonical_type(value):
+    """'battle_tactic', 'Battle Tactic ' -> 'Battle Tactic' ; inconnu : juste trimé."""
+    if not isinstance(value, str):
+        return value
+    return _TYPES_BY_KEY.get(_enum_key(value), value.strip())
+
+
+def canonical_player(value) -> str:
+    """you | opponent | any ; absent -> you, valeur inconnue -> any."""
+    if value is None:
+        return "you"
+    value = str(value).strip().lower()
+    return value if value in PLAYERS else "any"
+
+
+def canonical_phase(value):
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+# Steps libres (alias) -> step de la grille des phases
+STEP_ALIASES = {
+    "after_enemy_selects_targets": "start",
+    "after_enemy_resolves_attacks": "end",
+    "after_enemy_ends_move": "start",
+    "after_enemy_declares_charge": "declare",
+    "after_enemy_ends_charge_move": "move",
+    "reinforcements": "start",
+    "any": "start",
+}
+
+
+def canonical_step(value):
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    return STEP_ALIASES.get(value, value)
+
+
+# Grille par défaut des steps de chaque phase (file_descriptor_main+unit.yaml)
+PHASE_STEPS = {
+    "command": ("start", "battleshock", "abilities", "end"),
+    "movement": ("start", "normal", "advance", "fallback", "end"),
+    "shooting": ("start", "select_targets", "resolve", "end"),
+    "charge": ("start", "declare", "overwatch_window", "move", "heroic", "end"),
+    "fight": ("start", "pile_in", "make_attacks", "consolidate", "end"),
+    "end": ("score", "cleanup"),
+}
+_ALL_STEPS = frozenset(s for steps in PHASE_STEPS.values() for s in steps)
+
+
+class UnknownValueWarning(UserWarning):
+    """Joueur, phase ou step inconnu remplacé / gardé tel quel au chargement."""
+
+
+class UnknownValues:
+    """
+    Valeurs inconnues rencontrées en construisant les enregistrements (joueur
+    ramené à "any", phase hors de PHASES, step hors de la grille) : comptées
+    par catégorie, avec un avertissement la première fois que chacune est vue.
+    """
+
+    __slots__ = ("_seen",)
+
+    def __init__(self):
+        self._seen: dict[str, dict] = {}  # kind -> valeur -> occurrences
+
+    def note(self, kind: str, value, fixed=None):
+        seen = self._seen.setdefault(kind, {})
+        key = repr(value) if not isinstance(value, str) else value
+        if key not in seen:
+            seen[key] = 0
+            warnings.warn(
+                f"{kind} inconnu : {value!r}"
+                + (f" (remplacé par {fixed!r})" if fixed is not None else ""),
+                UnknownValueWarning,
+                stacklevel=3,
+            )
+        seen[key] += 1
+
+    def report(self) -> dict:
+        return {k: dict(sorted(v.items())) for k, v in sorted(self._seen.items())}
+
+
+UNKNOWN = UnknownValues()
+
+
+def unknown_values() -> dict:
+    return UNKNOWN.report()
+
+
+@dataclass(slots=True)
+class Stats:
+    M: object = "–"
+    T: object = "–"
+    Sv: object = "–"
+    W: object = "–"
+    Ld: object = "–"
+    OC: object = "–"
+    Inv: object = None
+    FnP: object = None
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Stats":
+        return cls(**{k: d[k] for k in cls.__slots__ if k in d})
+
+
+@dataclass(slots=True)
+class WeaponProfile:
+    name: str
+    range: object = None
+    A: object = None
+    BS: object = None
+    WS: object = None
+    to_hit: object = None
+    S: object = None
+    AP: object = None
+    D: object = None
+    keywords: tuple = ()
+
+    @classmethod
+    def from_dict(cls, d: dict, name: str) -> "WeaponProfile":
+        return cls(
+            name=name,
+            range=d.get("Range") or d.get("range") or d.get("R") or d.get("rng"),
+            A=d.get("A") or d.get("Attacks") or d.get("attacks"),
+            BS=d.get("BS") or d.get("bs") or d.get("Skill") or d.get("skill"),
+            WS=d.get("WS") or d.get("ws"),
+            to_hit=d.get("to_hit") or d.get("hit") or d.get("TH") or d.get("th"),
+            S=d.get("S") or d.get("Str") or d.get("strength"),
+            AP=d.get("AP") or d.get("ap"),
+            D=d.get("D") or d.get("Damage") or d.get("damage"),
+            keywords=vocab_tuple(
+                _keywords(d.get("keywords") or d.get("abilities") or d.get("ability")),
+                "weapon_keyword",
+            ),
+        )
+
+
+def _keywords(kws) -> tuple:
+    """Mots-clés d'arme (str, liste ou dict mot-clé -> bool) en tuple de str."""
+    if not kws:
+        return ()
+    if isinstance(kws, str):
+        return (kws,)
+    if isinstance(kws, (list, tuple)):
+        return tuple(str(x) for x in kws if x)
+    if isinstance(kws, dict):
+        return tuple(k for k, v in kws.items() if v)
+    return (str(kws),)
+
+
+@dataclass(slots=True)
+class Weapon:
+    name: str
+    profiles: tuple  # tuple[WeaponProfile, ...]
+
+    @classmethod
+    def from_dict(cls, w: dict) -> "Weapon":
+        name = w.get("name", "—")
+        profs = w.get("profiles")
+        if isinstance(profs, list) and profs:
+            profiles = tuple(
+                WeaponProfile.from_dict(p, str(p.get("name") or p.get("mode") or name))
+                for p in profs
+                if isinstance(p, dict)
+            )
+        else:
+            profiles = (WeaponProfile.from_dict(w, name),)
+        return cls(name=name, profiles=profiles)
+
+
+def _weapons(arr) -> tuple:
+    return tuple(Weapon.from_dict(w) for w in arr or [] if isinstance(w, dict))
+
+
+@dataclass(slots=True)
+class Ability:
+    name: str
+    text: str = ""
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Ability":
+        return cls(name=d.get("name", "—"), text=d.get("text", ""))
+
+
+@dataclass(slots=True)
+class Unit:
+    name: str
+    role: str = ""
+    keywords: tuple = ()
+    base: Stats | None = None
+    ranged: tuple = ()  # tuple[Weapon, ...]
+    melee: tuple = ()  # tuple[Weapon, ...]
+    abilities: tuple = ()  # tuple[Ability, ...]
+    faction: str | None = None
+    detachment: str | None = None
+    phase_tips: dict | None = None  # play_tips.phases tel quel
+
+    @classmethod
+    def from_dict(cls, u: dict) -> "Unit":
+        base = u.get("base")
+        weapons = u.get("weapons") or {}
+        ab = u.get("abilities") or {}
+        return cls(
+            name=u.get("name"),
+            role=vocab(u.get("role", ""), "role"),
+            keywords=vocab_tuple(u.get("keywords") or (), "keyword"),
+            base=Stats.from_dict(base) if base else None,
+            ranged=_weapons(weapons.get("ranged")),
+            melee=_weapons(weapons.get("melee")),
+            abilities=tuple(
+                Ability.from_dict(x)
+                for x in ab.get("unit") or []
+                if isinstance(x, dict)
+            ),
+            faction=vocab(ab.get("faction"), "faction"),
+            detachment=vocab(ab.get("detachment"), "detachment"),
+            phase_tips=((u.get("play_tips") or {}).get("phases")) or None,
+        )
+
+
+@dataclass(slots=True)
+class Window:
+    """
+    Une fenêtre de timing d'un stratagème (when[]), résolue au chargement :
+    phase et joueur canoniques, step de la grille ; `alias` garde le step
+    d'origine quand il a été harmonisé.
+    """
+
+    phase: str = "command"
+    step: str = "start"
+    player: str = "you"
+    timing_note: str | None = None
+    alias: str | None = None
+
+    @classmethod
+    def from_dict(cls, w: dict) -> "Window":
+        raw = w.get("step", "start")
+        step = canonical_step(raw)
+        phase = canonical_phase(w.get("phase", "command"))
+        who = w.get("player")
+        player = canonical_player(who)
+        if who is not None and str(who).strip().lower() not in PLAYERS:
+            UNKNOWN.note("player", who, player)
+        if phase not in PHASES:
+            UNKNOWN.note("phase", phase)
+        if step not in PHASE_STEPS.get(phase, _ALL_STEPS):
+            UNKNOWN.note("step", step)
+        return cls(
+            phase=vocab(phase, "phase"),
+            step=vocab(step, "step"),
+            player=vocab(player, "player"),
+            timing_note=w.get("timing_note"),
+            alias=vocab(raw, "step") if step != raw else None,
+        )
+
+
+@dataclass(slots=True)
+class Stratagem:
+    name: str = "—"
+    cp: object = "?"
+    detachment: tuple = ()
+    type: str | None = None
+    when: tuple = ()  # tuple[Window, ...]
+    target: str | None = None
+    effect: str = ""
+
+    @classmethod
+    def from_dict(cls, st: dict) -> "Stratagem":
+        return cls(
+            name=st.get("name", "—"),
+            cp=st.get("cp", "?"),
+            detachment=vocab_tuple(st.get("detachment") or (), "detachment"),
+            type=vocab(canonical_type(st.get("type")), "type"),
+            when=tuple(
+                Window.from_dict(w) for w in st.get("when") or [] if isinstance(w, dict)
+            ),
+            target=st.get("target"),
+            effect=st.get("effect", ""),
+        )
+
+
+# -----------------------------
+# Encodage JSON des données et enregistrements
+# -----------------------------
+# Sert aux fichiers générés (snapshot, base SQLite, mmap) à la place de pickle :
+# relire un fichier d'un dossier inscriptible ne doit jamais exécuter de code.
+# Ce que JSON ne sait pas représenter est encodé en un dict à une seule clé
+# balise ; un dict dont une clé ressemble à une balise passe par "__items__",
+# et une balise inconnue à la lecture est refusée (ValueError).
+
+_ITEMS = "__items__"  # mapping à clés non-str : [[clé, valeur], ...]
+_TUPLE = "__tuple__"
+_DATE = "__date__"
+_DATETIME = "__datetime__"
+_RECORD = "__record__"  # [nom de la classe, [valeurs des champs]]
+RECORD_TYPES = {
+    cls.__name__: cls
+    for cls in (Stats, WeaponProfile, Weapon, Ability, Unit, Window, Stratagem)
+}
+# Champs internés au décodage comme par from_dict ("[]" : tuple de valeurs)
+_RECORD_VOCAB = {
+    "WeaponProfile": (("keywords", "weapon_keyword[]"),),
+    "Unit": (
+        ("role", "role"),
+        ("keywords", "keyword[]"),
+        ("faction", "faction"),
+        ("detachment", "detachment"),
+    ),
+    "Window": (
+        ("phase", "phase"),
+        ("step", "step"),
+        ("player", "player"),
+        ("alias", "step"),
+    ),
+    "Stratagem": (("detachment", "detachment[]"), ("type", "type")),
+}
+
+
+def _is_tag(key) -> bool:
+    return isinstance(key, str) and key.startswith("__") and key.endswith("__")
+
+
+def encode_data(obj):
+    """Données YAML ou enregistrements models.* -> structure sérialisable JSON."""
+    if obj is None or isinstance(obj, (str, bool, int, float)):
+        return obj
+    if isinstance(obj, list):
+        return [encode_data(v) for v in obj]
+    if isinstance(obj, tuple):
+        return {_TUPLE: [encode_data(v) for v in obj]}
+    if isinstance(obj, dict):
+        if all(isinstance(k, str) and not _is_tag(k) for k in obj):
+            return {k: encode_data(v) for k, v in obj.items()}
+        return {_ITEMS: [[encode_data(k), encode_data(v)] for k, v in obj.items()]}
+    if isinstance(obj, datetime.datetime):
+        return {_DATETIME: obj.isoformat()}
+    if isinstance(obj, datetime.date):
+        return {_DATE: obj.isoformat()}
+    name = type(obj).__name__
+    if RECORD_TYPES.get(name) is type(obj):
+        values = [encode_data(getattr(obj, f)) for f in obj.__slots__]
+        return {_RECORD: [name, values]}
+    raise TypeError(f"Type non encodable en JSON : {name}")
+
+
+def decode_hook(d: dict):
+    """object_hook de json.loads, inverse de encode_data."""
+    if len(d) != 1:
+        return d
+    ((key, value),) = d.items()
+    if not _is_tag(key):
+        return d
+    if key == _ITEMS:
+        return {k: v for k, v in value}
+    if key == _TUPLE:
+        return tuple(value)
+    if key == _DATE:
+        return datetime.date.fromisoformat(value)
+    if key == _DATETIME:
+        return datetime.datetime.fromisoformat(value)
+    if key == _RECORD:
+        name, values = value
+        cls = RECORD_TYPES.get(name)
+        if cls is None:
+            raise ValueError(f"Enregistrement inconnu : {name!r}")
+        try:
+            rec = cls(*values)
+        except TypeError as e:
+            raise ValueError(f"Enregistrement {name} invalide : {e}") from None
+        for attr, kind in _RECORD_VOCAB.get(name, ()):
+            value = getattr(rec, attr)
+            if kind.endswith("[]"):
+                if isinstance(value, tuple):
+                    setattr(rec, attr, vocab_tuple(value, kind[:-2]))
+            else:
+                setattr(rec, attr, vocab(value, kind))
+        return rec
+    raise ValueError(f"Balise inconnue : {key!r}")
+
+
+def dumps_data(obj) -> str:
+    return json.dumps(encode_data(obj), ensure_ascii=False, separators=(",", ":"))
+
+
+def loads_data(raw):
+    return json.loads(raw, object_hook=decode_hook)
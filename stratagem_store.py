@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stratagèmes d'un dossier data_* : lecture complète (jumeau JSON) ou en flux
+limitée à quelques détachements, relevé des détachements sans construire les
+stratagèmes, et découpage en un fichier par détachement (shards + manifest).
+"""
+
+from pathlib import Path
+import re
+
+import yaml
+
+from corpus_docs import (
+    TWIN_SUFFIX,
+    YamlLoader,
+    load_yaml_file,
+    read_twin,
+    sha256_file,
+    yaml_load,
+    yaml_paths,
+)
+from export_parser import normalize_name
+
+
+# -----------------------------
+# Stratagems
+# -----------------------------
+STRATAGEMS_FILE = "stratagems.yaml"
+
+
+def load_stratagems(
+    yaml_path: str | Path, detachments: set[str] | None = None
+) -> list[dict]:
+    """
+    Charge les stratagèmes d'un fichier, via son jumeau JSON s'il est à jour.
+    Si `detachments` est fourni, seuls les stratagèmes de ces détachements (ou
+    "All") sont gardés : filtrés dans le jumeau, ou lus en flux sans construire
+    les autres quand le jumeau est absent ou périmé (il n'est pas régénéré).
+    """
+    if not detachments:
+        return load_yaml_file(yaml_path).get("stratagems", [])
+    data = read_twin(yaml_path)
+    if not isinstance(data, dict):
+        return list(iter_stratagems(yaml_path, detachments))
+    wanted = set(detachments)
+    return [
+        st
+        for st in data.get("stratagems") or []
+        if isinstance(st.get("detachment"), list)
+        and _strat_wanted(st["detachment"], wanted)
+    ]
+
+
+class _ReplayLoader(
+    yaml.composer.Composer, yaml.constructor.SafeConstructor, yaml.resolver.Resolver
+):
+    """Compose/construit un noeud YAML à partir d'une liste d'événements déjà lus."""
+
+    def __init__(self, events):
+        self._events = events
+        self._pos = 0
+        yaml.composer.Composer.__init__(self)
+        yaml.constructor.SafeConstructor.__init__(self)
+        yaml.resolver.Resolver.__init__(self)
+
+    def check_event(self, *choices):
+        if self._pos >= len(self._events):
+            return False
+        return not choices or isinstance(self._events[self._pos], choices)
+
+    def peek_event(self):
+        return self._events[self._pos]
+
+    def get_event(self):
+        ev = self._events[self._pos]
+        self._pos += 1
+        return ev
+
+    def build(self):
+        self.anchors = {}
+        return self.construct_document(self.compose_node(None, None))
+
+
+def _strat_wanted(detachment: list[str], wanted: set[str]) -> bool:
+    return "All" in detachment or any(d in wanted for d in detachment)
+
+
+def iter_stratagems(yaml_path: str | Path, detachments: set[str] | None = None):
+    """
+    Parcourt `stratagems:` au niveau des événements YAML et ne construit les
+    objets Python que pour les stratagèmes retenus. Dès que la clé `detachment`
+    d'une entrée exclut celle-ci, le reste de l'entrée est sauté sans être
+    mémorisé : la mémoire reste bornée à un stratagème.
+    """
+    CollStart = (yaml.MappingStartEvent, yaml.SequenceStartEvent)
+    CollEnd = (yaml.MappingEndEvent, yaml.SequenceEndEvent)
+    wanted = set(detachments or ())
+
+    with open(yaml_path, "r", encoding="utf-8") as f:
+        events = yaml.parse(f, Loader=YamlLoader)
+
+        # 1) descendre jusqu'à la séquence "stratagems" du mapping racine
+        depth, is_key = 0, False
+        for ev in events:
+            if isinstance(ev, yaml.AliasEvent):
+                raise yaml.YAMLError("alias non supportés en lecture en flux")
+            if depth == 1 and is_key and isinstance(ev, yaml.ScalarEvent):
+                if ev.value == "stratagems":
+                    break
+            if isinstance(ev, CollStart):
+                depth += 1
+                is_key = isinstance(ev, yaml.MappingStartEvent)
+            elif isinstance(ev, CollEnd):
+                depth -= 1
+                is_key = depth == 1
+            elif depth == 1:
+                is_key = not is_key
+        else:
+            return
+        if not isinstance(next(events), yaml.SequenceStartEvent):
+            return
+
+        # 2) une entrée à la fois
+        for ev in events:
+            if isinstance(ev, yaml.SequenceEndEvent):
+                return
+            buf, skip, depth = [ev], False, 0
+            if isinstance(ev, CollStart):
+                depth = 1
+            key, det, in_det, is_key = None, None, False, True
+            while depth:
+                ev = next(events)
+                if isinstance(ev, yaml.AliasEvent):
+                    raise yaml.YAMLError("alias non supportés en lecture en flux")
+                if not skip:
+                    buf.append(ev)
+                if isinstance(ev, CollStart):
+                    depth += 1
+                    in_det = depth == 2 and key == "detachment"
+                    if in_det:
+                        det = []
+                elif isinstance(ev, CollEnd):
+                    depth -= 1
+                    if in_det and depth == 1:
+                        in_det = False
+                        if wanted and not _strat_wanted(det, wanted):
+                            skip, buf = True, None
+                    if depth == 1:
+                        is_key = True
+                elif in_det and depth == 2:
+                    det.append(ev.value)
+                elif depth == 1:
+                    if is_key:
+                        key = ev.value
+                    is_key = not is_key
+            if skip:
+                continue
+            if wanted and not _strat_wanted(det or [], wanted):
+                continue
+            yield _ReplayLoader(buf).build()
+
+
+def scan_stratagem_detachments(yaml_path: str | Path) -> list[str]:
+    """
+    Détachements cités par les listes `detachment:` des stratagèmes, lus au
+    niveau des événements YAML : aucun stratagème n'est construit.
+    """
+    CollStart = (yaml.MappingStartEvent, yaml.SequenceStartEvent)
+    CollEnd = (yaml.MappingEndEvent, yaml.SequenceEndEvent)
+    found: dict[str, None] = {}
+    stack: list[list] = []  # par collection ouverte : [mapping?, clé attendue?, clé]
+    with open(yaml_path, "r", encoding="utf-8") as f:
+        for ev in yaml.parse(f, Loader=YamlLoader):
+            if isinstance(ev, CollStart):
+                if stack and stack[-1][0]:
+                    stack[-1][1] = True  # la collection était la valeur
+                stack.append([isinstance(ev, yaml.MappingStartEvent), True, None])
+            elif isinstance(ev, CollEnd):
+                stack.pop()
+            elif isinstance(ev, yaml.ScalarEvent) and stack:
+                top = stack[-1]
+                if top[0]:
+                    if top[1]:
+                        top[2] = ev.value
+                    top[1] = not top[1]
+                elif (
+                    len(stack) == 4
+                    and stack[0][2] == "stratagems"
+                    and stack[2][2] == "detachment"
+                ):
+                    found[ev.value] = None
+    return list(found)
+
+
+# Stratagèmes découpés par détachement : un fichier par détachement (+ "All")
+# dans stratagems_shards/, et un manifest détachement -> fichier. Chaque shard
+# garde l'index source de ses entrées pour restituer l'ordre d'origine.
+SHARDS_DIR = "stratagems_shards"
+SHARDS_MANIFEST = "manifest.yaml"
+SHARDS_VERSION = 1
+
+try:
+    from yaml import CSafeDumper as YamlDumper  # type: ignore
+except ImportError:
+    from yaml import SafeDumper as YamlDumper  # type: ignore
+
+
+def yaml_dump(data, stream=None):
+    return yaml.dump(
+        data,
+        stream,
+        Dumper=YamlDumper,
+        allow_unicode=True,
+        sort_keys=False,
+        width=88,
+    )
+
+
+def _shard_slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", normalize_name(name)).strip("_") or "shard"
+
+
+def shard_groups(strats: list[dict]) -> dict[str, tuple[str, list[int]]]:
+    """Détachement -> (fichier du shard, indices source de ses stratagèmes)."""
+    by_det: dict[str, list[int]] = {}
+    for i, st in enumerate(strats):
+        dets = st.get("detachment") or []
+        # une entrée "All" est valable partout : elle ne va que dans le shard All
+        for det in ["All"] if "All" in dets else dets:
+            by_det.setdefault(det, []).append(i)
+    groups, used = {}, set()
+    for det in sorted(by_det, key=lambda d: (d != "All", d.lower())):
+        slug = base = _shard_slug(det)
+        n = 2
+        while slug in used:
+            slug, n = f"{base}_{n}", n + 1
+        used.add(slug)
+        groups[det] = (f"{slug}.yaml", by_det[det])
+    return groups
+
+
+def shard_stratagems(yaml_dir, out_dir=None) -> Path:
+    """Découpe <yaml_dir>/stratagems.yaml en shards par détachement."""
+    src = Path(yaml_dir, STRATAGEMS_FILE)
+    out = Path(out_dir) if out_dir else Path(yaml_dir, SHARDS_DIR)
+    strats = load_stratagems(src)
+
+    out.mkdir(parents=True, exist_ok=True)
+    for old in [*out.glob("*.yaml"), *out.glob("*" + TWIN_SUFFIX)]:
+        old.unlink()
+    files = {}
+    for det, (fname, idx) in shard_groups(strats).items():
+        files[det] = fname
+        with open(out / fname, "w", encoding="utf-8") as f:
+            yaml_dump({"source_index": idx, "stratagems": [strats[i] for i in idx]}, f)
+
+    manifest = {
+        "schema_version": SHARDS_VERSION,
+        "source": STRATAGEMS_FILE,
+        "source_sha256": sha256_file(src),
+        "shards": files,
+    }
+    with open(out / SHARDS_MANIFEST, "w", encoding="utf-8") as f:
+        yaml_dump(manifest, f)
+    return out
+
+
+def read_shard_manifest(yaml_dir) -> dict | None:
+    """
+    Manifest des shards s'il est utilisable : présent, bonne version, et
+    (si stratagems.yaml existe encore) construit depuis son contenu actuel.
+    """
+    path = Path(yaml_dir, SHARDS_DIR, SHARDS_MANIFEST)
+    if not path.is_file():
+        return None
+    manifest = yaml_load(path.read_text(encoding="utf-8")) or {}
+    if manifest.get("schema_version") != SHARDS_VERSION:
+        return None
+    src = Path(yaml_dir, manifest.get("source") or STRATAGEMS_FILE)
+    if src.is_file() and sha256_file(src) != manifest.get("source_sha256"):
+        return None
+    return manifest
+
+
+def load_stratagem_shards(
+    yaml_dir, manifest: dict, detachments: set[str] | None = None
+) -> list[dict]:
+    shards = manifest.get("shards") or {}
+    names = (
+        list(shards)
+        if not detachments
+        else ["All"] + [d for d in sorted(detachments) if d != "All"]
+    )
+    picked: dict[int, dict] = {}
+    for det in names:
+        fname = shards.get(det)
+        if not fname:
+            continue
+        data = load_yaml_file(Path(yaml_dir, SHARDS_DIR, fname))
+        for i, st in zip(data.get("source_index", []), data.get("stratagems", [])):
+            picked.setdefault(i, st)
+    return [picked[i] for i in sorted(picked)]
+
+
+def load_dir_stratagems(yaml_dir, detachments: set[str] | None = None) -> list[dict]:
+    """
+    Stratagèmes d'un dossier data_* : shards du/des détachement(s) s'ils
+    existent et sont à jour, sinon le fichier unique stratagems.yaml.
+    """
+    manifest = read_shard_manifest(yaml_dir)
+    if manifest is not None:
+        return load_stratagem_shards(yaml_dir, manifest, detachments)
+    path = Path(yaml_dir, STRATAGEMS_FILE)
+    return load_stratagems(path, detachments) if path.is_file() else []
+
+
+def tracked_corpus_files(yaml_dir) -> dict[str, Path]:
+    """Fichiers suivis par un corpus : les *.yaml, ou le manifest des shards seuls."""
+    files = {p.name: p for p in yaml_paths(yaml_dir)}
+    manifest = Path(yaml_dir) / SHARDS_DIR / SHARDS_MANIFEST
+    if STRATAGEMS_FILE not in files and manifest.is_file():
+        files[SHARDS_DIR] = manifest
+    return files
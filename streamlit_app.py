@@ -1,7 +1,7 @@
 import re
 import io
+import os
 import sys
-import yaml
 import tempfile
 from pathlib import Path
 from typing import Dict, Any, List
@@ -11,7 +11,16 @@ from jinja2 import Template
 APP_DIR = Path(__file__).resolve().parent
 if str(APP_DIR) not in sys.path:
     sys.path.insert(0, str(APP_DIR))
-from create_cheat_sheet import run
+from create_cheat_sheet import corpus_names, load_corpus, run, run_with_corpus
+from corpus import Corpus, content_dedup_report
+from corpus_archive import is_archive
+from corpus_db import open_corpus_db
+from corpus_docs import yaml_load
+from corpus_validation import format_validation
+from layers import corpus_layers
+from battlescribe import is_roster, read_roster
+from export_parser import ArmyList, format_export, parse_export_text as parse_export
+from models import Unit
 
 # --------------------------- CONFIG ---------------------------------
 DEFAULT_YAML_DIR = Path(__file__).parent / "data"
@@ -19,6 +28,9 @@ DEFAULT_YAML_DIR_NOOB = Path(__file__).parent / "data_noob"
 FACTION = "Adeptus Astartes"
 CHAPTER = "Ultramarines"
 DETACHMENT_DEFAULT = "Gladius Task Force"
+# Base SQLite (create_cheat_sheet.py build-db) : si définie, les dossiers data_*
+# y sont lus au lieu de re-parser les YAML.
+CORPUS_DB = os.environ.get("CHEAT_SHEET_DB")
 
 # Quelques alias pratiques (ajoute ici si une unité n'est pas matchée)
 ALIASES = {
@@ -35,14 +47,50 @@ ALIASES = {
 def find_data_dirs(base: Path) -> list[Path]:
     """
     Retourne les sous-dossiers 'data_*' (et 'data' s'il existe) présents à côté de l'app.
-    Triés par nom.
+    Triés par nom. Un dossier en couches (layers.yaml) est listé même s'il ne
+    contient que son manifeste ; les archives data_*.c40k.zip (pack) aussi.
     """
     dirs = list(base.glob("data_*"))
     if (base / "data").is_dir():
         dirs.insert(0, base / "data")
     # dédoublonne puis trie
     uniq = sorted({p.resolve() for p in dirs}, key=lambda p: p.name.lower())
-    return [p for p in uniq if p.is_dir()]
+    return [p for p in uniq if p.is_dir() or is_archive(p)]
+
+
+def describe_data_dir(d: Path) -> str:
+    """Nom du dossier, suivi de ses couches parentes s'il en a."""
+    try:
+        parents = corpus_layers(d)[:-1]
+    except ValueError:
+        return f"{d.name} (couches invalides)"
+    if not parents:
+        return d.name
+    return f"{d.name} ← " + " ← ".join(p.name for p in reversed(parents))
+
+
+def files_stamp(dirs) -> tuple:
+    """Empreinte bon marché (chemin, taille, mtime) des YAML de `dirs`."""
+    stamp = []
+    for d in dirs:
+        for p in sorted(Path(d).glob("*.yaml")) if Path(d).is_dir() else [Path(d)]:
+            st_ = p.stat()
+            stamp.append((str(p), st_.st_size, st_.st_mtime_ns))
+    return tuple(stamp)
+
+
+def dedup_report(data_dirs: list[Path]) -> dict:
+    """
+    content_dedup_report hache chaque fichier : calculé une fois par empreinte
+    des dossiers et gardé en session, pas à chaque rerun. Seuls les doublons
+    y sont utiles ici ; ce qu'un chargement a partagé est dans corpus.dedup.
+    """
+    stamp = files_stamp(data_dirs)
+    cached = st.session_state.get("dedup_report")
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, content_dedup_report(data_dirs))
+        st.session_state["dedup_report"] = cached
+    return cached[1]
 
 
 def norm(s: str) -> str:
@@ -55,68 +103,101 @@ def norm(s: str) -> str:
     return s
 
 
-def load_yaml_files(files: List[io.BytesIO]) -> Dict[str, Any]:
+def load_yaml_files(files: List[io.BytesIO]) -> Corpus:
     """Charge un corpus YAML à partir d'objets uploadés."""
-    phases, faction_helpers, units, stratagems = None, None, [], []
-    for f in files:
-        data = yaml.safe_load(f.read().decode("utf-8"))
-        if phases is None and "phases" in data:
-            phases = data["phases"]
-        if faction_helpers is None and "faction_helpers" in data:
-            faction_helpers = data["faction_helpers"]
-        if "units" in data:
-            units.extend(data["units"])
-        if "stratagems" in data:
-            stratagems.extend(data["stratagems"])
-    if phases is None:
-        phases = {"order": [], "steps": {}}
-    if faction_helpers is None:
-        faction_helpers = {}
-    return {
-        "units": units,
-        "phases": phases,
-        "faction_helpers": faction_helpers,
-        "stratagems": stratagems,
-    }
+    return Corpus.from_docs([yaml_load(f.read().decode("utf-8")) for f in files])
 
 
-def load_yaml_dir(directory: Path) -> Dict[str, Any]:
-    files = sorted(directory.glob("*.yaml"))
-    uploads = []
-    for f in files:
-        uploads.append(io.BytesIO(f.read_bytes()))
-    return load_yaml_files(uploads)
+def load_yaml_dir(directory: Path) -> Corpus:
+    """
+    Charge un dossier data_* (base SQLite si configurée, sinon snapshot).
+    Si le corpus de la session vient déjà de ce dossier, seuls les fichiers
+    modifiés depuis sont relus ; un corpus d'archive ou de base (sans fichiers
+    à rafraîchir) est réutilisé tant que sa clé (chemin + mtime) est la même.
+    """
+    cached = st.session_state.get("corpus")
+    if (
+        cached is not None
+        and cached.files is not None
+        and cached.source == str(directory)
+    ):
+        changes = cached.refresh()
+        if changes:
+            st.info(f"Données rechargées : {changes.summary()}")
+        return cached
+    key = corpus_key(directory)
+    if (
+        key is not None
+        and cached is not None
+        and st.session_state.get("corpus_key") == key
+    ):
+        return cached
+    corpus = None
+    db = open_corpus_db(CORPUS_DB) if CORPUS_DB else None
+    if db is not None:
+        with db:
+            if db.is_fresh(directory):
+                corpus = db.corpus(directory)
+    if corpus is None:
+        corpus = load_corpus(directory)
+    st.session_state["corpus_key"] = key if corpus.files is None else None
+    return corpus
+
+
+def corpus_key(directory: Path) -> tuple | None:
+    """
+    Clé de session d'un corpus d'archive ou de base SQLite : chemin et mtime
+    de l'archive, ou de la base plus l'empreinte des YAML du dossier.
+    """
+    if is_archive(directory):
+        return ("archive",) + files_stamp([directory])[0]
+    if CORPUS_DB and Path(CORPUS_DB).is_file():
+        db = Path(CORPUS_DB).stat()
+        return ("db", CORPUS_DB, db.st_mtime_ns, files_stamp([directory]))
+    return None
 
 
-def build_units_index(all_units: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-    idx = {norm(u["name"]): u for u in all_units}
+def build_units_index(all_units: List[Unit]) -> Dict[str, Unit]:
+    idx = {norm(u.name): u for u in all_units}
     for k, v in ALIASES.items():
         if norm(v) in idx and k not in idx:
             idx[k] = idx[norm(v)]
     return idx
 
 
-def parse_export_text(txt: str) -> Dict[str, Any]:
-    lines = [l.strip() for l in txt.splitlines()]
-    head = [l for l in lines if l][:5]
-    meta = {
-        "list_name": head[0] if len(head) > 0 else "Ma liste",
-        "faction": head[1] if len(head) > 1 else FACTION,
-        "chapter": head[2] if len(head) > 2 else CHAPTER,
-        "format": head[3] if len(head) > 3 else "Incursion",
-        "detachment": head[4] if len(head) > 4 else DETACHMENT_DEFAULT,
+def parse_export_text(txt: str, corpus: Corpus | None = None) -> ArmyList:
+    """
+    Même parseur que la CLI (export_parser), avec les noms du corpus pour la
+    faction / le détachement. Le résultat est gardé en session : un rerun sans
+    changement du texte ni du corpus ne reparse pas.
+    """
+    cached = st.session_state.get("parsed_list")
+    if cached is not None and cached[0] == txt and cached[1] is corpus:
+        return cached[2]
+    army = parse_export(txt, corpus_names(corpus) if corpus is not None else None)
+    st.session_state["parsed_list"] = (txt, corpus, army)
+    return army
+
+
+def template_meta(army: ArmyList) -> Dict[str, Any]:
+    """En-tête du gabarit HTML à partir de la liste analysée."""
+
+    def with_points(name, points):
+        return f"{name} ({points} points)" if name and points else name
+
+    return {
+        "list_name": with_points(army.title, army.points_total) or "Ma liste",
+        "faction": army.faction or FACTION,
+        "chapter": army.chapter or army.faction or CHAPTER,
+        "format": with_points(army.format, army.format_points) or "Incursion",
+        "detachment": army.detachment or DETACHMENT_DEFAULT,
     }
-    units = []
-    for l in lines:
-        if re.search(r"\(\d+\s*points?\)\s*$", l):
-            units.append({"name": re.sub(r"\s*\(\d+\s*points?\)\s*$", "", l).strip()})
-    return {"meta": meta, "units": units}
 
 
 def collect_phase_tips(
     phases: Dict[str, Any],
     faction_helpers: Dict[str, Any],
-    selected_units: List[Dict[str, Any]],
+    selected_units: List[Unit],
 ) -> Dict[str, Dict[str, List[str]]]:
     result = {}
     order = phases.get("order", [])
@@ -142,13 +223,13 @@ def collect_phase_tips(
 
     # Play tips par unité
     for u in selected_units:
-        tips = (u.get("play_tips") or {}).get("phases", {})
+        tips = u.phase_tips or {}
         for phase, stepdict in tips.items():
             if phase not in result:
                 continue
             for stp, msgs in stepdict.items():
                 if stp in result[phase] and msgs:
-                    result[phase][stp].extend([f"[{u['name']}] {m}" for m in msgs])
+                    result[phase][stp].extend([f"[{u.name}] {m}" for m in msgs])
     return result
 
 
@@ -228,29 +309,29 @@ ul { margin:6px 0 8px 18px; } li{ margin:3px 0; }
           {% if u.base.Inv %} • Inv {{u.base.Inv}}{% endif %}{% if u.base.FnP %} • FnP {{u.base.FnP}}{% endif %}
         </div>{% endif %}
 
-        {% if u.weapons and u.weapons.ranged %}
+        {% if u.ranged %}
           <h4>Armes de tir</h4>
           <ul>
-            {% for w in u.weapons.ranged %}
+            {% for wpn in u.ranged %}{% for w in wpn.profiles %}
             <li><b>{{w.name}}</b> — {{w.range}}, A {{w.A}}, BS {{w.BS}}, S {{w.S}}, AP {{w.AP}}, D {{w.D}}
               {% if w.keywords %}<span class="muted">({{ w.keywords|join(", ") }})</span>{% endif %}</li>
-            {% endfor %}
+            {% endfor %}{% endfor %}
           </ul>
         {% endif %}
 
-        {% if u.weapons and u.weapons.melee %}
+        {% if u.melee %}
           <h4>Armes de CàC</h4>
           <ul>
-            {% for w in u.weapons.melee %}
+            {% for wpn in u.melee %}{% for w in wpn.profiles %}
             <li><b>{{w.name}}</b> — A {{w.A}}, WS {{w.WS}}, S {{w.S}}, AP {{w.AP}}, D {{w.D}}
               {% if w.keywords %}<span class="muted">({{ w.keywords|join(", ") }})</span>{% endif %}</li>
-            {% endfor %}
+            {% endfor %}{% endfor %}
           </ul>
         {% endif %}
 
-        {% if u.abilities and u.abilities.unit %}
+        {% if u.abilities %}
           <h4>Rappels & règles</h4>
-          <ul>{% for ab in u.abilities.unit %}<li><b>{{ab.name}}.</b> {{ab.text}}</li>{% endfor %}</ul>
+          <ul>{% for ab in u.abilities %}<li><b>{{ab.name}}.</b> {{ab.text}}</li>{% endfor %}</ul>
         {% endif %}
       </div>
     {% endfor %}
@@ -324,6 +405,13 @@ with tab_input:
             APP_DIR
         )  # [Path(.../data), Path(.../data_noob), Path(.../data_xxx), ...]
         labels = [d.name for d in data_dirs]
+        dedup = dedup_report(data_dirs)
+        if dedup["duplicates"]:
+            st.caption(
+                f"{len(dedup['duplicates'])} fichier(s) identique(s) entre dossiers "
+                f"({dedup['duplicate_bytes'] / 1024:.0f} Ko) : repris sans reparse "
+                "quand un autre dossier les a déjà chargés."
+            )
 
         # 2) Gestion du défaut (dernier choix ou DEFAULT_YAML_DIR)
         prev_dir = st.session_state.get("data_dir")
@@ -342,10 +430,12 @@ with tab_input:
         except ValueError:
             default_index = 0
 
+        descriptions = {d.name: describe_data_dir(d) for d in data_dirs}
         choice = st.radio(
             "Choisis le dossier de données YAML",
             options=options,
             index=min(default_index, len(options) - 1),
+            format_func=lambda name: descriptions.get(name, name),
         )
 
         # 4) Résolution du dossier choisi
@@ -354,12 +444,23 @@ with tab_input:
         # 5) Mémorise et charge le corpus
         st.session_state["data_dir"] = str(chosen_dir)
 
-        if chosen_dir.exists() and chosen_dir.is_dir():
+        if chosen_dir.is_dir() or is_archive(chosen_dir):
             corpus = load_yaml_dir(chosen_dir)
             st.session_state["corpus"] = corpus  # dispo pour l’onglet Aperçu
             st.success(
-                f"{len(corpus['units'])} unités et {len(corpus['stratagems'])} stratagèmes chargés depuis `{chosen_dir.name}/`."
+                f"{len(corpus.units)} unités et {len(corpus.stratagems)} stratagèmes chargés depuis `{chosen_dir.name}/`."
             )
+            if corpus.dedup and corpus.dedup["files"]:
+                st.caption(
+                    f"{corpus.dedup['files']} fichier(s) repris d'un dossier déjà "
+                    f"chargé : {corpus.dedup['objects']} enregistrements partagés."
+                )
+            report = corpus.validation
+            if report and (report["counts"]["error"] or report["counts"]["warning"]):
+                st.warning(
+                    format_validation(report)
+                    + " — détail : `python create_cheat_sheet.py validate --json`."
+                )
         else:
             st.warning(
                 "Dossier introuvable. Corrige le chemin ou choisis un dossier existant."
@@ -374,9 +475,10 @@ with tab_input:
         if uploads:
             corpus = load_yaml_files(uploads)
             st.session_state["corpus"] = corpus
+            st.session_state["corpus_key"] = None
             st.session_state["data_dir"] = None
             st.success(
-                f"{len(corpus['units'])} unités et {len(corpus['stratagems'])} stratagèmes chargés via upload."
+                f"{len(corpus.units)} unités et {len(corpus.stratagems)} stratagèmes chargés via upload."
             )
 
     st.subheader("Export 40k")
@@ -389,10 +491,19 @@ with tab_input:
             placeholder="test (995 points)\n\nSpace Marines\nUltramarines\nIncursion (1000 points)\nGladius Task Force\n\nCHARACTERS\n\nCaptain with Jump Pack (75 points)\n  • ...",
         )
     with col2:
-        txt_file = st.file_uploader("…ou uploade le .txt", type=["txt"])
+        txt_file = st.file_uploader(
+            "…ou uploade le .txt (ou un roster BattleScribe .ros/.rosz)",
+            type=["txt", "ros", "rosz"],
+        )
         if txt_file and not st.session_state.export_text.strip():
-            export_text = txt_file.read().decode("utf-8", errors="ignore")
-            st.info("Texte rempli depuis le fichier uploadé.")
+            if is_roster(txt_file.name):
+                # converti au format de l'app : aperçu et génération inchangés
+                names = corpus_names(corpus) if corpus is not None else None
+                export_text = format_export(read_roster(txt_file, names))
+                st.info("Roster BattleScribe converti au format de l’app 40k.")
+            else:
+                export_text = txt_file.read().decode("utf-8", errors="ignore")
+                st.info("Texte rempli depuis le fichier uploadé.")
 
     if st.button("Générer la fiche"):
         uploaded_path = save_text_to_file(export_text)
@@ -402,8 +513,13 @@ with tab_input:
             out_html_path = tmp_out.name
         st.session_state["out_html_path"] = out_html_path
 
-        data_dir = Path(st.session_state.get("data_dir") or DEFAULT_YAML_DIR)
-        run(uploaded_path, data_dir, out_html_path)
+        if corpus is not None:
+            # même corpus que l'aperçu : pas de relecture des YAML
+            army = parse_export_text(export_text, corpus)
+            run_with_corpus(uploaded_path, corpus, out_html_path, army=army)
+        else:
+            data_dir = Path(st.session_state.get("data_dir") or DEFAULT_YAML_DIR)
+            run(uploaded_path, data_dir, out_html_path, db_path=CORPUS_DB)
         html = Path(out_html_path).read_text(encoding="utf-8")
 
         st.session_state["preview_html"] = html  # stocke pour l'affichage persistant
@@ -432,24 +548,23 @@ with tab_preview:
         )
     else:
         corpus = st.session_state["corpus"]
-        parsed = parse_export_text(st.session_state["export_text"])
+        army = parse_export_text(st.session_state["export_text"], corpus)
+        meta = template_meta(army)
 
-        units_index = build_units_index(corpus["units"])
+        units_index = build_units_index(corpus.units)
         selected, missing = [], []
-        for u in parsed["units"]:
-            found = units_index.get(norm(u["name"]))
+        for u in army.units:
+            found = units_index.get(norm(u.name))
             if found:
                 selected.append(found)
             else:
-                missing.append(u["name"])
+                missing.append(u.name)
 
-        phase_tips = collect_phase_tips(
-            corpus["phases"], corpus["faction_helpers"], selected
-        )
+        phase_tips = collect_phase_tips(corpus.phases, corpus.faction_helpers, selected)
         html = render_html(
-            parsed["meta"],
-            corpus["phases"],
-            corpus["faction_helpers"],
+            meta,
+            corpus.phases,
+            corpus.faction_helpers,
             selected,
             missing,
             phase_tips,
@@ -461,7 +576,7 @@ with tab_preview:
         st.download_button(
             "Télécharger le HTML",
             data=html.encode("utf-8"),
-            file_name=f"cheat_{parsed['meta']['list_name'].strip().replace(' ','_')}.html",
+            file_name=f"cheat_{meta['list_name'].strip().replace(' ','_')}.html",
             mime="text/html",
             use_container_width=True,
         )
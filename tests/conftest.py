@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Les modules du projet sont à la racine du dépôt (pas de package) : la racine
+est ajoutée au sys.path pour les tests, lancés par `python -m pytest`.
+"""
+
+from pathlib import Path
+import shutil
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+DATA_DIRS = sorted(p for p in ROOT.glob("data_*") if p.is_dir())
+
+
+@pytest.fixture
+def data_copy(tmp_path):
+    """Copie de travail d'un dossier data_* (sans les caches générés)."""
+
+    def copy(name: str = "data_tyrannides") -> Path:
+        dst = tmp_path / name
+        dst.mkdir()
+        for f in (ROOT / name).glob("*.yaml"):
+            shutil.copy2(f, dst / f.name)
+        return dst
+
+    return copy
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Archive d'un dossier (pack, .c40k.zip) : même corpus, lecture partielle."""
+
+import json
+import zipfile
+
+import pytest
+
+import corpus_archive
+import create_cheat_sheet as ccs
+from export_parser import normalize_name
+
+
+def test_archive_round_trip(data_copy):
+    d = data_copy()
+    archive = ccs.pack_data_dir(d)
+    assert ccs.is_archive(archive)
+    full = ccs.load_corpus(d, use_snapshot=False)
+    corpus = ccs.load_corpus(archive)
+    assert corpus.units == full.units
+    assert corpus.stratagems == full.stratagems
+    assert (corpus.phases, corpus.faction_helpers) == (
+        full.phases,
+        full.faction_helpers,
+    )
+    assert corpus.validation["ok"] == ccs.validate_dir(d)["ok"]
+
+
+def test_archive_reads_only_what_the_export_needs(data_copy):
+    d = data_copy()
+    archive = ccs.pack_data_dir(d)
+    listed = {normalize_name("Broodlord"): 1}
+    corpus = ccs.load_corpus_for_export(archive, listed, {"Invasion Fleet"})
+    assert list(corpus.units_by_key) == ["broodlord"]
+    full = ccs.load_corpus(d, use_snapshot=False)
+    assert corpus.units_by_key["broodlord"] == full.units_by_key["broodlord"]
+    assert corpus.stratagems == [
+        st for st in full.stratagems if {"Invasion Fleet", "All"} & set(st.detachment)
+    ]
+
+
+def test_repack_replaces_and_old_versions_are_refused(data_copy):
+    d = data_copy()
+    archive = ccs.pack_data_dir(d)
+    (d / "zz_extra.yaml").write_text(
+        "units:\n- name: Spore Test Swarm\n  role: Swarm\n", encoding="utf-8"
+    )
+    assert "spore test swarm" not in ccs.load_corpus(archive).units_by_key
+    ccs.pack_data_dir(d)
+    assert "spore test swarm" in ccs.load_corpus(archive).units_by_key
+    with zipfile.ZipFile(archive) as zf:
+        members = {n: zf.read(n) for n in zf.namelist()}
+    index = json.loads(members[corpus_archive.ARCHIVE_INDEX])
+    index["version"] = corpus_archive.ARCHIVE_VERSION + 1
+    members[corpus_archive.ARCHIVE_INDEX] = json.dumps(index).encode("utf-8")
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    with pytest.raises(ValueError):
+        ccs.CorpusArchive(archive)
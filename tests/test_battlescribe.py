@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Rosters BattleScribe : .ros, .rosz (chemin ou fichier), aller-retour texte."""
+
+import io
+import zipfile
+
+import pytest
+
+import create_cheat_sheet as ccs
+from battlescribe import read_roster
+from export_parser import format_export, parse_export_text
+
+ROSTER = ccs.GOLDEN_EXPORTS_DIR / "sm_incursion_battlescribe.ros"
+
+
+def _rosz(tmp_path, members):
+    path = tmp_path / "roster.rosz"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return path
+
+
+def test_rosz_path_and_file_match_ros(tmp_path):
+    expected = read_roster(ROSTER).to_dict()
+    path = _rosz(tmp_path, {"readme.txt": "x", "army.ros": ROSTER.read_bytes()})
+    assert read_roster(path).to_dict() == expected
+    with open(path, "rb") as f:
+        assert read_roster(f).to_dict() == expected
+        assert not f.closed  # le fichier de l'appelant reste ouvert
+    buf = io.BytesIO(path.read_bytes())
+    assert read_roster(buf).to_dict() == expected
+
+
+def test_rosz_without_ros_member(tmp_path):
+    path = _rosz(tmp_path, {"readme.txt": "x"})
+    with pytest.raises(ValueError, match=r"\.ros"):
+        read_roster(path)
+
+
+def test_roster_round_trips_through_app_text():
+    names = ccs.golden_names()
+    army = read_roster(ROSTER, names)
+    again = parse_export_text(format_export(army), names)
+    assert ccs._comparable(again) == ccs._comparable(army)
+    assert army.units and army.points_total
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Base SQLite (build-db) : même corpus que les YAML, péremption, réimport."""
+
+import shutil
+import sqlite3
+
+import pytest
+
+import corpus_db
+import create_cheat_sheet as ccs
+from conftest import ROOT
+
+
+def test_db_round_trip_and_staleness(data_copy, tmp_path):
+    d = data_copy()
+    db_path = ccs.build_corpus_db(tmp_path / "c.db", [d])
+    corpus = ccs.load_corpus(d, use_snapshot=False)
+    with corpus_db.CorpusDB(db_path) as db:
+        assert db.is_fresh(d)
+        got = db.corpus(d)
+        assert got.units == corpus.units
+        assert got.stratagems == corpus.stratagems
+        assert got.phases == corpus.phases
+        assert db.names(d).lookup("Invasion Fleet") == ("detachment", "Invasion Fleet")
+        strats = db.corpus(d, detachments={"Invasion Fleet"}).stratagems
+        assert 0 < len(strats) < len(corpus.stratagems)
+    path = d / ccs.STRATAGEMS_FILE
+    path.write_text(path.read_text(encoding="utf-8") + "\n# édité\n", "utf-8")
+    with corpus_db.CorpusDB(db_path) as db:
+        assert not db.is_fresh(d)
+
+
+def test_db_from_older_version_is_reimported(data_copy, tmp_path):
+    d = data_copy()
+    db_path = ccs.build_corpus_db(tmp_path / "c.db", [d])
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE units SET doc = ?", (b"\x80\x04pickle",))
+        conn.execute("UPDATE meta SET value = '1' WHERE key = 'version'")
+    ccs.build_corpus_db(db_path, [d])
+    with corpus_db.CorpusDB(db_path) as db:
+        assert db.corpus(d).units == ccs.load_corpus(d, use_snapshot=False).units
+
+
+def test_db_keeps_homonym_dirs_apart(data_copy, tmp_path):
+    d = data_copy()
+    other = tmp_path / "ailleurs" / d.name
+    shutil.copytree(d, other)
+    db_path = ccs.build_corpus_db(tmp_path / "c.db", [d])
+    with corpus_db.CorpusDB(db_path) as db:
+        assert db.is_fresh(d) and not db.is_fresh(other)
+        with pytest.raises(KeyError):
+            db.source_id(other)
+    with pytest.raises(ValueError, match="déjà importé"):
+        ccs.build_corpus_db(db_path, [other])
+
+
+def test_db_tracks_emptied_dirs_and_shards(data_copy, tmp_path):
+    d = data_copy()
+    ccs.shard_stratagems(d)
+    (d / ccs.STRATAGEMS_FILE).unlink()
+    db_path = ccs.build_corpus_db(tmp_path / "c.db", [d])
+    manifest = d / ccs.SHARDS_DIR / "manifest.yaml"
+    with corpus_db.CorpusDB(db_path) as db:
+        assert db.is_fresh(d)
+        manifest.write_text(manifest.read_text(encoding="utf-8") + "\n", "utf-8")
+        assert not db.is_fresh(d)
+        for p in d.glob("*.yaml"):
+            p.unlink()
+        shutil.rmtree(d / ccs.SHARDS_DIR)
+        assert not db.is_fresh(d)
+        shutil.rmtree(d)
+        assert db.is_fresh(d)  # base déployée sans les YAML
+
+
+def test_run_without_the_db_reads_the_yaml(data_copy, tmp_path, capsys):
+    d = data_copy()
+    export = ROOT / "golden_exports" / "tyranids_detachment_first.txt"
+    args = (str(export), str(d))
+    ccs.run(*args, str(tmp_path / "yaml.html"))
+    ccs.run(*args, str(tmp_path / "db.html"), db_path=str(tmp_path / "absente.db"))
+    assert "inutilisable" in capsys.readouterr().err
+    assert (tmp_path / "db.html").read_bytes() == (tmp_path / "yaml.html").read_bytes()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Parseur d'export de l'app 40k : texte, fichier, packs, aller-retour."""
+
+from dataclasses import asdict
+
+import pytest
+
+import create_cheat_sheet as ccs
+from conftest import ROOT
+from export_parser import (
+    NameIndex,
+    format_export,
+    iter_export_file,
+    iter_export_lists,
+    normalize_name,
+    parse_export_file,
+    parse_export_text,
+)
+
+EXPORT = ROOT / "export_from_40k_app.txt"
+GOLDEN = sorted((ROOT / "golden_exports").glob("*.txt"))
+
+
+def _comparable(army) -> dict:
+    """L'ArmyList sans ce qui dépend de la mise en page (n° de ligne, en-tête)."""
+    d = asdict(army)
+    d.pop("header")
+    d.pop("line", None)
+    for u in d["units"]:
+        u.pop("line")
+    return d
+
+
+def test_text_and_file_agree():
+    army = parse_export_file(EXPORT)
+    text = EXPORT.read_text(encoding="utf-8")
+    assert asdict(parse_export_text(text)) == asdict(army)
+
+
+def test_sample_export_keeps_meta_and_wargear():
+    army = parse_export_file(EXPORT)
+    assert army.meta() == {
+        "title": "test",
+        "points_total": 995,
+        "faction": "Space Marines",
+        "chapter": "Ultramarines",
+        "detachment": "Gladius Task Force",
+        "format": "Incursion",
+        "format_points": 1000,
+    }
+    captain = army.units[0]
+    assert (captain.name, captain.points, captain.section) == (
+        "Captain with Jump Pack",
+        75,
+        "CHARACTERS",
+    )
+    assert [w.name for w in captain.wargear] == [
+        "Astartes chainsword",
+        "Heavy bolt pistol",
+    ]
+    assert normalize_name(captain.name) in army.listed()
+
+
+def test_pack_streams_one_list_per_export():
+    text = EXPORT.read_text(encoding="utf-8")
+    armies = list(iter_export_lists(((text + "\n") * 3).splitlines()))
+    assert len(armies) == 3
+    assert len({str(_comparable(a)) for a in armies}) == 1
+    assert [a.line for a in armies] == sorted(a.line for a in armies)
+
+
+def test_name_index_round_trip_and_merge():
+    a = NameIndex(["Invasion Fleet"], ["Tyranids"])
+    b = NameIndex.from_dict(NameIndex(["Gladius Task Force"]).to_dict())
+    merged = NameIndex.merge([a, b])
+    assert merged.lookup("invasion  fleet") == ("detachment", "Invasion Fleet")
+    assert merged.lookup("Gladius Task Force") == ("detachment", "Gladius Task Force")
+    assert merged.lookup("TYRANIDS") == ("faction", "Tyranids")
+    assert merged.lookup("Strike Force") is None
+    assert not NameIndex()
+
+
+@pytest.mark.parametrize("path", GOLDEN, ids=lambda p: p.name)
+def test_golden_text_file_and_round_trip_agree(path):
+    names = ccs.golden_names()
+    armies = list(iter_export_file(path, names))
+    text = path.read_text(encoding="utf-8")
+    assert [asdict(a) for a in iter_export_lists(text.splitlines(), names)] == [
+        asdict(a) for a in armies
+    ]
+    if len(armies) == 1:
+        assert asdict(parse_export_file(path, names)) == asdict(armies[0])
+    for army in armies:
+        again = parse_export_text(format_export(army), names)
+        expected = _comparable(army)
+        for u in expected["units"]:  # sans section, format_export les range ici
+            u["section"] = u["section"] or "OTHER DATASHEETS"
+        assert _comparable(again) == expected
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""Exports de référence (golden_exports/) vérifiés avec l'index de noms du corpus."""
+
+import json
+
+import create_cheat_sheet as ccs
+
+
+def test_goldens_match_with_corpus_names(capsys):
+    assert ccs.check_exports()
+    assert "❌" not in capsys.readouterr().out
+
+
+def test_detachment_before_faction_uses_name_index():
+    txt = ccs.GOLDEN_EXPORTS_DIR / "tyranids_detachment_first.txt"
+    (army,) = ccs._parse_golden(txt, ccs.golden_names())
+    assert (army["detachment"], army["chapter"]) == ("Invasion Fleet", None)
+    expected = json.loads(txt.with_suffix(".json").read_text(encoding="utf-8"))
+    assert expected == [army]
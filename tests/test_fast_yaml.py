@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""fast_yaml doit rendre exactement yaml.safe_load, ou lever UnsupportedYAML."""
+
+import pytest
+import yaml
+
+import fast_yaml
+from conftest import DATA_DIRS, ROOT
+
+DATA_FILES = sorted(
+    [f for d in DATA_DIRS for f in d.glob("*.yaml")] + list(ROOT.glob("file_*.yaml"))
+)
+
+# entrées où le sous-ensemble donnait un autre résultat que PyYAML
+DIVERGENT = [
+    "a: {b:1}\n",
+    "a: [b:1, c]\n",
+    "a: {b:c: 1}\n",
+    'a: {"b":1}\n',
+    "a: {b: 1, c:}\n",
+    "key: \tvalue\n",
+    "key:\tvalue\n",
+    "key\t: v\n",
+    "a:\n\t- b\n",
+    "a: b\u2028c\n",
+    "a: b\u2029c\n",
+    "a: b\x85c: d\n",
+    "a: [x?y]\n",
+]
+
+
+def _safe_load(text):
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        return type(e)
+
+
+def _fast_load(text):
+    try:
+        return fast_yaml.load(text)
+    except yaml.YAMLError as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("text", DIVERGENT)
+def test_same_result_as_safe_load(text):
+    assert _fast_load(text) == _safe_load(text)
+
+
+@pytest.mark.parametrize("text", ["a: b\tc\n", "a: b\u2028c\n", "a: b\x85c\n"])
+def test_tabs_and_unicode_breaks_fall_back(text):
+    with pytest.raises(fast_yaml.UnsupportedYAML):
+        fast_yaml.parse(text)
+
+
+def test_flow_colon_needs_a_space():
+    assert fast_yaml.parse("a: [b:1, 'c']\n") == {"a": ["b:1", "c"]}
+    assert fast_yaml.parse("a: {b: 1, c:}\n") == {"a": {"b": 1, "c": None}}
+
+
+@pytest.mark.parametrize("path", DATA_FILES, ids=lambda p: f"{p.parent.name}/{p.name}")
+def test_data_files(path):
+    text = path.read_text(encoding="utf-8")
+    # les fichiers de données restent dans le sous-ensemble (pas de repli)
+    assert fast_yaml.parse(text) == yaml.safe_load(text)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Corpus en couches (layers.yaml) : priorité de la couche haute, rafraîchissement."""
+
+import pytest
+
+import create_cheat_sheet as ccs
+
+
+@pytest.fixture
+def layered(data_copy, tmp_path):
+    base = data_copy()
+    top = tmp_path / "data_top"
+    top.mkdir()
+    (top / ccs.LAYERS_FILE).write_text(
+        f"layers:\n  - ../{base.name}\n", encoding="utf-8"
+    )
+    (top / "units.yaml").write_text(
+        "units:\n- name: Broodlord\n  role: Warlord\n", encoding="utf-8"
+    )
+    (top / ccs.STRATAGEMS_FILE).write_text(
+        "stratagems:\n"
+        "- name: Rapid Regeneration\n"
+        "  cp: 9\n"
+        "  detachment: [Invasion Fleet]\n",
+        encoding="utf-8",
+    )
+    return base, top
+
+
+def test_top_layer_wins(layered):
+    base, top = layered
+    assert ccs.corpus_layers(top) == [base.resolve(), top.resolve()]
+    lower = ccs.load_corpus(base, use_snapshot=False)
+    corpus = ccs.load_corpus(top)
+    assert corpus.units_by_key["broodlord"].role == "Warlord"
+    assert len(corpus.units) == len(lower.units)
+    regen = [st for st in corpus.stratagems if st.name == "Rapid Regeneration"]
+    assert [st.cp for st in regen] == [9]
+    assert len(corpus.stratagems) == len(lower.stratagems)
+    assert corpus.phases == lower.phases
+
+
+def test_layered_corpus_follows_parent_edits(layered):
+    base, top = layered
+    corpus = ccs.load_corpus(top)
+    path = base / "tyranids_units.yaml"
+    path.write_text(
+        path.read_text(encoding="utf-8").replace(
+            "- name: Deathleaper", "- name: Leaper"
+        ),
+        encoding="utf-8",
+    )
+    again = ccs.load_corpus(top)
+    assert again is corpus  # même fusion, rafraîchie en place
+    assert "leaper" in again.units_by_key and "deathleaper" not in again.units_by_key
+
+
+def test_layer_cycle_is_refused(tmp_path):
+    a, b = tmp_path / "data_a", tmp_path / "data_b"
+    a.mkdir()
+    b.mkdir()
+    (a / ccs.LAYERS_FILE).write_text("layers: [../data_b]\n", encoding="utf-8")
+    (b / ccs.LAYERS_FILE).write_text("layers: [../data_a]\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="Cycle"):
+        ccs.corpus_layers(a)
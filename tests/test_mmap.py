@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Snapshot mmap (.corpus.mmap) : mêmes enregistrements, péremption, pas de pickle."""
+
+import pickle
+
+import pytest
+
+import create_cheat_sheet as ccs
+import mmap_corpus
+
+
+def test_mmap_round_trip_and_staleness(data_copy):
+    d = data_copy()
+    corpus = ccs.load_corpus(d, use_snapshot=False)
+    mapped = ccs.load_mmap_corpus(d)
+    assert list(mapped.units) == corpus.units
+    assert list(mapped.stratagems) == corpus.stratagems
+    assert dict(mapped.units_by_key) == corpus.units_by_key
+    assert (mapped.phases, mapped.faction_helpers) == (
+        corpus.phases,
+        corpus.faction_helpers,
+    )
+    path = d / ccs.STRATAGEMS_FILE
+    path.write_text(path.read_text(encoding="utf-8") + "\n# édité\n", "utf-8")
+    assert ccs.open_mmap_corpus(d) is None
+    assert ccs.load_mmap_corpus(d) is not None
+
+
+def test_replaced_or_deleted_mmap_is_closed(data_copy):
+    d = data_copy()
+    ccs.load_mmap_corpus(d)
+    key = str(d / ccs.MMAP_NAME)
+    old = ccs._MMAP_OPEN[key][1]
+    ccs.compile_mmap(d)
+    assert ccs.open_mmap_corpus(d) is not None
+    new = ccs._MMAP_OPEN[key][1]
+    assert new is not old and old._mm.closed and not new._mm.closed
+    (d / ccs.MMAP_NAME).unlink()
+    assert ccs.open_mmap_corpus(d) is None
+    assert key not in ccs._MMAP_OPEN and new._mm.closed
+
+
+def test_mmap_values_are_never_unpickled():
+    value = {"shooting": ["tir"], 1: ("a", None)}
+    assert mmap_corpus._decode_value(mmap_corpus._encode_value(value)) == value
+    with pytest.raises(ValueError):
+        mmap_corpus._decode_value(b"p" + pickle.dumps(value))
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Enregistrements models.* : valeurs inconnues signalées, encodage JSON."""
+
+import datetime
+import json
+
+import pytest
+
+import models
+from corpus import Corpus
+from models import (
+    Stratagem,
+    UnknownValueWarning,
+    Unit,
+    Window,
+    dumps_data,
+    loads_data,
+    string_scope,
+    unknown_values,
+)
+
+
+def test_known_window_values_are_silent(recwarn):
+    w = Window.from_dict(
+        {
+            "phase": "Shooting",
+            "step": "after_enemy_selects_targets",
+            "player": " Opponent",
+        }
+    )
+    assert (w.phase, w.step, w.player, w.alias) == (
+        "shooting",
+        "start",
+        "opponent",
+        "after_enemy_selects_targets",
+    )
+    assert not [r for r in recwarn if r.category is UnknownValueWarning]
+
+
+def test_unknown_player_is_reported():
+    with pytest.warns(UnknownValueWarning, match="foe"):
+        w = Window.from_dict({"phase": "fight", "player": "foe"})
+    assert w.player == "any"
+    assert unknown_values()["player"]["foe"] >= 1
+
+
+def test_unknown_step_is_reported():
+    with pytest.warns(UnknownValueWarning, match="reroll_saves"):
+        w = Window.from_dict({"phase": "shooting", "step": "reroll_saves"})
+    assert w.step == "reroll_saves"
+    Window.from_dict({"phase": "shooting", "step": "reroll_saves"})
+    assert unknown_values()["step"]["reroll_saves"] >= 2
+
+
+def test_unknown_phase_is_reported(recwarn):
+    Window.from_dict({"phase": "any", "step": "start"})  # valable à toute phase
+    assert not [r for r in recwarn if r.category is UnknownValueWarning]
+    with pytest.warns(UnknownValueWarning, match="deployment"):
+        w = Window.from_dict({"phase": " Deployment ", "step": "start"})
+    assert w.phase == "deployment"
+    assert unknown_values()["phase"]["deployment"] >= 1
+
+
+def test_step_checked_against_its_phase():
+    with pytest.warns(UnknownValueWarning, match="pile_in"):
+        Window.from_dict({"phase": "movement", "step": "pile_in"})
+    assert "pile_in" in models.PHASE_STEPS["fight"]
+
+
+def test_data_codec_round_trip():
+    unit = Unit.from_dict(
+        {
+            "name": "Termagants",
+            "keywords": ["Infantry"],
+            "base": {"M": '6"', "T": 3},
+            "weapons": {
+                "ranged": [{"name": "Fleshborer", "A": 1, "keywords": ["Assault"]}]
+            },
+            "play_tips": {"phases": {"shooting": ["tir"]}},
+        }
+    )
+    strat = Stratagem.from_dict(
+        {"name": "X", "cp": 1, "detachment": ["A"], "when": [{"phase": "fight"}]}
+    )
+    data = {
+        "records": [unit, strat],
+        "per_turn": {1: ["a"], (2, 3): None},
+        "__items__": "clé qui ressemble à une balise",
+        "when": datetime.date(2024, 5, 1),
+        "at": datetime.datetime(2024, 5, 1, 12, 30),
+        "pair": ("a", 1.5, True),
+    }
+    assert loads_data(dumps_data(data)) == data
+
+
+def test_data_codec_refuses_unknown_tags():
+    with pytest.raises(ValueError):
+        loads_data(json.dumps({"__reduce__": ["os.system", ["echo"]]}))
+    with pytest.raises(ValueError):
+        loads_data(json.dumps({"__record__": ["Popen", []]}))
+    with pytest.raises(TypeError):
+        dumps_data({"x": object()})
+
+
+def test_string_pool_is_scoped_to_a_load():
+    doc = {"name": "Termagants", "keywords": ["Infantry", "Tyranids"]}
+    with string_scope() as pool:
+        unit = Unit.from_dict(doc)
+        decoded = loads_data(dumps_data(unit))
+        assert Unit.from_dict(doc).keywords is unit.keywords
+    assert decoded.keywords is unit.keywords  # décodage interné aussi
+    assert pool.stats()["by_kind"]["keyword"]["unique"] == 2
+    # hors d'un chargement, rien n'est retenu
+    assert Unit.from_dict(doc).keywords is not unit.keywords
+    corpus = Corpus.from_docs([{"units": [doc]}])
+    assert corpus.strings is not None and corpus.strings is not pool
+    assert corpus.units[0].keywords is not unit.keywords
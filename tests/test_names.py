@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Noms de détachements / factions relevés sans charger le corpus."""
+
+import pytest
+
+import corpus
+import corpus_db
+import corpus_snapshot
+import corpus_validation
+import create_cheat_sheet as ccs
+import layers
+import stratagem_store
+from conftest import DATA_DIRS
+
+
+@pytest.mark.parametrize("name", [d.name for d in DATA_DIRS])
+def test_scan_matches_loaded_corpus(data_copy, name):
+    d = data_copy(name)
+    expected = ccs.corpus_names(ccs.load_dir_corpus(d)).to_dict()
+    assert ccs._scan_dir_names(d).to_dict() == expected
+
+
+def test_name_index_does_not_load_the_corpus(data_copy, monkeypatch):
+    d = data_copy("data_tyrannides")
+
+    def no_full_load(*a, **k):
+        raise AssertionError("chargement complet du corpus")
+
+    for module in (ccs, corpus, layers):
+        monkeypatch.setattr(module, "load_dir_corpus", no_full_load)
+    for module in (ccs, corpus_snapshot, corpus_validation, corpus):
+        monkeypatch.setattr(module, "load_yaml_docs", no_full_load)
+    names = ccs.load_name_index(d)
+    assert names.lookup("Invasion Fleet") == ("detachment", "Invasion Fleet")
+    assert (d / ccs.NAMES_NAME).is_file()
+    assert ccs.load_name_index(d).to_dict() == names.to_dict()  # depuis le cache
+
+
+def test_names_cache_follows_the_files(data_copy):
+    d = data_copy("data_tyrannides")
+    ccs.load_name_index(d)
+    path = d / ccs.STRATAGEMS_FILE
+    path.write_text(
+        path.read_text(encoding="utf-8").replace("Invasion Fleet", "Swarm Fleet"),
+        encoding="utf-8",
+    )
+    names = ccs.load_name_index(d)
+    assert names.lookup("Swarm Fleet") == ("detachment", "Swarm Fleet")
+
+
+def test_scan_stratagem_detachments(data_copy):
+    d = data_copy("data_tyrannides")
+    strats = stratagem_store.load_stratagems(d / ccs.STRATAGEMS_FILE)
+    expected = {x for st in strats for x in st.get("detachment") or ()}
+    assert set(ccs.scan_stratagem_detachments(d / ccs.STRATAGEMS_FILE)) == expected
+
+
+def test_archive_and_db_names(data_copy, tmp_path):
+    d = data_copy("data_tyrannides")
+    expected = ccs.corpus_names(ccs.load_dir_corpus(d)).to_dict()
+    archive = ccs.pack_data_dir(d, tmp_path / "t.c40k.zip")
+    assert ccs.load_name_index(archive).to_dict() == expected
+    db_path = ccs.build_corpus_db(tmp_path / "c.db", [d])
+    with corpus_db.CorpusDB(db_path) as db:
+        assert db.names(d).to_dict() == expected
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""Commande profile : parseur effectivement utilisé par fichier."""
+
+import create_cheat_sheet as ccs
+
+
+def test_profile_reports_the_loader_of_each_file(data_copy):
+    d = data_copy()
+    (d / "zz_tabs.yaml").write_text('a: "x\ty"\n', encoding="utf-8")
+    report = ccs.profile_corpus(d)
+    loaders = {f["file"]: f["loader"] for f in report["files"]}
+    assert loaders.pop("zz_tabs.yaml") == ccs.YamlLoader.__name__
+    assert set(loaders.values()) == {"fast_yaml"}
+    assert report["loaders"] == {
+        "fast_yaml": len(loaders),
+        ccs.YamlLoader.__name__: 1,
+    }
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Corpus par fichier : refresh ne relit que les modifiés, doublons partagés."""
+
+import gc
+
+import corpus
+import create_cheat_sheet as ccs
+
+
+def test_refresh_reports_and_applies_changes(data_copy):
+    d = data_copy()
+    corpus = ccs.load_dir_corpus(d)
+    assert not corpus.refresh()
+    strats = corpus.stratagems
+    path = d / "tyranids_units.yaml"
+    path.write_text(
+        path.read_text(encoding="utf-8").replace("role: Character", "role: Hero", 1),
+        encoding="utf-8",
+    )
+    (d / "zz_extra.yaml").write_text(
+        "units:\n- name: Spore Test Swarm\n  role: Swarm\n", encoding="utf-8"
+    )
+    changes = corpus.refresh()
+    assert changes.files_changed == ["tyranids_units.yaml"]
+    assert changes.files_added == ["zz_extra.yaml"]
+    assert changes.units_added == ["Spore Test Swarm"]
+    assert changes.units_modified == ["Broodlord"]
+    assert not changes.stratagems_changed and corpus.stratagems == strats
+    assert corpus.units_by_key["broodlord"].role == "Hero"
+    assert corpus.units == ccs.load_dir_corpus(d, use_snapshot=False).units
+
+    (d / "zz_extra.yaml").unlink()
+    changes = corpus.refresh()
+    assert changes.files_removed == ["zz_extra.yaml"]
+    assert changes.units_removed == ["Spore Test Swarm"]
+
+
+def test_refresh_picks_up_stratagem_edits(data_copy):
+    d = data_copy()
+    corpus = ccs.load_dir_corpus(d)
+    path = d / ccs.STRATAGEMS_FILE
+    path.write_text(
+        path.read_text(encoding="utf-8").replace(
+            "- name: Rapid Regeneration", "- name: Fast Regeneration"
+        ),
+        encoding="utf-8",
+    )
+    changes = corpus.refresh()
+    assert changes.stratagems_changed
+    assert "Fast Regeneration" in {st.name for st in corpus.stratagems}
+
+
+def test_identical_files_are_shared_and_counted_per_load(data_copy):
+    corpus._SHARED_FILES.clear()
+    a, b = data_copy(), data_copy("data_tyrannides_v2")
+    first = ccs.load_dir_corpus(a)
+    assert first.dedup["files"] == 0
+    second = ccs.load_dir_corpus(b)
+    units = first.files["tyranids_units.yaml"].units
+    assert second.files["tyranids_units.yaml"].units is units
+    assert second.dedup["files"] == 1 and second.dedup["objects"] == len(units)
+    del first
+    gc.collect()
+    again = ccs.load_dir_corpus(a)  # partage toujours possible, sans compter
+    assert again.files["tyranids_units.yaml"].units is units
+    assert again.dedup["files"] == 0
+    report = ccs.content_dedup_report([a, b], [again, second])
+    assert report["shared"]["files"] == 1
+    assert len(report["duplicates"]) == 1
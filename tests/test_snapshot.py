@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Snapshot compilé (.corpus.snapshot) : aller-retour, péremption, pas de pickle."""
+
+import pickle
+
+import corpus_snapshot
+import create_cheat_sheet as ccs
+
+
+def test_snapshot_round_trip_and_staleness(data_copy):
+    d = data_copy()
+    docs = ccs.parse_yaml_docs(d)
+    ccs.write_snapshot(d, docs)
+    assert corpus_snapshot.read_snapshot(d) == docs
+    assert ccs.load_yaml_docs(d) == docs
+    path = d / ccs.STRATAGEMS_FILE
+    path.write_text(path.read_text(encoding="utf-8") + "\n# édité\n", "utf-8")
+    assert corpus_snapshot.read_snapshot(d) is None
+    (d / "extra.yaml").write_text("units: []\n", encoding="utf-8")
+    names = [n for n, _ in ccs.load_yaml_docs(d)]
+    assert names == sorted([n for n, _ in docs] + ["extra.yaml"])
+    assert corpus_snapshot.read_snapshot(d) is not None
+
+
+class _Boom:
+    def __reduce__(self):
+        return (exec, ("raise SystemExit('pickle exécuté')",))
+
+
+def test_snapshot_never_unpickles(data_copy):
+    d = data_copy()
+    ccs.write_snapshot(d, ccs.parse_yaml_docs(d))
+    path = corpus_snapshot.snapshot_path(d)
+    raw = path.read_bytes()
+    with open(path, "rb") as f:
+        corpus_snapshot._read_snapshot_header(f)
+        body = f.tell()
+    path.write_bytes(raw[:body] + pickle.dumps(_Boom()))
+    assert corpus_snapshot.read_snapshot(d) is None
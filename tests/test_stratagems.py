@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Stratagèmes : lecture en flux filtrée, jumeaux JSON, shards."""
+
+import json
+
+import corpus_docs
+import create_cheat_sheet as ccs
+import stratagem_store
+
+WANTED = {"Invasion Fleet"}
+
+
+def _expected(path, detachments):
+    return [
+        st
+        for st in ccs.load_yaml_file(path, use_twin=False)["stratagems"]
+        if stratagem_store._strat_wanted(st.get("detachment") or [], detachments)
+    ]
+
+
+def test_filtered_load_reads_a_fresh_twin(data_copy, monkeypatch):
+    d = data_copy()
+    path = d / ccs.STRATAGEMS_FILE
+    ccs.load_yaml_file(path)  # génère le jumeau
+
+    def no_stream(*a, **k):
+        raise AssertionError("YAML lu en flux malgré un jumeau à jour")
+
+    monkeypatch.setattr(stratagem_store, "iter_stratagems", no_stream)
+    got = stratagem_store.load_stratagems(path, WANTED)
+    assert got == _expected(path, WANTED)
+    assert 0 < len(got) < len(ccs.load_yaml_file(path, use_twin=False)["stratagems"])
+
+
+def test_filtered_load_streams_without_a_fresh_twin(data_copy):
+    d = data_copy()
+    path = d / ccs.STRATAGEMS_FILE
+    ccs.load_yaml_file(path)
+    path.write_text(path.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    assert stratagem_store.load_stratagems(path, WANTED) == _expected(path, WANTED)
+    assert corpus_docs.read_twin(path) is None  # périmé, pas régénéré
+
+
+def test_twin_round_trip_and_staleness(data_copy):
+    d = data_copy()
+    path = d / ccs.STRATAGEMS_FILE
+    data = ccs.load_yaml_file(path)
+    assert corpus_docs.read_twin(path) == data
+    # mappings à clés non-str : encodés puis restitués
+    odd = {"per_turn": {1: ["a"], 2: []}}
+    ccs.write_twin(path, odd, "x" * 64)
+    assert corpus_docs.read_twin(path, "x" * 64) == odd
+    path.write_text(path.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    assert corpus_docs.read_twin(path) is None
+    assert ccs.load_yaml_file(path) == data
+    header = json.loads(
+        corpus_docs.twin_path(path).read_text(encoding="utf-8").splitlines()[0]
+    )
+    assert header["source_sha256"] == corpus_docs.sha256_file(path)
+
+
+def test_shards_match_the_single_file(data_copy):
+    d = data_copy()
+    path = d / ccs.STRATAGEMS_FILE
+    ccs.shard_stratagems(d)
+    manifest = ccs.read_shard_manifest(d)
+    assert manifest is not None
+    assert stratagem_store.load_stratagem_shards(d, manifest, WANTED) == _expected(
+        path, WANTED
+    )
+    assert stratagem_store.load_stratagem_shards(
+        d, manifest
+    ) == stratagem_store.load_stratagems(path)
+    path.write_text(path.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    assert ccs.read_shard_manifest(d) is None  # source modifiée : shards ignorés
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Index des unités (.units.index) : chargement paresseux, péremption, repli."""
+
+import corpus
+import create_cheat_sheet as ccs
+import unit_index
+from conftest import ROOT
+from export_parser import normalize_name
+
+WANTED = {normalize_name(n) for n in ("Broodlord", "Hive Tyrant")}
+
+
+def test_unit_index_round_trip_and_lazy_units(data_copy):
+    d = data_copy()
+    index = ccs.load_unit_index(d)
+    assert unit_index.read_unit_index(d) == index
+    docs = ccs.load_unit_docs_lazy(d, index, WANTED)
+    lazy = [u["name"] for doc in docs for u in doc.get("units", [])]
+    full = ccs.load_corpus(d, use_snapshot=False)
+    assert {normalize_name(n) for n in lazy} == WANTED
+    for doc in docs:
+        assert doc.get("phases", full.phases) == full.phases
+    units = ccs.Corpus.from_docs(docs).units_by_key
+    assert all(units[k] == full.units_by_key[k] for k in WANTED)
+
+
+def test_unit_index_goes_stale(data_copy):
+    d = data_copy()
+    ccs.load_unit_index(d)
+    path = d / "tyranids_units.yaml"
+    path.write_text(
+        path.read_text(encoding="utf-8").replace("- name: Broodlord", "- name: Lord"),
+        encoding="utf-8",
+    )
+    assert unit_index.read_unit_index(d) is None
+    keys = {k for k, _s, _e in ccs.load_unit_index(d)["entries"][path.name]["units"]}
+    assert "lord" in keys and "broodlord" not in keys
+
+
+def test_unsplittable_file_is_read_whole(data_copy):
+    d = data_copy()
+    (d / "zz_flow.yaml").write_text(
+        "units: [{name: Spore Test Swarm, role: Swarm}]\n", encoding="utf-8"
+    )
+    index = ccs.load_unit_index(d)
+    assert index["entries"]["zz_flow.yaml"] == {
+        "full": True,
+        "names": {"detachments": [], "factions": []},
+        "keys": ["spore test swarm"],
+    }
+    docs = ccs.load_unit_docs_lazy(d, index, {"spore test swarm"})
+    assert [u["name"] for doc in docs for u in doc.get("units", [])] == [
+        "Spore Test Swarm"
+    ]
+
+
+def test_export_corpus_keeps_only_listed_units(data_copy):
+    d = data_copy()
+    listed = {normalize_name("Broodlord"): 1, normalize_name("Hive Tyrants"): 1}
+    corpus = ccs.load_corpus_for_export(d, listed, {"Invasion Fleet"})
+    assert set(corpus.units_by_key) == WANTED
+    assert {st.name for st in corpus.stratagems} == {
+        st.name
+        for st in ccs.load_corpus(d, use_snapshot=False).stratagems
+        if {"Invasion Fleet", "All"} & set(st.detachment)
+    }
+
+
+def test_run_reads_a_fresh_snapshot_before_the_index(data_copy, monkeypatch, tmp_path):
+    d = data_copy()
+    ccs.compile_snapshot(d)
+    export = ROOT / "golden_exports" / "tyranids_detachment_first.txt"
+    read_snapshot, lazy_loads, snapshots = corpus.read_snapshot, [], []
+
+    def spy_lazy(yaml_dir, index, keys):
+        lazy_loads.append(yaml_dir)
+        return unit_index.load_unit_docs_lazy(yaml_dir, index, keys)
+
+    def spy_snapshot(yaml_dir):
+        snapshots.append(read_snapshot(yaml_dir))
+        return snapshots[-1]
+
+    monkeypatch.setattr(ccs, "load_unit_docs_lazy", spy_lazy)
+    monkeypatch.setattr(corpus, "read_snapshot", spy_snapshot)
+    ccs.run(str(export), str(d), str(tmp_path / "snapshot.html"))
+    assert not lazy_loads and snapshots and snapshots[0] is not None
+    ccs.run(str(export), str(d), str(tmp_path / "index.html"), use_snapshot=False)
+    assert lazy_loads == [str(d)]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Validation du schéma : calculée quand tout est parsé, reprise sinon."""
+
+import corpus
+import corpus_snapshot
+import corpus_validation
+import create_cheat_sheet as ccs
+
+
+def _no_reparse(monkeypatch):
+    def fail(*a, **k):
+        raise AssertionError("dossier reparsé pour la validation")
+
+    for module in (ccs, corpus_snapshot, corpus_validation, corpus):
+        monkeypatch.setattr(module, "load_yaml_docs", fail)
+    monkeypatch.setattr(corpus_validation, "_validation_docs", fail)
+
+
+def test_streamed_load_does_not_reparse(data_copy, monkeypatch):
+    d = data_copy()
+    _no_reparse(monkeypatch)
+    corpus = ccs.load_dir_corpus(d, {"Invasion Fleet"}, use_snapshot=False)
+    assert corpus.validation is None
+
+
+def test_verdict_is_reused_by_every_path(data_copy, monkeypatch):
+    d = data_copy()
+    report = ccs.validate_dir(d)
+    assert report["ok"] and (d / corpus_validation.VALIDATION_NAME).is_file()
+    corpus_validation._VALIDATIONS.clear()
+    _no_reparse(monkeypatch)
+    listed = {"hive tyrant": {}}
+    lazy = ccs.load_corpus_for_export(d, listed, {"Invasion Fleet"})
+    assert lazy.validation == report
+    streamed = ccs.load_dir_corpus(d, {"Invasion Fleet"}, use_snapshot=False)
+    assert streamed.validation == report
+
+
+def test_snapshot_compile_validates(data_copy):
+    d = data_copy()
+    ccs.compile_snapshot(d)
+    assert ccs.cached_validation(d)["ok"]
+
+
+def test_verdict_follows_the_files(data_copy):
+    d = data_copy()
+    assert ccs.validate_dir(d)["counts"]["error"] == 0
+    path = d / ccs.STRATAGEMS_FILE
+    text = path.read_text(encoding="utf-8")
+    path.write_text(text.replace("effect:", "effet:", 1), encoding="utf-8")
+    assert ccs.cached_validation(d) is None
+    report = ccs.validate_dir(d)
+    assert not report["ok"]
+    assert any(i["code"] == "missing_field" for i in report["issues"])
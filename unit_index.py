@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index des unités (.units.index) : plage d'octets de chaque unité d'un fichier
+YAML, pour ne parser que les unités d'un export.
+"""
+
+import json
+import os
+from pathlib import Path
+import re
+
+import yaml
+
+from corpus_docs import (
+    doc_names,
+    file_fingerprint,
+    fingerprints_fresh,
+    load_yaml_file,
+    yaml_load,
+    yaml_paths,
+)
+from export_parser import normalize_name
+from stratagem_store import STRATAGEMS_FILE
+
+
+# -----------------------------
+# Index des unités (chargement paresseux)
+# -----------------------------
+# .units.index (JSON) donne, pour chaque fichier d'unités, la plage d'octets de
+# chaque unité de la liste `units:` et celles des autres blocs de premier niveau
+# (phases, faction_helpers...). Une fiche ne parse ainsi que les unités listées
+# dans l'export. Un fichier dont le découpage ne redonne pas exactement le
+# parse complet (ancres, style flow...) est marqué "full" : on ne garde que les
+# clés de ses unités, et il est lu en entier s'il en contient une demandée.
+UNIT_INDEX_NAME = ".units.index"
+UNIT_INDEX_VERSION = 2
+
+_TOP_KEY_RE = re.compile(rb"^([A-Za-z_][\w-]*)\s*:")
+
+
+def _split_unit_blocks(raw: bytes):
+    """
+    Découpe un fichier en (autres blocs, unités) : deux listes de (début, fin)
+    en octets. None si la structure ne se prête pas au découpage.
+    """
+    rest: list[list[int]] = []
+    units: list[list[int]] = []
+    pos, block, item_indent = 0, None, None
+    for line in raw.splitlines(keepends=True):
+        start, pos = pos, pos + len(line)
+        if line.startswith((b"---", b"...", b"%")):
+            return None
+        m = _TOP_KEY_RE.match(line)
+        if m:
+            block = m.group(1)
+            if block == b"units":
+                if line[m.end() :].strip() not in (b"", b"#"):
+                    return None  # units: [...] en flow
+                item_indent = None
+                continue
+            rest.append([start, pos])
+            continue
+        if block == b"units":
+            body = line.lstrip(b" ")
+            if not body.strip() or body.startswith(b"#"):
+                if units:
+                    units[-1][1] = pos
+                continue
+            indent = len(line) - len(body)
+            if item_indent is None:
+                if not body.startswith(b"-"):
+                    return None
+                item_indent = indent
+            if indent == item_indent and body.startswith(b"-"):
+                units.append([start, pos])
+            elif indent > item_indent and units:
+                units[-1][1] = pos
+            else:
+                return None
+        elif rest:
+            rest[-1][1] = pos
+    return rest, units
+
+
+def _parse_unit_chunks(raw: bytes, ranges) -> list:
+    text = "units:\n" + "".join(raw[s:e].decode("utf-8") for s, e in ranges)
+    return (yaml_load(text) or {}).get("units") or []
+
+
+def _parse_rest_chunks(raw: bytes, ranges) -> dict:
+    return yaml_load("".join(raw[s:e].decode("utf-8") for s, e in ranges)) or {}
+
+
+def _index_unit_file(path: Path) -> dict:
+    raw = path.read_bytes()
+    full = load_yaml_file(path, raw=raw)
+    split = _split_unit_blocks(raw)
+    if split is not None and isinstance(full, dict):
+        rest, ranges = split
+        try:
+            units = [_parse_unit_chunks(raw, [r]) for r in ranges]
+            ok = all(len(u) == 1 for u in units) and [u[0] for u in units] == (
+                full.get("units") or []
+            )
+            ok = ok and _parse_rest_chunks(raw, rest) == {
+                k: v for k, v in full.items() if k != "units"
+            }
+        except (yaml.YAMLError, ValueError):
+            ok = False
+        if ok:
+            return {
+                "names": doc_names(full),
+                "rest": rest,
+                "units": [
+                    [normalize_name(u[0].get("name") or ""), s, e]
+                    for u, (s, e) in zip(units, ranges)
+                    if isinstance(u[0], dict) and u[0].get("name")
+                ],
+            }
+    units = full.get("units") if isinstance(full, dict) else None
+    return {
+        "full": True,
+        "names": doc_names(full),
+        "keys": [
+            normalize_name(u["name"])
+            for u in (units if isinstance(units, list) else [])
+            if isinstance(u, dict) and u.get("name")
+        ],
+    }
+
+
+def _unit_index_paths(yaml_dir) -> list[Path]:
+    return [p for p in yaml_paths(yaml_dir) if p.name != STRATAGEMS_FILE]
+
+
+def build_unit_index(yaml_dir) -> dict:
+    paths = _unit_index_paths(yaml_dir)
+    return {
+        "version": UNIT_INDEX_VERSION,
+        "files": {p.name: file_fingerprint(p) for p in paths},
+        "entries": {p.name: _index_unit_file(p) for p in paths},
+    }
+
+
+def write_unit_index(yaml_dir, index: dict) -> Path:
+    out = Path(yaml_dir) / UNIT_INDEX_NAME
+    tmp = out.with_name(out.name + ".tmp")
+    tmp.write_text(json.dumps(index, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, out)
+    return out
+
+
+def read_unit_index(yaml_dir) -> dict | None:
+    """L'index persisté s'il correspond encore aux fichiers, sinon None."""
+    path = Path(yaml_dir) / UNIT_INDEX_NAME
+    try:
+        index = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != UNIT_INDEX_VERSION or not fingerprints_fresh(
+        index, _unit_index_paths(yaml_dir)
+    ):
+        return None
+    return index
+
+
+def load_unit_index(yaml_dir) -> dict | None:
+    """Index à jour ; reconstruit (et persisté) s'il est périmé, None sinon."""
+    index = read_unit_index(yaml_dir)
+    if index is None and os.access(yaml_dir, os.W_OK):
+        index = build_unit_index(yaml_dir)
+        try:
+            write_unit_index(yaml_dir, index)
+        except OSError:
+            pass
+    return index
+
+
+def load_unit_docs_lazy(yaml_dir, index: dict, keys) -> list[dict]:
+    """
+    Un document par fichier d'unités : ses blocs hors `units`, plus les seules
+    unités de `keys` (clés normalisées), dans l'ordre du fichier.
+    """
+    keys = set(keys)
+    docs = []
+    for name, entry in sorted(index["entries"].items()):
+        path = Path(yaml_dir) / name
+        if entry.get("full"):
+            doc = load_yaml_file(path)
+            if isinstance(doc, dict) and isinstance(doc.get("units"), list):
+                doc = dict(doc)
+                doc["units"] = [
+                    u
+                    for u in doc["units"]
+                    if isinstance(u, dict)
+                    and u.get("name")
+                    and normalize_name(u["name"]) in keys
+                ]
+            docs.append(doc)
+            continue
+        raw = path.read_bytes()
+        doc = _parse_rest_chunks(raw, entry["rest"])
+        wanted = [[s, e] for k, s, e in entry["units"] if k in keys]
+        if wanted:
+            doc["units"] = _parse_unit_chunks(raw, wanted)
+        docs.append(doc)
+    return docs